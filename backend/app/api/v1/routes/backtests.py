@@ -1,17 +1,106 @@
-from fastapi import APIRouter, Depends
+import json
+from datetime import date
+from typing import AsyncIterator, Literal, Optional
 
-from ....core.deps import get_db_session
-from ....schemas.backtest import BacktestRequest, BacktestResponse
-from ....services.backtest_engine import get_backtest_response, run_backtest
+from fastapi import APIRouter, Depends, Query, Request
+from fastapi.responses import StreamingResponse
+
+from ....core.deps import get_db_session, get_read_db_session, require_admin_token
+from ....schemas.backtest import (
+    BacktestBatchRequest,
+    BacktestBatchResponse,
+    BacktestListResponse,
+    BacktestRequest,
+    BacktestResponse,
+    ExitGridRequest,
+    ExitGridResponse,
+)
+from ....services.backtest_engine import (
+    get_backtest_columnar,
+    get_backtest_response,
+    open_backtest_stream,
+    run_backtest,
+    run_backtest_batch,
+    run_backtest_columnar,
+)
+from ....services.equity_codec import ColumnarOptions, render
+from ....services.exit_grid import run_exit_grid
+from ....services.history_service import list_backtests
 
 router = APIRouter(tags=["backtest"])
 
 
+EquityFormat = Literal["points", "columnar"]
+
+
 @router.post("/backtest", response_model=BacktestResponse)
-async def run_backtest_endpoint(payload: BacktestRequest, session=Depends(get_db_session)):
+async def run_backtest_endpoint(
+    payload: BacktestRequest,
+    request: Request,
+    format: EquityFormat = Query("points"),
+    precision: Optional[int] = Query(None, ge=0, le=8),
+    delta: bool = Query(False),
+    session=Depends(get_db_session),
+):
+    if format == "columnar":
+        options = ColumnarOptions(precision=precision, delta=delta)
+        return render(await run_backtest_columnar(session, payload, options), request.headers.get("accept", ""))
     return await run_backtest(session, payload)
 
 
+@router.post("/backtest/stream")
+async def stream_backtest_endpoint(payload: BacktestRequest, request: Request, session=Depends(get_db_session)):
+    events = await open_backtest_stream(session, payload)
+    if "text/event-stream" in request.headers.get("accept", ""):
+        return StreamingResponse(_as_sse(events), media_type="text/event-stream")
+    return StreamingResponse(_as_ndjson(events), media_type="application/x-ndjson")
+
+
+async def _as_ndjson(events: AsyncIterator[dict]) -> AsyncIterator[str]:
+    async for event in events:
+        yield json.dumps(event, ensure_ascii=False) + "\n"
+
+
+async def _as_sse(events: AsyncIterator[dict]) -> AsyncIterator[str]:
+    async for event in events:
+        yield f"event: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+
+@router.post("/backtest/grid", response_model=ExitGridResponse)
+async def run_exit_grid_endpoint(payload: ExitGridRequest, session=Depends(get_db_session)):
+    return await run_exit_grid(session, payload)
+
+
 @router.get("/backtest/{bt_id}", response_model=BacktestResponse)
-async def get_backtest_endpoint(bt_id: str, session=Depends(get_db_session)):
+async def get_backtest_endpoint(
+    bt_id: str,
+    request: Request,
+    format: EquityFormat = Query("points"),
+    precision: Optional[int] = Query(None, ge=0, le=8),
+    delta: bool = Query(False),
+    session=Depends(get_read_db_session),
+):
+    if format == "columnar":
+        options = ColumnarOptions(precision=precision, delta=delta)
+        return render(await get_backtest_columnar(session, bt_id, options), request.headers.get("accept", ""))
     return await get_backtest_response(session, bt_id)
+
+
+# ``user_id`` is caller-supplied, not an authenticated identity: until users sign in,
+# browsing anyone's history is an admin operation.
+@router.get("/backtests", response_model=BacktestListResponse, dependencies=[Depends(require_admin_token)])
+async def list_backtests_endpoint(
+    user_id: str = Query(..., min_length=1, max_length=36, description="只返回该用户的回测记录"),
+    code: Optional[str] = Query(None, max_length=12),
+    date_from: Optional[date] = Query(None),
+    date_to: Optional[date] = Query(None),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None),
+    session=Depends(get_read_db_session),
+):
+    return await list_backtests(session, user_id, code, date_from, date_to, limit, cursor)
+
+
+@router.post("/backtests/batch", response_model=BacktestBatchResponse)
+async def run_backtest_batch_endpoint(payload: BacktestBatchRequest, session=Depends(get_db_session)):
+    return await run_backtest_batch(session, payload.requests)
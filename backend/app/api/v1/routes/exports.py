@@ -0,0 +1,53 @@
+from datetime import date
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+
+from ....core.deps import require_admin_token
+from ....services.export_service import (
+    BACKTEST_ITEM_COLUMNS,
+    QUOTE_COLUMNS,
+    ExportFormat,
+    ExportUnavailable,
+    backtest_items_query,
+    export_stream,
+    quotes_query,
+)
+
+# Bulk dumps of every user's history: same token as the profiling endpoints.
+router = APIRouter(prefix="/export", tags=["export"], dependencies=[Depends(require_admin_token)])
+
+MEDIA_TYPES = {"csv": "text/csv; charset=utf-8", "parquet": "application/vnd.apache.parquet"}
+
+
+@router.get("/backtest-items")
+async def export_backtest_items(
+    format: ExportFormat = Query("csv"),
+    code: Optional[str] = Query(None, max_length=12),
+    user_id: Optional[str] = Query(None, max_length=36),
+    date_from: Optional[date] = Query(None),
+    date_to: Optional[date] = Query(None),
+):
+    stmt = backtest_items_query([code] if code else [], user_id, date_from, date_to)
+    return _streaming(stmt, BACKTEST_ITEM_COLUMNS, format, "backtest_items")
+
+
+@router.get("/quotes")
+async def export_quotes(
+    format: ExportFormat = Query("csv"),
+    codes: str = Query("", description="股票代码，逗号分隔；为空导出全部"),
+    start: Optional[date] = Query(None),
+    end: Optional[date] = Query(None),
+):
+    code_list = [code.strip() for code in codes.split(",") if code.strip()]
+    return _streaming(quotes_query(code_list, start, end), QUOTE_COLUMNS, format, "quotes_daily")
+
+
+def _streaming(stmt, columns, fmt: ExportFormat, name: str) -> StreamingResponse:
+    try:
+        body = export_stream(stmt, columns, fmt)
+    except ExportUnavailable:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="服务器未安装 pyarrow，暂不支持 Parquet 导出")
+    headers = {"Content-Disposition": f'attachment; filename="{name}.{fmt}"'}
+    return StreamingResponse(body, media_type=MEDIA_TYPES[fmt], headers=headers)
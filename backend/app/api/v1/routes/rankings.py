@@ -1,15 +1,16 @@
 from fastapi import APIRouter, Depends, Query
 
-from ....core.deps import get_db_session
+from ....core.deps import get_read_db_session
 from ....schemas.rank import RankResponse
 from ....services.ranking_service import get_rankings
+from ....services.warm_state import warm_state
 
 router = APIRouter(prefix="/rank", tags=["rankings"])
 
 
 @router.get("/hot", response_model=RankResponse)
-async def get_hot_rank(days: int = Query(10, ge=1, le=30), limit: int = Query(20, ge=1, le=100), session=Depends(get_db_session)):
-    return await get_rankings(session, "hot", days, limit)
+async def get_hot_rank(days: int = Query(10, ge=1, le=30), limit: int = Query(20, ge=1, le=100), session=Depends(get_read_db_session)):
+    return warm_state.ranking("hot", days, limit, 5) or await get_rankings(session, "hot", days, limit)
 
 
 @router.get("/best", response_model=RankResponse)
@@ -17,9 +18,9 @@ async def get_best_rank(
     days: int = Query(10, ge=1, le=30),
     k: int = Query(5, ge=1, le=10),
     limit: int = Query(20, ge=1, le=100),
-    session=Depends(get_db_session),
+    session=Depends(get_read_db_session),
 ):
-    return await get_rankings(session, "best", days, limit, k)
+    return warm_state.ranking("best", days, limit, k) or await get_rankings(session, "best", days, limit, k)
 
 
 @router.get("/worst", response_model=RankResponse)
@@ -27,6 +28,6 @@ async def get_worst_rank(
     days: int = Query(10, ge=1, le=30),
     k: int = Query(5, ge=1, le=10),
     limit: int = Query(20, ge=1, le=100),
-    session=Depends(get_db_session),
+    session=Depends(get_read_db_session),
 ):
-    return await get_rankings(session, "worst", days, limit, k)
+    return warm_state.ranking("worst", days, limit, k) or await get_rankings(session, "worst", days, limit, k)
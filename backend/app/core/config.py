@@ -12,9 +12,72 @@ class Settings(BaseSettings):
     environment: Literal["local", "dev", "staging", "prod"] = "local"
 
     database_url: str = "sqlite+aiosqlite:///./data/zlm.db"
+    database_read_url: Optional[str] = None
+    db_pool_size: int = 10
+    db_max_overflow: int = 20
+    db_pool_timeout: float = 30.0
+    db_pool_recycle: int = 1800
+    db_statement_cache_size: int = 500
+    sqlite_wal: bool = True
+    sqlite_synchronous: Literal["OFF", "NORMAL", "FULL"] = "NORMAL"
+    sqlite_mmap_bytes: int = 256 * 1024 * 1024
+    sqlite_busy_timeout_ms: int = 5000
     redis_url: str = "redis://localhost:6379/0"
 
     akshare_base_url: str = "https://akshare.xyz"
+    ths_base_url: str = "https://d.10jqka.com.cn"
+    ths_timeout_s: float = 3.0
+    ths_breaker_failure_rate: float = 0.5
+    ths_breaker_min_calls: int = 5
+    ths_breaker_window_s: float = 60.0
+    ths_breaker_open_s: float = 30.0
+    quotes_stale_grace_days: int = 3
+    quotes_revalidate_interval_s: float = 900.0
+
+    metrics_enabled: bool = True
+    server_timing_enabled: bool = False
+    profile_token: Optional[str] = None
+    profile_dir: str = "./data/profiles"
+    profile_interval_ms: float = 5.0
+
+    write_behind_enabled: bool = True
+    write_behind_batch_size: int = 50
+    write_behind_flush_ms: float = 50.0
+    write_behind_spool_path: str = "./data/write_behind.jsonl"
+    write_behind_stop_timeout_s: float = 10.0
+
+    item_memo_enabled: bool = True
+    item_memo_lru_size: int = 20000
+    item_memo_ttl_s: float = 3600.0
+    item_memo_recent_ttl_s: float = 600.0
+    # Stored rows for closed windows; purged by ``archive-history``.
+    item_memo_row_ttl_s: float = 30 * 24 * 3600.0
+
+    quote_cache_enabled: bool = True
+    quote_cache_bytes: int = 256 * 1024 * 1024
+    quote_cache_prewarm_top: int = 200
+    quote_cache_prewarm_days: int = 7
+    quote_cache_poll_s: float = 60.0
+    quote_sync_marker_path: str = "./data/quotes_synced"
+
+    # Host-wide packed quote arrays shared by all workers; size /dev/shm accordingly before enabling.
+    shared_quotes_enabled: bool = False
+    shared_quotes_dir: str = "/dev/shm/zlm"
+    shared_quotes_poll_s: float = 5.0
+
+    market_index_path: str = "./data/market_index.npz"
+
+    warm_state_path: str = "./data/warm_state.bin"
+    warm_state_max_age_s: float = 2 * 86400
+    warm_state_rank_ttl_s: float = 300.0
+    warm_state_poll_s: float = 60.0
+
+    quotes_partitioning: bool = False
+    quotes_partition_start_year: int = 2005
+    quotes_partition_hash_modulus: int = 8
+
+    history_retention_days: int = 90
+    archive_dir: str = "./data/archive"
 
     quota_guest_per_day: int = 3
     quota_login_per_day: int = 20
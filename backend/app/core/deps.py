@@ -1,19 +1,75 @@
-from collections.abc import AsyncGenerator
+import hmac
+from collections.abc import AsyncGenerator, AsyncIterator
+from contextlib import asynccontextmanager
 from pathlib import Path
 
-from fastapi import Depends
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from fastapi import Depends, Header, HTTPException, status
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 
-from .config import get_settings
+from .config import Settings, get_settings
+from .metrics import install_query_counter
 
 settings = get_settings()
-if settings.database_url.startswith("sqlite"):
-    db_path = settings.database_url.split("///")[-1]
-    Path(db_path).parent.mkdir(parents=True, exist_ok=True)
 
-_engine = create_async_engine(settings.database_url, echo=False, future=True)
+
+def create_engine_for(url: str, settings: Settings) -> AsyncEngine:
+    """Create an async engine with the configured pool and per-dialect connection tuning."""
+    options: dict = {"echo": False, "future": True}
+    if url.startswith("sqlite"):
+        db_path = url.split("///")[-1]
+        if db_path and db_path != ":memory:":
+            Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+            options.update(pool_size=settings.db_pool_size, max_overflow=settings.db_max_overflow)
+        engine = create_async_engine(url, **options)
+        _install_sqlite_pragmas(engine, settings)
+        return engine
+
+    options.update(
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+        pool_recycle=settings.db_pool_recycle,
+        pool_pre_ping=True,
+    )
+    if url.startswith("postgresql+asyncpg"):
+        options["connect_args"] = {"prepared_statement_cache_size": settings.db_statement_cache_size}
+    return create_async_engine(url, **options)
+
+
+def _install_sqlite_pragmas(engine: AsyncEngine, settings: Settings) -> None:
+    pragmas = [f"PRAGMA busy_timeout={settings.sqlite_busy_timeout_ms}"]
+    if settings.sqlite_wal:
+        # WAL lets readers proceed while a writer holds the lock; NORMAL sync is durable enough under WAL.
+        pragmas += ["PRAGMA journal_mode=WAL", f"PRAGMA synchronous={settings.sqlite_synchronous}"]
+    if settings.sqlite_mmap_bytes:
+        pragmas.append(f"PRAGMA mmap_size={settings.sqlite_mmap_bytes}")
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def _apply_pragmas(dbapi_connection, _record) -> None:
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+
+_engine = create_engine_for(settings.database_url, settings)
 SessionMaker = async_sessionmaker(_engine, expire_on_commit=False)
 
+# Read-only traffic (rankings, replays, quote loads) goes to the replica when configured.
+if settings.database_read_url:
+    _read_engine = create_engine_for(settings.database_read_url, settings)
+    ReadSessionMaker = async_sessionmaker(_read_engine, expire_on_commit=False)
+else:
+    _read_engine = _engine
+    ReadSessionMaker = SessionMaker
+has_read_replica = ReadSessionMaker is not SessionMaker
+
+if settings.metrics_enabled:
+    install_query_counter(_engine)
+    if has_read_replica:
+        install_query_counter(_read_engine)
+
 
 async def get_db_session() -> AsyncGenerator[AsyncSession, None]:
     async with SessionMaker() as session:
@@ -23,5 +79,30 @@ async def get_db_session() -> AsyncGenerator[AsyncSession, None]:
             await session.close()
 
 
+async def get_read_db_session() -> AsyncGenerator[AsyncSession, None]:
+    async with ReadSessionMaker() as session:
+        try:
+            yield session
+        finally:
+            await session.close()
+
+
+@asynccontextmanager
+async def read_session(session: AsyncSession) -> AsyncIterator[AsyncSession]:
+    """Yield a replica session when one is configured, otherwise ``session`` itself."""
+    if not has_read_replica:
+        yield session
+        return
+    async with ReadSessionMaker() as replica:
+        yield replica
+
+
 async def get_settings_dep():
     return get_settings()
+
+
+async def require_admin_token(x_zlm_profile: str = Header("")) -> None:
+    """Admin-only routes take the profiling token; without one configured they are closed."""
+    token = get_settings().profile_token
+    if not token or not hmac.compare_digest(x_zlm_profile.encode("utf-8"), token.encode("utf-8")):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="无权访问")
@@ -0,0 +1,224 @@
+from __future__ import annotations
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str) -> None:
+        self.name = name
+        self.documentation = documentation
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str) -> None:
+        super().__init__(name, documentation)
+        self._values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            values = dict(self._values)
+        return self.header() + [f"{self.name}{_format_labels(key)} {value}" for key, value in values.items()]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        super().__init__(name, documentation)
+        self.buckets = tuple(buckets)
+        self._values: Dict[LabelKey, List[float]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = _label_key(labels)
+        idx = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Per-bucket counts, then the +Inf count, then the running sum.
+                state = self._values[key] = [0.0] * (len(self.buckets) + 2)
+            state[idx] += 1
+            state[-1] += value
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            values = {key: list(state) for key, state in self._values.items()}
+        lines = self.header()
+        for key, state in values.items():
+            cumulative = 0.0
+            for bound, count in zip(self.buckets, state):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(key, le=_format_bound(bound))} {cumulative}")
+            cumulative += state[len(self.buckets)]
+            lines.append(f'{self.name}_bucket{_format_labels(key, le="+Inf")} {cumulative}')
+            lines.append(f"{self.name}_sum{_format_labels(key)} {state[-1]}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {cumulative}")
+        return lines
+
+
+_registry: List[_Metric] = []
+_collectors: List[Callable[[], List[str]]] = []
+
+
+def register_collector(collector: Callable[[], List[str]]) -> None:
+    """Add a callback rendering extra exposition lines (e.g. counters owned elsewhere)."""
+    _collectors.append(collector)
+
+
+def render_metrics() -> str:
+    lines: List[str] = []
+    for metric in _registry:
+        lines.extend(metric.collect())
+    for collector in _collectors:
+        lines.extend(collector())
+    return "\n".join(lines) + "\n"
+
+
+def _label_key(labels: Dict[str, str]) -> LabelKey:
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key: LabelKey, **extra: str) -> str:
+    pairs = list(key) + list(extra.items())
+    if not pairs:
+        return ""
+    rendered = ",".join(f'{name}="{_escape(str(value))}"' for name, value in pairs)
+    return "{" + rendered + "}"
+
+
+def _format_bound(bound: float) -> str:
+    return str(int(bound)) if float(bound).is_integer() else str(bound)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+HTTP_REQUEST_SECONDS = Histogram("zlm_http_request_duration_seconds", "HTTP request latency by route.")
+STAGE_SECONDS = Histogram("zlm_stage_duration_seconds", "Time spent in instrumented service stages.")
+DB_QUERIES = Counter("zlm_db_queries_total", "SQL statements executed.")
+DB_QUERIES_PER_REQUEST = Histogram(
+    "zlm_db_queries_per_request", "SQL statements executed per HTTP request.", QUERY_BUCKETS
+)
+THS_FETCH_SECONDS = Histogram("zlm_ths_fetch_duration_seconds", "THS yearly quote download latency.")
+THS_FETCH_ERRORS = Counter("zlm_ths_fetch_errors_total", "Failed THS yearly quote downloads.")
+
+
+@dataclass
+class RequestContext:
+    stages: Dict[str, float] = field(default_factory=dict)
+    queries: int = 0
+    tags: Dict[str, str] = field(default_factory=dict)
+
+    def server_timing(self, total: float) -> str:
+        parts = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.stages.items()]
+        parts.append(f"db;desc=\"{self.queries} queries\"")
+        parts.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(parts)
+
+
+_current: ContextVar[Optional[RequestContext]] = ContextVar("zlm_request_context", default=None)
+
+
+def current_context() -> Optional[RequestContext]:
+    return _current.get()
+
+
+def push_context() -> Tuple[RequestContext, Token]:
+    ctx = RequestContext()
+    return ctx, _current.set(ctx)
+
+
+def reset_context(token: Token) -> None:
+    _current.reset(token)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.observe(elapsed, stage=name)
+        ctx = _current.get()
+        if ctx is not None:
+            ctx.stages[name] = ctx.stages.get(name, 0.0) + elapsed
+
+
+def install_query_counter(engine: AsyncEngine) -> None:
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def _count_query(*_args) -> None:
+        DB_QUERIES.inc()
+        ctx = _current.get()
+        if ctx is not None:
+            ctx.queries += 1
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording per-route latency and query counts.
+
+    With ``server_timing`` enabled the collected stage timings are also sent
+    back in a ``Server-Timing`` response header.
+    """
+
+    def __init__(self, app: ASGIApp, server_timing: bool = False) -> None:
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        ctx, token = push_context()
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if self.server_timing:
+                    headers = MutableHeaders(scope=message)
+                    headers.append("Server-Timing", ctx.server_timing(time.perf_counter() - started))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = getattr(scope.get("route"), "path", "unmatched")
+            HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - started, method=scope["method"], route=route, status=str(status_code)
+            )
+            DB_QUERIES_PER_REQUEST.observe(ctx.queries, route=route)
+            reset_context(token)
@@ -0,0 +1,229 @@
+from __future__ import annotations
+
+import asyncio
+import hmac
+import json
+import logging
+import sys
+import threading
+import time
+import types
+import uuid
+from collections import Counter as StackCounter
+from contextvars import ContextVar
+from pathlib import Path
+from types import CodeType, FrameType
+from typing import Any, Callable, Dict, List, Optional, Set, TypeVar
+from urllib.parse import parse_qs
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .metrics import current_context, push_context, reset_context
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "x-zlm-profile"
+PROFILE_QUERY = "zlm_profile"
+PROFILE_ID_HEADER = "X-ZLM-Profile-Id"
+
+T = TypeVar("T")
+
+_active_sampler: ContextVar[Optional["StackSampler"]] = ContextVar("zlm_active_sampler", default=None)
+
+
+class StackSampler:
+    """Sample one thread's Python stack at a fixed interval from a helper thread.
+
+    With an ``anchor`` code object, samples of that thread only count while a
+    frame running it is on the stack, i.e. while the profiled request's task is
+    running rather than another request sharing the event loop. Worker threads running
+    on the request's behalf (see ``to_thread``) are sampled too.
+
+    The output is folded stacks (``frame;frame;frame count``), the format
+    consumed by flamegraph.pl, speedscope and most flame-graph viewers.
+    """
+
+    def __init__(self, thread_id: int, interval: float, anchor: Optional[CodeType] = None) -> None:
+        self.thread_id = thread_id
+        self.interval = interval
+        self.anchor = anchor
+        self.stacks: StackCounter[str] = StackCounter()
+        self.samples = 0
+        self._threads: Set[int] = set()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="zlm-profiler", daemon=True)
+        self._started = 0.0
+        self.duration = 0.0
+
+    def start(self) -> None:
+        self._started = time.perf_counter()
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.duration = time.perf_counter() - self._started
+
+    def add_thread(self, thread_id: int) -> None:
+        self._threads.add(thread_id)
+
+    def discard_thread(self, thread_id: int) -> None:
+        self._threads.discard(thread_id)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            self._sample(frames.get(self.thread_id), self.anchor)
+            for thread_id in list(self._threads):
+                self._sample(frames.get(thread_id), None)
+
+    def _sample(self, frame: Optional[FrameType], anchor: Optional[CodeType]) -> None:
+        names: List[str] = []
+        anchored = anchor is None
+        while frame is not None:
+            code = frame.f_code
+            anchored = anchored or code is anchor
+            names.append(f"{code.co_name} ({Path(code.co_filename).name}:{frame.f_lineno})")
+            frame = frame.f_back
+        if names and anchored:
+            self.stacks[";".join(reversed(names))] += 1
+            self.samples += 1
+
+    def collapsed(self) -> str:
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common()) + "\n"
+
+    def speedscope(self, name: str) -> dict:
+        frames: List[Dict[str, str]] = []
+        index: Dict[str, int] = {}
+        samples: List[List[int]] = []
+        weights: List[float] = []
+        for stack, count in self.stacks.items():
+            ids = []
+            for frame in stack.split(";"):
+                if frame not in index:
+                    index[frame] = len(frames)
+                    frames.append({"name": frame})
+                ids.append(index[frame])
+            samples.append(ids)
+            weights.append(count * self.interval * 1000)
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "shared": {"frames": frames},
+            "profiles": [
+                {
+                    "type": "sampled",
+                    "name": name,
+                    "unit": "milliseconds",
+                    "startValue": 0,
+                    "endValue": sum(weights),
+                    "samples": samples,
+                    "weights": weights,
+                }
+            ],
+            "name": name,
+            "exporter": "zlm-profiler",
+        }
+
+
+class ProfilingMiddleware:
+    """Profile individual backtest/rank requests when an admin token is presented.
+
+    Only installed when ``ZLM_PROFILE_TOKEN`` is set; untriggered requests pay
+    one header lookup. Profiles are written to ``profile_dir`` as
+    ``<id>.folded`` and ``<id>.speedscope.json`` and the id is returned in
+    the ``X-ZLM-Profile-Id`` header. The id starts with the ``bt_id`` when the
+    request produced or read a backtest.
+    """
+
+    def __init__(
+        self, app: ASGIApp, token: str, prefixes: List[str], profile_dir: str, interval_ms: float = 5.0
+    ) -> None:
+        self.app = app
+        self.token = token.encode("utf-8")
+        self.prefixes = tuple(prefixes)
+        self.profile_dir = Path(profile_dir)
+        self.interval = interval_ms / 1000
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self._triggered(scope):
+            await self.app(scope, receive, send)
+            return
+
+        ctx = current_context()
+        token = None
+        if ctx is None:
+            ctx, token = push_context()
+        # A private copy of the runner's code object: a frame running it is on the loop
+        # thread's stack exactly while this request's task runs. (Coroutine frame objects
+        # are not stable across suspensions, so the frame itself cannot be the anchor.)
+        anchor = _run_request.__code__.replace()
+        runner = types.FunctionType(anchor, _run_request.__globals__, _run_request.__name__)
+        sampler = StackSampler(threading.get_ident(), self.interval, anchor=anchor)
+        sampler_token = _active_sampler.set(sampler)
+        profile_id: Optional[str] = None
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal profile_id
+            if message["type"] == "http.response.start":
+                bt_id = ctx.tags.get("bt_id") or scope.get("path_params", {}).get("bt_id") or "request"
+                profile_id = f"{bt_id}-{int(time.time())}-{uuid.uuid4().hex[:6]}"
+                MutableHeaders(scope=message).append(PROFILE_ID_HEADER, profile_id)
+            await send(message)
+
+        sampler.start()
+        try:
+            await runner(self.app, scope, receive, send_wrapper)
+        finally:
+            sampler.stop()
+            _active_sampler.reset(sampler_token)
+            if token is not None:
+                reset_context(token)
+            if profile_id:
+                await asyncio.to_thread(self._store, profile_id, scope, sampler)
+
+    def _triggered(self, scope: Scope) -> bool:
+        path = scope.get("path", "")
+        if not path.startswith(self.prefixes):
+            return False
+        supplied = None
+        for name, value in scope.get("headers", []):
+            if name == PROFILE_HEADER.encode("latin-1"):
+                supplied = value
+                break
+        if supplied is None and scope.get("query_string"):
+            values = parse_qs(scope["query_string"].decode("latin-1")).get(PROFILE_QUERY)
+            supplied = values[0].encode("utf-8") if values else None
+        return supplied is not None and hmac.compare_digest(supplied, self.token)
+
+    def _store(self, profile_id: str, scope: Scope, sampler: StackSampler) -> None:
+        self.profile_dir.mkdir(parents=True, exist_ok=True)
+        name = f"{scope['method']} {scope['path']}"
+        (self.profile_dir / f"{profile_id}.folded").write_text(sampler.collapsed(), encoding="utf-8")
+        (self.profile_dir / f"{profile_id}.speedscope.json").write_text(
+            json.dumps(sampler.speedscope(name)), encoding="utf-8"
+        )
+        logger.info(
+            "Stored profile %s for %s (%s samples, %.1f ms)", profile_id, name, sampler.samples, sampler.duration * 1000
+        )
+
+
+async def _run_request(app: ASGIApp, scope: Scope, receive: Receive, send: Send) -> None:
+    await app(scope, receive, send)
+
+
+async def to_thread(func: Callable[..., T], *args: Any) -> T:
+    """``asyncio.to_thread`` that keeps the worker thread in the calling request's profile, if any."""
+    return await asyncio.to_thread(_profiled_call, func, *args)
+
+
+def _profiled_call(func: Callable[..., T], *args: Any) -> T:
+    sampler = _active_sampler.get()
+    if sampler is None:
+        return func(*args)
+    thread_id = threading.get_ident()
+    sampler.add_thread(thread_id)
+    try:
+        return func(*args)
+    finally:
+        sampler.discard_thread(thread_id)
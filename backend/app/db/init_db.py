@@ -1,24 +1,61 @@
 import asyncio
 import logging
+from datetime import date
+from typing import Optional
 
+from sqlalchemy import inspect
 from sqlalchemy.ext.asyncio import create_async_engine
 
 from ..core.config import get_settings
 from .base import Base
+from .partitioning import ensure_quote_partitions
 from . import models  # noqa: F401
 
 logger = logging.getLogger(__name__)
 
 
-async def init_db() -> None:
+async def init_db(partition_until: Optional[int] = None) -> None:
     """Create database tables based on ORM models."""
     settings = get_settings()
     engine = create_async_engine(settings.database_url, echo=False)
     async with engine.begin() as conn:
+        if settings.quotes_partitioning:
+            # Runs before create_all so quotes_daily is created (or migrated) as a partitioned table.
+            await conn.run_sync(
+                ensure_quote_partitions,
+                settings.quotes_partition_start_year,
+                partition_until or date.today().year + 1,
+                settings.quotes_partition_hash_modulus,
+            )
         await conn.run_sync(Base.metadata.create_all)
+        # create_all skips columns and indexes on tables that already exist; add any that are missing.
+        await conn.run_sync(_add_missing_columns)
+        await conn.run_sync(_create_missing_indexes)
     await engine.dispose()
     logger.info("Database initialized using %s", settings.database_url)
 
 
+def _add_missing_columns(conn) -> None:
+    """Add nullable columns introduced after a table was first created."""
+    inspector = inspect(conn)
+    quote = conn.dialect.identifier_preparer.quote
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing or not column.nullable:
+                continue
+            column_type = column.type.compile(dialect=conn.dialect)
+            conn.exec_driver_sql(f"ALTER TABLE {quote(table.name)} ADD COLUMN {quote(column.name)} {column_type}")
+            logger.info("Added column %s.%s", table.name, column.name)
+
+
+def _create_missing_indexes(conn) -> None:
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+
+
 if __name__ == "__main__":
     asyncio.run(init_db())
@@ -4,7 +4,7 @@ from datetime import date, datetime
 from typing import List, Optional
 from uuid import uuid4
 
-from sqlalchemy import Date, DateTime, Float, Integer, JSON, String, ForeignKey
+from sqlalchemy import BigInteger, Date, DateTime, Float, Index, Integer, JSON, String, ForeignKey
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -21,6 +21,35 @@ class Stock(Base):
     updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
 
+class StockChange(Base):
+    """Append-only feed of stock master changes; consumers poll by ``id``."""
+
+    __tablename__ = "stock_change"
+    # ``bundle import --replace`` empties the feed; ids must not restart below consumers' cursors.
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    code: Mapped[str] = mapped_column(String(12), index=True)
+    kind: Mapped[str] = mapped_column(String(16))
+    name: Mapped[str] = mapped_column(String(64))
+    previous_name: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
+    status_tags: Mapped[Optional[List[str]]] = mapped_column(JSON, default=list)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+class QuoteRefresh(Base):
+    """Latest background THS refresh per code; API workers poll by ``id`` to drop their copies."""
+
+    __tablename__ = "quote_refresh"
+    # Rows are replaced, so ids must never be reused for SQLite either.
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    code: Mapped[str] = mapped_column(String(12), index=True)
+    rows: Mapped[int] = mapped_column(Integer, default=0)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
 class QuoteDaily(Base):
     __tablename__ = "quotes_daily"
 
@@ -41,20 +70,27 @@ class QuoteDaily(Base):
 
 class Backtest(Base):
     __tablename__ = "backtest"
+    __table_args__ = (
+        # Keyset pagination of history listings, newest first, globally and per user.
+        Index("ix_backtest_created_at_bt_id", "created_at", "bt_id"),
+        Index("ix_backtest_user_created_at_bt_id", "user_id", "created_at", "bt_id"),
+    )
 
     bt_id: Mapped[str] = mapped_column(String(36), primary_key=True, default=lambda: str(uuid4()))
     user_id: Mapped[Optional[str]] = mapped_column(String(36), nullable=True)
-    start: Mapped[date] = mapped_column(Date)
+    start: Mapped[date] = mapped_column(Date, index=True)
     end: Mapped[date] = mapped_column(Date)
     benchmark: Mapped[str] = mapped_column(String(16))
     summary_json: Mapped[dict] = mapped_column(JSON)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
 
     items: Mapped[List["BacktestItem"]] = relationship(back_populates="backtest", cascade="all, delete-orphan")
+    live_items: Mapped[List["BacktestLiveItem"]] = relationship(cascade="all, delete-orphan")
 
 
 class BacktestItem(Base):
     __tablename__ = "backtest_item"
+    __table_args__ = (Index("ix_backtest_item_code_bt_id", "code", "bt_id"),)
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     bt_id: Mapped[str] = mapped_column(String(36), ForeignKey("backtest.bt_id", ondelete="CASCADE"), index=True)
@@ -75,3 +111,48 @@ class BacktestItem(Base):
     flags: Mapped[Optional[List[str]]] = mapped_column(JSON, default=list)
 
     backtest: Mapped["Backtest"] = relationship(back_populates="items")
+
+
+class BacktestLiveItem(Base):
+    """Running state for marking an open-ended backtest item to market one bar at a time."""
+
+    __tablename__ = "backtest_live_item"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    bt_id: Mapped[str] = mapped_column(String(36), ForeignKey("backtest.bt_id", ondelete="CASCADE"), index=True)
+    code: Mapped[str] = mapped_column(String(12), index=True)
+    last_date: Mapped[date] = mapped_column(Date)
+    last_close: Mapped[float] = mapped_column(Float)
+    buy_price: Mapped[float] = mapped_column(Float)
+    # Welford accumulators over daily close-to-close returns (Sharpe).
+    n: Mapped[int] = mapped_column(Integer, default=0)
+    mean: Mapped[float] = mapped_column(Float, default=0.0)
+    m2: Mapped[float] = mapped_column(Float, default=0.0)
+    # Running peak and maximum drawdown of closes since the buy price.
+    peak: Mapped[float] = mapped_column(Float)
+    mdd: Mapped[float] = mapped_column(Float, default=0.0)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class ItemMemo(Base):
+    """Persistent tier of the per-stock result memo (see ``services.item_memo``)."""
+
+    __tablename__ = "item_memo"
+
+    key: Mapped[str] = mapped_column(String(40), primary_key=True)
+    code: Mapped[str] = mapped_column(String(12), index=True)
+    payload: Mapped[dict] = mapped_column(JSON)
+    expires_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+class BacktestArchiveIndex(Base):
+    __tablename__ = "backtest_archive_index"
+
+    bt_id: Mapped[str] = mapped_column(String(36), primary_key=True)
+    month: Mapped[str] = mapped_column(String(7), index=True)
+    archive_file: Mapped[str] = mapped_column(String(255))
+    # The backtest's own gzip member within ``archive_file``; NULL for files written before offsets were kept.
+    byte_offset: Mapped[Optional[int]] = mapped_column(BigInteger, nullable=True)
+    byte_length: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    archived_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
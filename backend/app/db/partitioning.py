@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import logging
+from datetime import date
+from typing import Iterable
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from sqlalchemy.schema import CreateTable
+
+from .models import QuoteDaily
+
+logger = logging.getLogger(__name__)
+
+QUOTES_TABLE = QuoteDaily.__tablename__
+LEGACY_TABLE = f"{QUOTES_TABLE}_legacy"
+
+
+def ensure_quote_partitions(conn: Connection, start_year: int, end_year: int, modulus: int) -> None:
+    """Create (or extend) ``quotes_daily`` as RANGE(date) yearly partitions, each HASH(code) sub-partitioned.
+
+    PostgreSQL only. An existing plain ``quotes_daily`` is renamed to
+    ``quotes_daily_legacy`` and copied over year by year; the legacy table is
+    dropped once the row counts match. Rows outside the yearly ranges land in
+    ``quotes_daily_default`` until their year's partition is created, which
+    moves them over.
+    """
+    if conn.dialect.name != "postgresql":
+        logger.info("Quote partitioning is only supported on PostgreSQL; %s keeps a single table", conn.dialect.name)
+        return
+
+    relkind = _relkind(conn, QUOTES_TABLE)
+    migrate = relkind == "r"
+    if migrate:
+        logger.info("Converting %s to a partitioned table", QUOTES_TABLE)
+        conn.execute(text(f"ALTER TABLE {QUOTES_TABLE} RENAME TO {LEGACY_TABLE}"))
+        conn.execute(text(f"ALTER INDEX IF EXISTS {QUOTES_TABLE}_pkey RENAME TO {LEGACY_TABLE}_pkey"))
+    if relkind != "p":
+        ddl = str(CreateTable(QuoteDaily.__table__).compile(dialect=conn.dialect)).rstrip().rstrip(";")
+        conn.execute(text(f"{ddl} PARTITION BY RANGE (date)"))
+        conn.execute(text(f"CREATE TABLE IF NOT EXISTS {QUOTES_TABLE}_default PARTITION OF {QUOTES_TABLE} DEFAULT"))
+
+    if migrate:
+        bounds = conn.execute(text(f"SELECT min(date), max(date) FROM {LEGACY_TABLE}")).one()
+        if bounds[0] is not None:
+            start_year = min(start_year, bounds[0].year)
+            end_year = max(end_year, bounds[1].year)
+
+    for year in range(start_year, end_year + 1):
+        _create_year(conn, year, modulus)
+
+    if migrate:
+        _copy_legacy(conn, start_year, end_year)
+
+
+def ensure_year_partitions(conn: Connection, years: Iterable[int], modulus: int) -> None:
+    """Create the partitions of ``years`` if missing; ingestion calls this before inserting their bars."""
+    if conn.dialect.name != "postgresql" or _relkind(conn, QUOTES_TABLE) != "p":
+        return
+    for year in sorted(set(years)):
+        _create_year(conn, year, modulus)
+
+
+def _create_year(conn: Connection, year: int, modulus: int) -> None:
+    parent = f"{QUOTES_TABLE}_y{year}"
+    bounds = {"start": date(year, 1, 1), "end": date(year + 1, 1, 1)}
+    stash = None
+    if _relkind(conn, parent) is None:
+        # PostgreSQL refuses to create a partition while the default one holds rows in its range,
+        # so move them aside and back within this transaction.
+        stash = f"{parent}_stash"
+        conn.execute(text(f"CREATE TEMP TABLE {stash} (LIKE {QUOTES_TABLE}) ON COMMIT DROP"))
+        moved = conn.execute(
+            text(
+                f"WITH moved AS (DELETE FROM {QUOTES_TABLE}_default WHERE date >= :start AND date < :end RETURNING *) "
+                f"INSERT INTO {stash} SELECT * FROM moved"
+            ),
+            bounds,
+        )
+        if moved.rowcount:
+            logger.info("Moving %s quote rows for %s out of %s_default", moved.rowcount, year, QUOTES_TABLE)
+    conn.execute(
+        text(
+            f"CREATE TABLE IF NOT EXISTS {parent} PARTITION OF {QUOTES_TABLE} "
+            f"FOR VALUES FROM ('{bounds['start']}') TO ('{bounds['end']}') PARTITION BY HASH (code)"
+        )
+    )
+    for remainder in range(modulus):
+        conn.execute(
+            text(
+                f"CREATE TABLE IF NOT EXISTS {parent}_h{remainder} PARTITION OF {parent} "
+                f"FOR VALUES WITH (MODULUS {modulus}, REMAINDER {remainder})"
+            )
+        )
+    if stash is not None:
+        conn.execute(text(f"INSERT INTO {QUOTES_TABLE} SELECT * FROM {stash}"))
+        conn.execute(text(f"DROP TABLE {stash}"))
+
+
+def _copy_legacy(conn: Connection, start_year: int, end_year: int) -> None:
+    columns = ", ".join(column.name for column in QuoteDaily.__table__.columns)
+    for year in range(start_year, end_year + 1):
+        result = conn.execute(
+            text(
+                f"INSERT INTO {QUOTES_TABLE} ({columns}) SELECT {columns} FROM {LEGACY_TABLE} "
+                "WHERE date >= :start AND date < :end"
+            ),
+            {"start": date(year, 1, 1), "end": date(year + 1, 1, 1)},
+        )
+        logger.info("Migrated %s quote rows for %s", result.rowcount, year)
+    legacy = conn.execute(text(f"SELECT count(*) FROM {LEGACY_TABLE}")).scalar()
+    migrated = conn.execute(text(f"SELECT count(*) FROM {QUOTES_TABLE}")).scalar()
+    if legacy != migrated:
+        raise RuntimeError(f"Quote migration copied {migrated} of {legacy} rows; keeping {LEGACY_TABLE}")
+    conn.execute(text(f"DROP TABLE {LEGACY_TABLE}"))
+    logger.info("Migrated %s quote rows into partitions", migrated)
+
+
+def _relkind(conn: Connection, table: str) -> str | None:
+    return conn.execute(
+        text("SELECT relkind FROM pg_class WHERE relname = :name AND relnamespace = 'public'::regnamespace"),
+        {"name": table},
+    ).scalar()
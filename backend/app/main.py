@@ -1,19 +1,67 @@
-from fastapi import FastAPI
+import asyncio
+import contextlib
+import re
+from contextlib import asynccontextmanager
+from pathlib import Path
+
+from fastapi import Depends, FastAPI, HTTPException, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, PlainTextResponse
 
 from .api.v1.routes.backtests import router as backtest_router
+from .api.v1.routes.exports import router as export_router
 from .api.v1.routes.quota import router as quota_router
 from .api.v1.routes.rankings import router as ranking_router
 from .api.v1.routes.random_pick import router as random_router
 from .core.config import get_settings
+from .core.deps import require_admin_token
 from .core.logging import configure_logging
+from .core.metrics import MetricsMiddleware, render_metrics
+from .core.profiling import ProfilingMiddleware
+from .services.backtest_engine import watch_quote_sync
+from .services.backtest_writer import backtest_writer
+from .services.market_index import load_market_index
+from .services.shared_quotes import maintain_shared_quotes, shared_quotes
+from .services.single_flight import flight_stats
+from .services.warm_state import warm_state
+
+
+PROFILE_ID_PATTERN = re.compile(r"[\w-]+")
 
 
 def create_app() -> FastAPI:
     configure_logging()
     settings = get_settings()
 
-    app = FastAPI(title=settings.project_name)
+    @asynccontextmanager
+    async def lifespan(_app: FastAPI):
+        if settings.write_behind_enabled:
+            await backtest_writer.start()
+        # Off the event loop, before serving, so the first backtests already get market percentiles.
+        await load_market_index()
+        # Loaded in the background; requests fall back to the database until it is in place.
+        snapshot = asyncio.create_task(warm_state.load())
+        watcher = asyncio.create_task(watch_quote_sync())
+        loader = None
+        if settings.shared_quotes_enabled:
+            # Attach before serving so a new worker starts warm when a segment already exists.
+            shared_quotes.refresh()
+            loader = asyncio.create_task(maintain_shared_quotes())
+        try:
+            yield
+        finally:
+            snapshot.cancel()
+            if loader is not None:
+                loader.cancel()
+                with contextlib.suppress(asyncio.CancelledError):
+                    await loader
+            watcher.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await watcher
+            # Drain queued backtests; anything that cannot be written is spooled for the next start.
+            await backtest_writer.stop()
+
+    app = FastAPI(title=settings.project_name, lifespan=lifespan)
     app.add_middleware(
         CORSMiddleware,
         allow_origins=["*"],
@@ -21,16 +69,45 @@ def create_app() -> FastAPI:
         allow_methods=["*"],
         allow_headers=["*"],
     )
-
     api_prefix = settings.api_v1_prefix
+    if settings.profile_token:
+        app.add_middleware(
+            ProfilingMiddleware,
+            token=settings.profile_token,
+            prefixes=[f"{api_prefix}/backtest", f"{api_prefix}/rank/"],
+            profile_dir=settings.profile_dir,
+            interval_ms=settings.profile_interval_ms,
+        )
+    if settings.metrics_enabled:
+        app.add_middleware(MetricsMiddleware, server_timing=settings.server_timing_enabled)
+
     app.include_router(backtest_router, prefix=api_prefix)
     app.include_router(ranking_router, prefix=api_prefix)
     app.include_router(random_router, prefix=api_prefix)
     app.include_router(quota_router, prefix=api_prefix)
+    app.include_router(export_router, prefix=api_prefix)
 
     @app.get("/healthz", tags=["health"])
     async def healthz():
-        return {"status": "ok"}
+        return {"status": "ok", "single_flight": flight_stats()}
+
+    if settings.metrics_enabled:
+
+        @app.get("/metrics", tags=["health"], response_class=PlainTextResponse)
+        async def metrics():
+            return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+    if settings.profile_token:
+
+        @app.get("/admin/profiles/{profile_id}", tags=["health"], dependencies=[Depends(require_admin_token)])
+        async def download_profile(profile_id: str, fmt: str = "speedscope"):
+            if not PROFILE_ID_PATTERN.fullmatch(profile_id):
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="profile 不存在")
+            suffix = ".folded" if fmt == "folded" else ".speedscope.json"
+            path = Path(settings.profile_dir) / f"{profile_id}{suffix}"
+            if not path.exists():
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="profile 不存在")
+            return FileResponse(path)
 
     return app
 
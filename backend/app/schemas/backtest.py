@@ -1,9 +1,9 @@
 from __future__ import annotations
 
-from datetime import date
+from datetime import date, datetime
 from typing import List, Optional
 
-from pydantic import BaseModel, Field, HttpUrl
+from pydantic import BaseModel, Field, HttpUrl, confloat, conint
 
 
 class BacktestItemSchema(BaseModel):
@@ -22,6 +22,7 @@ class BacktestItemSchema(BaseModel):
     score: Optional[float] = None
     grade: Optional[str] = None
     flags: List[str] = Field(default_factory=list)
+    market_pct: Optional[float] = None
 
 
 class EquityPoint(BaseModel):
@@ -45,12 +46,16 @@ class BacktestSummary(BaseModel):
     win_rate: float
     ret: float
     ann: float
+    # Benchmark index series are not ingested yet, so bench_ret/bench_ann are 0 and excess equals ret.
     bench_ret: float
     bench_ann: float
     excess: float
     sharpe: Optional[float] = None
     mdd: Optional[float] = None
     calmar: Optional[float] = None
+    # Equal-weight mean return of every indexed code from the first entry to the last exit; not the benchmark.
+    market_ret: Optional[float] = None
+    market_pct: Optional[float] = None
 
 
 class BacktestWindow(BaseModel):
@@ -67,6 +72,14 @@ class BacktestResponse(BaseModel):
     equity: List[EquityPoint]
     item_equities: List[ItemEquitySeries] = Field(default_factory=list)
     items: List[BacktestItemSchema]
+    live: bool = False
+
+
+class ExitRules(BaseModel):
+    stop_loss: Optional[float] = Field(default=None, gt=0, lt=1)
+    take_profit: Optional[float] = Field(default=None, gt=0)
+    max_hold_days: Optional[int] = Field(default=None, ge=1)
+    trailing_stop: Optional[float] = Field(default=None, gt=0, lt=1)
 
 
 class BacktestRequest(BaseModel):
@@ -75,7 +88,73 @@ class BacktestRequest(BaseModel):
     end_date: Optional[date] = None
     benchmark: str = "HS300"
     price_adjust: str = "post"
+    exit_rules: Optional[ExitRules] = None
+    user_id: Optional[str] = Field(default=None, max_length=36)
+
+
+class BacktestListItem(BaseModel):
+    bt_id: str
+    user_id: Optional[str] = None
+    window: BacktestWindow
+    benchmark: str
+    summary: BacktestSummary
+    codes: List[str] = Field(default_factory=list)
+    created_at: datetime
 
 
 class BacktestListResponse(BaseModel):
-    items: List[BacktestResponse]
+    items: List[BacktestListItem]
+    next_cursor: Optional[str] = None
+    # Backtests created before this time have been archived: they are not listed
+    # here but can still be opened by bt_id.
+    archived_before: Optional[datetime] = None
+
+
+class BacktestBatchRequest(BaseModel):
+    requests: List[BacktestRequest] = Field(min_length=1, max_length=50)
+
+
+class BacktestBatchResult(BaseModel):
+    index: int
+    result: Optional[BacktestResponse] = None
+    error: Optional[str] = None
+
+
+class BacktestBatchResponse(BaseModel):
+    items: List[BacktestBatchResult]
+
+
+class ExitGridRequest(BaseModel):
+    # Same bounds as ExitRules, per value; list lengths cap the grid before it is expanded.
+    stocks: List[str] = Field(max_length=20)
+    recommend_date: date
+    end_date: Optional[date] = None
+    price_adjust: str = "post"
+    stop_loss: List[Optional[confloat(gt=0, lt=1)]] = Field(default_factory=lambda: [None], min_length=1, max_length=20)
+    take_profit: List[Optional[confloat(gt=0)]] = Field(default_factory=lambda: [None], min_length=1, max_length=20)
+    max_hold_days: List[Optional[conint(ge=1)]] = Field(default_factory=lambda: [None], min_length=1, max_length=20)
+    trailing_stop: List[Optional[confloat(gt=0, lt=1)]] = Field(
+        default_factory=lambda: [None], min_length=1, max_length=20
+    )
+    top: int = Field(default=10, ge=1, le=100)
+
+
+class ExitGridRow(BaseModel):
+    stop_loss: Optional[float] = None
+    take_profit: Optional[float] = None
+    max_hold_days: Optional[int] = None
+    trailing_stop: Optional[float] = None
+    win_rate: float
+    ret: float
+    ann: float
+    sharpe: Optional[float] = None
+    mdd: Optional[float] = None
+    calmar: Optional[float] = None
+    score: Optional[float] = None
+
+
+class ExitGridResponse(BaseModel):
+    window: BacktestWindow
+    stocks: int
+    combinations: int
+    items: List[ExitGridRow]
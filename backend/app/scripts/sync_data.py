@@ -1,9 +1,24 @@
 import argparse
 import asyncio
+from collections import Counter
 from datetime import datetime
 from typing import List
 
 from ..db.init_db import init_db
+from ..services.bundle import BundleError, export_bundle, import_bundle
+from ..services.export_service import (
+    BACKTEST_ITEM_COLUMNS,
+    QUOTE_COLUMNS,
+    ExportUnavailable,
+    backtest_items_query,
+    export_stream,
+    quotes_query,
+)
+from ..services.history_archive import archive_history
+from ..services.item_memo import item_memo
+from ..services.live_backtest import advance_live_backtests
+from ..services.market_index import build_market_index
+from ..services.warm_state import write_warm_state
 from ..services.ingestor import list_known_codes, sync_quotes_for_codes, sync_stock_master
 
 
@@ -11,7 +26,10 @@ def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="准了么 | AKShare 数据同步工具")
     subparsers = parser.add_subparsers(dest="command", required=True)
 
-    subparsers.add_parser("init-db", help="创建/更新数据库表结构")
+    init_parser = subparsers.add_parser("init-db", help="创建/更新数据库表结构")
+    init_parser.add_argument(
+        "--partition-until", type=int, default=None, help="启用行情分区时预建到该年份（含），默认明年"
+    )
 
     subparsers.add_parser("stocks", help="同步 A 股股票基础信息")
 
@@ -20,6 +38,33 @@ def parse_args() -> argparse.Namespace:
     quotes_parser.add_argument("--limit", type=int, default=5, help="默认读取数据库中前 N 只股票")
     quotes_parser.add_argument("--start", type=str, required=True, help="开始日期，格式 YYYY-MM-DD")
     quotes_parser.add_argument("--end", type=str, required=True, help="结束日期，格式 YYYY-MM-DD")
+    quotes_parser.add_argument("--skip-market-index", action="store_true", help="同步后不重建全市场收益索引")
+
+    subparsers.add_parser("market-index", help="重建全市场收益分位索引")
+
+    subparsers.add_parser("snapshot", help="写出供 API 进程快速启动的预热状态快照")
+
+    archive_parser = subparsers.add_parser(
+        "archive-history", help="将超出保留期的回测按月归档为压缩文件，并清理过期的单股结果缓存"
+    )
+    archive_parser.add_argument("--retention-days", type=int, default=None, help="热表保留天数，默认读取配置")
+
+    subparsers.add_parser("advance-live", help="为未设结束日期的回测追加最新行情并增量更新指标")
+
+    bundle_parser = subparsers.add_parser("export-bundle", help="将股票、日线行情与全市场索引打包为可离线导入的数据包")
+    bundle_parser.add_argument("--output", type=str, required=True, help="数据包输出路径（.tar）")
+
+    import_parser = subparsers.add_parser("import-bundle", help="校验并导入 export-bundle 生成的数据包")
+    import_parser.add_argument("path", type=str, help="数据包路径")
+    import_parser.add_argument("--replace", action="store_true", help="目标表已有数据时先清空再导入")
+
+    export_parser = subparsers.add_parser("export", help="流式导出回测明细或日线行情为 CSV/Parquet")
+    export_parser.add_argument("dataset", choices=["backtest-items", "quotes"], help="导出的数据集")
+    export_parser.add_argument("--output", type=str, required=True, help="输出文件路径")
+    export_parser.add_argument("--format", choices=["csv", "parquet"], default="csv", help="输出格式，默认 csv")
+    export_parser.add_argument("--codes", type=str, default="", help="股票代码，逗号分隔；为空则不过滤")
+    export_parser.add_argument("--start", type=str, default=None, help="开始日期（行情日期或回测创建日期），YYYY-MM-DD")
+    export_parser.add_argument("--end", type=str, default=None, help="结束日期（含），YYYY-MM-DD")
 
     return parser.parse_args()
 
@@ -27,10 +72,13 @@ def parse_args() -> argparse.Namespace:
 async def main() -> None:
     args = parse_args()
     if args.command == "init-db":
-        await init_db()
+        await init_db(args.partition_until)
         return
     if args.command == "stocks":
-        await sync_stock_master()
+        changes = await sync_stock_master()
+        counts = Counter(change.kind for change in changes)
+        print(f"股票主数据变更: {dict(counts) or '无'}")
+        await write_warm_state()
         return
     if args.command == "quotes":
         codes: List[str]
@@ -43,6 +91,64 @@ async def main() -> None:
         start = datetime.strptime(args.start, "%Y-%m-%d").date()
         end = datetime.strptime(args.end, "%Y-%m-%d").date()
         await sync_quotes_for_codes(codes, start, end)
+        if not args.skip_market_index:
+            await build_market_index()
+        await write_warm_state()
+        return
+    if args.command == "market-index":
+        index = await build_market_index()
+        print(f"全市场索引: {len(index.dates)} 个交易日 x {len(index.codes)} 只股票")
+        return
+    if args.command == "snapshot":
+        path = await write_warm_state()
+        print(f"预热快照已写出: {path}")
+        return
+    if args.command == "advance-live":
+        updated = await advance_live_backtests()
+        print(f"已更新 {updated} 个实时回测")
+        return
+    if args.command == "archive-history":
+        try:
+            archived_months = await archive_history(args.retention_days)
+        except ValueError as exc:
+            raise SystemExit(f"保留期设置无效: {exc}")
+        for archived in archived_months:
+            print(f"{archived.month}: {archived.backtests} 条回测 -> {archived.archive_file}")
+        purged = await item_memo.purge()
+        print(f"已清理 {purged} 条过期的单股结果缓存")
+        return
+    if args.command == "export-bundle":
+        manifest = await export_bundle(args.output)
+        for table, meta in manifest["tables"].items():
+            print(f"{table}: {meta['rows']} 行, {len(meta['parts'])} 个分片")
+        print(f"全市场索引: {'已包含' if 'market_index' in manifest else '无'}")
+        return
+    if args.command == "import-bundle":
+        try:
+            loaded = await import_bundle(args.path, replace=args.replace)
+        except BundleError as exc:
+            raise SystemExit(f"数据包导入失败: {exc}")
+        for table, rows in loaded.items():
+            print(f"{table}: 已导入 {rows} 行")
+        return
+    if args.command == "export":
+        codes = [code.strip() for code in args.codes.split(",") if code.strip()]
+        start = datetime.strptime(args.start, "%Y-%m-%d").date() if args.start else None
+        end = datetime.strptime(args.end, "%Y-%m-%d").date() if args.end else None
+        if args.dataset == "quotes":
+            stmt, columns = quotes_query(codes, start, end), QUOTE_COLUMNS
+        else:
+            stmt, columns = backtest_items_query(codes, None, start, end), BACKTEST_ITEM_COLUMNS
+        try:
+            chunks = export_stream(stmt, columns, args.format)
+        except ExportUnavailable:
+            raise SystemExit("未安装 pyarrow，无法导出 Parquet")
+        written = 0
+        with open(args.output, "wb") as fh:
+            async for chunk in chunks:
+                fh.write(chunk)
+                written += len(chunk)
+        print(f"已导出 {args.dataset} -> {args.output} ({written} 字节)")
         return
 
 
@@ -15,21 +15,34 @@ class AkShareClient:
 
     def list_a_stocks(self) -> list[StockInfo]:
         df = ak.stock_info_a_code_name()
-        records: list[StockInfo] = []
-        for _, row in df.iterrows():
-            code = str(row["code"]).zfill(6)
-            name = str(row["name"]).strip()
-            exchange = self._detect_exchange(code)
-            records.append(StockInfo(code=code, name=name, exchange=exchange, status_tags=[]))
+        codes = df["code"].astype(str).str.strip().str.zfill(6)
+        names = df["name"].astype(str).str.strip()
+        exchanges = self._detect_exchanges(codes)
+        tags = self._status_tags(names)
+        records = [
+            StockInfo(code=code, name=name, exchange=exchange, status_tags=tag)
+            for code, name, exchange, tag in zip(codes.tolist(), names.tolist(), exchanges.tolist(), tags)
+        ]
         logger.info("Loaded %s A-share symbols from AKShare", len(records))
         return records
 
     @staticmethod
-    def _detect_exchange(code: str) -> str:
-        if code.startswith(("60", "68")):
-            return "SSE"
-        if code.startswith(("00", "30")):
-            return "SZSE"
-        if code.startswith("43"):
-            return "BSE"
-        return "UNKNOWN"
+    def _detect_exchanges(codes: pd.Series) -> pd.Series:
+        prefix = codes.str[:2]
+        exchanges = pd.Series("UNKNOWN", index=codes.index)
+        exchanges[prefix.isin(["60", "68"])] = "SSE"
+        exchanges[prefix.isin(["00", "30"])] = "SZSE"
+        exchanges[prefix == "43"] = "BSE"
+        return exchanges
+
+    @staticmethod
+    def _status_tags(names: pd.Series) -> list[list[str]]:
+        """Derive ST / *ST / 退市整理 tags from the security short name."""
+        normalized = names.str.replace(" ", "", regex=False).str.upper()
+        star_st = normalized.str.startswith("*ST")
+        st = normalized.str.startswith("ST") & ~star_st
+        delisting = normalized.str.contains("退", regex=False)
+        return [
+            [tag for tag, flag in (("*ST", is_star), ("ST", is_st), ("DELISTING", is_delisting)) if flag]
+            for is_star, is_st, is_delisting in zip(star_st.tolist(), st.tolist(), delisting.tolist())
+        ]
@@ -1,32 +1,69 @@
 from __future__ import annotations
 
+import asyncio
+import hashlib
+import json
+import logging
 import math
 import statistics
+import sys
+import time
 import uuid
-from dataclasses import dataclass
+from bisect import bisect_left, bisect_right
+from dataclasses import asdict, dataclass, replace
 from datetime import date, datetime, timedelta
-from typing import Iterable, List, Sequence
+from typing import AsyncIterator, Dict, Iterable, List, Sequence
 
 from fastapi import HTTPException, status
-from sqlalchemy import select
+from sqlalchemy import func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
-from ..db.models import Backtest, BacktestItem, QuoteDaily, Stock
+from ..core.config import get_settings
+from ..core.deps import ReadSessionMaker, SessionMaker, has_read_replica, read_session
+from ..core.metrics import current_context, stage
+from ..db.models import Backtest, BacktestItem, BacktestLiveItem, QuoteDaily, QuoteRefresh, Stock
 from ..schemas.backtest import (
+    BacktestBatchResponse,
+    BacktestBatchResult,
     BacktestItemSchema,
     BacktestRequest,
     BacktestResponse,
     BacktestSummary,
     BacktestWindow,
     EquityPoint,
+    ExitRules,
     ItemEquityPoint,
     ItemEquitySeries,
 )
-from .ths_client import TongHuaShunClient
+from .circuit_breaker import OPEN, CircuitOpenError
+from .ingestor import refresh_code_quotes
+from .ths_client import TongHuaShunClient, ths_breaker
 from .data_models import QuoteRecord
+from .backtest_writer import backtest_writer, persist_backtests
+from .history_archive import load_archived_backtest
+from .item_memo import MemoRecord, item_memo
+from .market_index import get_market_index, percentile
+from .quote_cache import quote_cache, sync_marker_mtime
+from .shared_quotes import PRICE_FIELDS, SharedSegment, shared_quotes
+from .equity_codec import ColumnarOptions, EquityData, encode_columnar
+from .single_flight import SingleFlight
+from .warm_state import warm_state
+
+logger = logging.getLogger(__name__)
 
 ANNUAL_TRADING_DAYS = 244
+# Exit-rule holds shorter than this report their raw return as ``ann``: compounding
+# a few days' move to a full year explodes and would drive exit-grid rankings.
+MIN_ANNUALIZE_DAYS = 30
+# Part of every memo key; bump when per-stock metrics change so stored results are not reused.
+MEMO_CALC_VERSION = 3
+
+backtest_flight = SingleFlight("backtest")
+
+# code -> monotonic time of the last background THS refresh, and the tasks still running.
+_revalidated: Dict[str, float] = {}
+_revalidations: set[asyncio.Task] = set()
 
 
 @dataclass
@@ -48,69 +85,394 @@ class ItemCalcResult:
     trading_days: int
 
 
+@dataclass
+class StockOutcome:
+    """A stock's result plus what is needed to serve it again without its quotes."""
+
+    result: ItemCalcResult
+    equity: EquityData | None
+    live_seed: dict | None
+
+
 async def run_backtest(session: AsyncSession, payload: BacktestRequest) -> BacktestResponse:
-    if not payload.stocks:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="请输入至少一只股票或代码")
-    if len(payload.stocks) > 20:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="一次最多回测 20 只股票")
+    backtest, equities = await _run_coalesced(payload)
+    return await _serialize_backtest(session, backtest, equities=equities)
 
-    window_end = payload.end_date or date.today()
-    if window_end <= payload.recommend_date:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="结束日期需晚于推荐日期")
 
-    stocks = await _resolve_stocks(session, payload.stocks)
+async def run_backtest_columnar(session: AsyncSession, payload: BacktestRequest, options: ColumnarOptions) -> dict:
+    backtest, equities = await _run_coalesced(payload)
+    return await _serialize_columnar(session, backtest, options, equities=equities)
+
+
+async def _run_coalesced(payload: BacktestRequest) -> tuple[Backtest, Dict[str, EquityData]]:
+    window_end = _validate_window(payload.stocks, payload.recommend_date, payload.end_date)
+    key = _backtest_fingerprint(payload, window_end)
+
+    async def execute() -> tuple[Backtest, Dict[str, EquityData]]:
+        # The flight outlives the leader's request, whose session FastAPI closes on disconnect.
+        async with SessionMaker() as own:
+            return await _execute_backtest(own, payload, window_end)
+
+    return await backtest_flight.do(key, execute)
+
+
+async def _execute_backtest(
+    session: AsyncSession, payload: BacktestRequest, window_end: date
+) -> tuple[Backtest, Dict[str, EquityData]]:
+    with stage("resolve_stocks"):
+        stocks = await _resolve_stocks(session, payload.stocks)
     if not stocks:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="未找到可回测的股票代码")
 
-    item_results: List[ItemCalcResult] = []
+    use_memo = get_settings().item_memo_enabled
+    memo: Dict[str, StockOutcome] = {}
+    if use_memo:
+        with stage("item_memo"):
+            memo = await _memo_lookup(session, stocks, payload, window_end)
+
+    quotes_by_code = {}
+    with stage("load_quotes"):
+        for stock in stocks:
+            if stock.code not in memo:
+                quotes_by_code[stock.code] = await _load_quotes(session, stock.code, payload.recommend_date, window_end)
+    with stage("compute"):
+        outcomes, fresh = _collect_outcomes(stocks, memo, quotes_by_code, payload, window_end)
+    if not outcomes:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="所选股票区间缺少行情数据")
+    if use_memo:
+        _memo_store(payload, window_end, fresh)
+
+    backtest = _build_backtest(payload, window_end, [outcome.result for outcome in outcomes])
+    _attach_live_state(backtest, payload, {outcome.result.code: outcome.live_seed for outcome in outcomes})
+    with stage("persist"):
+        await persist_backtests(session, [backtest])
+    ctx = current_context()
+    if ctx is not None:
+        ctx.tags["bt_id"] = backtest.bt_id
+    return backtest, {outcome.result.code: outcome.equity for outcome in outcomes if outcome.equity}
+
+
+def _collect_outcomes(
+    stocks: Sequence[Stock],
+    memo: Dict[str, StockOutcome],
+    quotes_by_code: Dict[str, List[QuoteView]],
+    payload: BacktestRequest,
+    window_end: date,
+) -> tuple[List[StockOutcome], List[StockOutcome]]:
+    """Memoized outcomes where available, computed ones otherwise; the second list is what to memoize."""
+    outcomes: List[StockOutcome] = []
+    fresh: List[StockOutcome] = []
     for stock in stocks:
-        quotes = await _load_quotes(session, stock.code, payload.recommend_date, window_end)
-        if not quotes:
+        outcome = memo.get(stock.code)
+        if outcome is not None:
+            outcomes.append(_with_name(outcome, stock.name))
             continue
-        result = _calculate_for_stock(stock, quotes, payload.recommend_date, window_end)
-        if result:
-            item_results.append(result)
+        quotes = quotes_by_code.get(stock.code)
+        outcome = _compute_outcome(stock, quotes, payload, window_end) if quotes else None
+        if outcome is not None:
+            outcomes.append(outcome)
+            fresh.append(outcome)
+    return outcomes, fresh
 
-    if not item_results:
-        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="所选股票区间缺少行情数据")
 
+def _compute_outcome(
+    stock: Stock, quotes: List[QuoteView], payload: BacktestRequest, window_end: date
+) -> StockOutcome | None:
+    result = _calculate_for_stock(stock, quotes, payload.recommend_date, window_end, payload.exit_rules)
+    if not result:
+        return None
+    held = _slice_quotes(quotes, result.buy_date, result.sell_date)
+    return StockOutcome(
+        result=result,
+        equity=_equity_data(result.code, result.name, result.buy_price, held),
+        live_seed=_live_seed(result, quotes) if payload.exit_rules is None else None,
+    )
+
+
+def _with_name(outcome: StockOutcome, name: str) -> StockOutcome:
+    # Memo entries are shared; follow renames without mutating them.
+    if outcome.result.name == name:
+        return outcome
+    equity = replace(outcome.equity, name=name) if outcome.equity else None
+    return replace(outcome, result=replace(outcome.result, name=name), equity=equity)
+
+
+def _memo_key(code: str, payload: BacktestRequest, window_end: date) -> str:
+    raw = json.dumps(
+        {
+            "code": code,
+            "recommend_date": payload.recommend_date.isoformat(),
+            "window_end": window_end.isoformat(),
+            "price_adjust": payload.price_adjust,
+            "exit_rules": payload.exit_rules.model_dump() if payload.exit_rules else None,
+            "calc": MEMO_CALC_VERSION,
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+async def _memo_lookup(
+    session: AsyncSession, stocks: Sequence[Stock], payload: BacktestRequest, window_end: date
+) -> Dict[str, StockOutcome]:
+    keys = {_memo_key(stock.code, payload, window_end): stock.code for stock in stocks}
+    found = await item_memo.get_many(session, list(keys), _outcome_from_payload)
+    return {keys[key]: outcome for key, outcome in found.items()}
+
+
+def _memo_store(payload: BacktestRequest, window_end: date, outcomes: Sequence[StockOutcome]) -> None:
+    settings = get_settings()
+    ttl = settings.item_memo_row_ttl_s
+    if window_end >= date.today():
+        # Today's bar may still be ingested (and open-ended windows get a new key daily), so memoize briefly.
+        ttl = settings.item_memo_recent_ttl_s
+    expires_at = datetime.utcnow() + timedelta(seconds=ttl)
+    item_memo.put_many(
+        [
+            MemoRecord(
+                key=_memo_key(outcome.result.code, payload, window_end),
+                code=outcome.result.code,
+                value=outcome,
+                payload=_outcome_payload(outcome),
+                expires_at=expires_at,
+            )
+            for outcome in outcomes
+        ]
+    )
+
+
+def _outcome_payload(outcome: StockOutcome) -> dict:
+    result = asdict(outcome.result)
+    result["buy_date"] = outcome.result.buy_date.isoformat()
+    result["sell_date"] = outcome.result.sell_date.isoformat()
+    equity = None
+    if outcome.equity:
+        equity = {"dates": [day.toordinal() for day in outcome.equity.dates], "rets": outcome.equity.rets}
+    live_seed = None
+    if outcome.live_seed:
+        live_seed = {**outcome.live_seed, "last_date": outcome.live_seed["last_date"].isoformat()}
+    return {"result": result, "equity": equity, "live_seed": live_seed}
+
+
+def _outcome_from_payload(payload: dict) -> StockOutcome:
+    raw = payload["result"]
+    result = ItemCalcResult(
+        **{**raw, "buy_date": date.fromisoformat(raw["buy_date"]), "sell_date": date.fromisoformat(raw["sell_date"])}
+    )
+    equity = None
+    if payload.get("equity"):
+        dates = [date.fromordinal(day) for day in payload["equity"]["dates"]]
+        equity = EquityData(code=result.code, name=result.name, dates=dates, rets=payload["equity"]["rets"])
+    live_seed = payload.get("live_seed")
+    if live_seed:
+        live_seed = {**live_seed, "last_date": date.fromisoformat(live_seed["last_date"])}
+    return StockOutcome(result=result, equity=equity, live_seed=live_seed)
+
+
+async def run_backtest_batch(session: AsyncSession, payloads: Sequence[BacktestRequest]) -> BacktestBatchResponse:
+    """Run independent backtests against one shared load of each code's quote span.
+
+    Codes answered by the item memo for a given backtest are not loaded for it.
+    """
+    results: List[BacktestBatchResult] = [BacktestBatchResult(index=idx) for idx in range(len(payloads))]
+    plans: List[tuple[int, BacktestRequest, date, List[Stock], Dict[str, StockOutcome]]] = []
+    stock_cache: Dict[str, Stock | None] = {}
+    spans: Dict[str, tuple[date, date]] = {}
+    use_memo = get_settings().item_memo_enabled
+
+    for idx, payload in enumerate(payloads):
+        try:
+            window_end = _validate_window(payload.stocks, payload.recommend_date, payload.end_date)
+        except HTTPException as exc:
+            results[idx].error = exc.detail
+            continue
+        stocks = await _resolve_stocks(session, payload.stocks, stock_cache)
+        if not stocks:
+            results[idx].error = "未找到可回测的股票代码"
+            continue
+        memo = await _memo_lookup(session, stocks, payload, window_end) if use_memo else {}
+        for stock in stocks:
+            if stock.code in memo:
+                continue
+            start, end = spans.get(stock.code, (payload.recommend_date, window_end))
+            spans[stock.code] = (min(start, payload.recommend_date), max(end, window_end))
+        plans.append((idx, payload, window_end, stocks, memo))
+
+    batch_quotes: Dict[str, List[QuoteView]] = {}
+    for code, (start, end) in spans.items():
+        batch_quotes[code] = await _load_quotes(session, code, start, end)
+
+    built: List[tuple[int, Backtest, Dict[str, EquityData]]] = []
+    for idx, payload, window_end, stocks, memo in plans:
+        quotes_by_code = {
+            code: _slice_quotes(batch_quotes[code], payload.recommend_date, window_end)
+            for code in (stock.code for stock in stocks)
+            if code in batch_quotes
+        }
+        outcomes, fresh = _collect_outcomes(stocks, memo, quotes_by_code, payload, window_end)
+        if not outcomes:
+            results[idx].error = "所选股票区间缺少行情数据"
+            continue
+        if use_memo:
+            _memo_store(payload, window_end, fresh)
+        backtest = _build_backtest(payload, window_end, [outcome.result for outcome in outcomes])
+        _attach_live_state(backtest, payload, {outcome.result.code: outcome.live_seed for outcome in outcomes})
+        equities = {outcome.result.code: outcome.equity for outcome in outcomes if outcome.equity}
+        built.append((idx, backtest, equities))
+
+    if built:
+        await persist_backtests(session, [backtest for _, backtest, _ in built])
+    for idx, backtest, equities in built:
+        results[idx].result = await _serialize_backtest(session, backtest, equities=equities)
+    return BacktestBatchResponse(items=results)
+
+
+def _build_backtest(
+    payload: BacktestRequest, window_end: date, item_results: Sequence[ItemCalcResult], bt_id: str | None = None
+) -> Backtest:
     summary = _aggregate_summary(item_results)
-    bt_id = str(uuid.uuid4())
+    bt_id = bt_id or str(uuid.uuid4())
     backtest = Backtest(
         bt_id=bt_id,
+        user_id=payload.user_id,
         start=payload.recommend_date,
         end=window_end,
         benchmark=payload.benchmark,
         summary_json=summary.model_dump(),
+        created_at=datetime.utcnow(),
+        live_items=[],
     )
     for item in item_results:
-        backtest.items.append(
-            BacktestItem(
-                bt_id=bt_id,
-                code=item.code,
-                name=item.name,
-                buy_date=item.buy_date,
-                buy_price=item.buy_price,
-                sell_date=item.sell_date,
-                sell_price=item.sell_price,
-                ret=item.ret,
-                excess=item.ret - summary.bench_ret,
-                ann=item.ann,
-                sharpe=item.sharpe,
-                mdd=item.mdd,
-                calmar=item.calmar,
-                score=item.score,
-                grade=item.grade,
-                flags=item.flags,
-            )
-        )
+        backtest.items.append(_to_item_row(item, bt_id, summary.bench_ret))
+    return backtest
+
+
+def _attach_live_state(backtest: Backtest, payload: BacktestRequest, seeds: Dict[str, dict | None]) -> None:
+    """Mark open-ended backtests live with the running state ``live_backtest`` advances."""
+    if payload.end_date is not None or payload.exit_rules is not None:
+        return
+    for item in backtest.items:
+        seed = seeds.get(item.code)
+        if seed:
+            backtest.live_items.append(BacktestLiveItem(bt_id=backtest.bt_id, code=item.code, **seed))
 
-    session.add(backtest)
-    await session.commit()
-    loaded = await _load_backtest(session, bt_id)
-    if not loaded:
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="回测结果生成失败")
-    return await _serialize_backtest(session, loaded)
+
+def _live_seeds(
+    item_results: Sequence[ItemCalcResult], quotes_by_code: Dict[str, List[QuoteView]]
+) -> Dict[str, dict | None]:
+    return {result.code: _live_seed(result, quotes_by_code.get(result.code, [])) for result in item_results}
+
+
+def _live_seed(result: ItemCalcResult, quotes: Sequence[QuoteView]) -> dict | None:
+    quotes = [q for q in quotes if q.date <= result.sell_date]
+    buy_quote = next((q for q in quotes if q.date == result.buy_date), None)
+    if buy_quote is None:
+        return None
+    returns = _calc_daily_returns(quotes)
+    mean = statistics.fmean(returns) if returns else 0.0
+    return {
+        "last_date": quotes[-1].date,
+        "last_close": quotes[-1].close,
+        "buy_price": buy_quote.open,
+        "n": len(returns),
+        "mean": mean,
+        "m2": sum((value - mean) ** 2 for value in returns),
+        "peak": max([buy_quote.open] + [q.close for q in quotes]),
+        "mdd": result.mdd or 0.0,
+    }
+
+
+def _to_item_row(item: ItemCalcResult, bt_id: str, bench_ret: float) -> BacktestItem:
+    return BacktestItem(
+        bt_id=bt_id,
+        code=item.code,
+        name=item.name,
+        buy_date=item.buy_date,
+        buy_price=item.buy_price,
+        sell_date=item.sell_date,
+        sell_price=item.sell_price,
+        ret=item.ret,
+        excess=item.ret - bench_ret,
+        ann=item.ann,
+        sharpe=item.sharpe,
+        mdd=item.mdd,
+        calmar=item.calmar,
+        score=item.score,
+        grade=item.grade,
+        flags=item.flags,
+    )
+
+
+async def open_backtest_stream(session: AsyncSession, payload: BacktestRequest) -> AsyncIterator[dict]:
+    """Validate eagerly, then return a generator emitting one event per finished stock.
+
+    Events are ``{"type": "item", ...}`` in completion order followed by a final
+    ``{"type": "summary", ...}`` (or ``{"type": "error", ...}``).
+    """
+    window_end = _validate_window(payload.stocks, payload.recommend_date, payload.end_date)
+    stocks = await _resolve_stocks(session, payload.stocks)
+    if not stocks:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="未找到可回测的股票代码")
+    return _stream_backtest(payload, window_end, stocks)
+
+
+async def _stream_backtest(payload: BacktestRequest, window_end: date, stocks: Sequence[Stock]) -> AsyncIterator[dict]:
+    bt_id = str(uuid.uuid4())
+    bench_ret, _ = _benchmark_returns()
+
+    async def compute(position: int, stock: Stock):
+        async with SessionMaker() as load_session:
+            quotes = await _load_quotes(load_session, stock.code, payload.recommend_date, window_end)
+        if not quotes:
+            return position, quotes, None
+        return position, quotes, _calculate_for_stock(stock, quotes, payload.recommend_date, window_end, payload.exit_rules)
+
+    tasks = [asyncio.ensure_future(compute(position, stock)) for position, stock in enumerate(stocks)]
+    finished: List[tuple[int, ItemCalcResult]] = []
+    quotes_by_code: Dict[str, List[QuoteView]] = {}
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            position, quotes, result = await next_done
+            if not result:
+                continue
+            finished.append((position, result))
+            quotes_by_code[result.code] = quotes
+            held = _slice_quotes(quotes, result.buy_date, result.sell_date)
+            equity_data = _equity_data(result.code, result.name, result.buy_price, held)
+            equity = _to_equity_series(equity_data) if equity_data else None
+            item = _item_schema(_to_item_row(result, bt_id, bench_ret))
+            section = _market_section(result.buy_date, result.sell_date)
+            if section is not None:
+                item.market_pct = percentile(section, item.ret)
+            yield {
+                "type": "item",
+                "item": item.model_dump(mode="json"),
+                "equity": equity.model_dump(mode="json") if equity else None,
+            }
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    if not finished:
+        yield {"type": "error", "detail": "所选股票区间缺少行情数据"}
+        return
+
+    item_results = [result for _, result in sorted(finished, key=lambda pair: pair[0])]
+    backtest = _build_backtest(payload, window_end, item_results, bt_id)
+    _attach_live_state(backtest, payload, _live_seeds(item_results, quotes_by_code))
+    async with SessionMaker() as write_session:
+        await persist_backtests(write_session, [backtest])
+    summary = _with_market(BacktestSummary(**backtest.summary_json), [_item_schema(item) for item in backtest.items])
+    window = _window_for(backtest)
+    yield {
+        "type": "summary",
+        "bt_id": bt_id,
+        "window": window.model_dump(mode="json"),
+        "benchmark": backtest.benchmark,
+        "summary": summary.model_dump(mode="json"),
+        "equity": [point.model_dump(mode="json") for point in _portfolio_equity(window, summary)],
+        "live": bool(backtest.live_items),
+    }
 
 
 async def get_backtest_response(session: AsyncSession, bt_id: str) -> BacktestResponse:
@@ -120,26 +482,95 @@ async def get_backtest_response(session: AsyncSession, bt_id: str) -> BacktestRe
     return await _serialize_backtest(session, backtest)
 
 
+async def get_backtest_columnar(session: AsyncSession, bt_id: str, options: ColumnarOptions) -> dict:
+    backtest = await _load_backtest(session, bt_id)
+    if not backtest:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="回测不存在")
+    return await _serialize_columnar(session, backtest, options)
+
+
+def _backtest_fingerprint(payload: BacktestRequest, window_end: date) -> str:
+    raw = json.dumps(
+        {
+            "stocks": [token.strip() for token in payload.stocks],
+            "recommend_date": payload.recommend_date.isoformat(),
+            "window_end": window_end.isoformat(),
+            "benchmark": payload.benchmark,
+            "price_adjust": payload.price_adjust,
+            "exit_rules": payload.exit_rules.model_dump() if payload.exit_rules else None,
+            "user_id": payload.user_id,
+        },
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def _validate_window(tokens: Sequence[str], recommend_date: date, end_date: date | None) -> date:
+    if not tokens:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="请输入至少一只股票或代码")
+    if len(tokens) > 20:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="一次最多回测 20 只股票")
+
+    window_end = end_date or date.today()
+    if window_end <= recommend_date:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="结束日期需晚于推荐日期")
+    return window_end
+
+
 async def _load_backtest(session: AsyncSession, bt_id: str) -> Backtest | None:
-    stmt = select(Backtest).options(selectinload(Backtest.items)).where(Backtest.bt_id == bt_id)
-    result = await session.execute(stmt)
-    return result.scalars().first()
+    pending = backtest_writer.pending(bt_id)
+    if pending is not None:
+        return pending
+    stmt = (
+        select(Backtest)
+        .options(selectinload(Backtest.items), selectinload(Backtest.live_items))
+        .where(Backtest.bt_id == bt_id)
+    )
+    backtest = (await session.execute(stmt)).scalars().first()
+    if backtest is None and has_read_replica:
+        # Just flushed rows may not have reached the replica yet.
+        async with SessionMaker() as primary:
+            backtest = (await primary.execute(stmt)).scalars().first()
+    if backtest is None:
+        # Spooled after a failed flush, possibly by another worker.
+        backtest = await backtest_writer.spooled(bt_id)
+    if backtest is None:
+        backtest = await load_archived_backtest(session, bt_id)
+    if backtest is None and get_settings().write_behind_enabled:
+        # Read-after-write across workers: another worker may still hold the backtest in its
+        # write-behind queue, which commits within one flush interval.
+        await asyncio.sleep(backtest_writer.flush_interval * 2)
+        async with SessionMaker() as primary:
+            backtest = (await primary.execute(stmt)).scalars().first()
+    return backtest
 
 
-async def _resolve_stocks(session: AsyncSession, tokens: Sequence[str]) -> List[Stock]:
+async def _resolve_stocks(
+    session: AsyncSession, tokens: Sequence[str], cache: Dict[str, Stock | None] | None = None
+) -> List[Stock]:
     resolved: List[Stock] = []
+    await warm_state.catch_up(session)
     for token in tokens:
         token = token.strip()
         if not token:
             continue
+        if cache is not None and token in cache:
+            if cache[token]:
+                resolved.append(cache[token])
+            continue
         stock = None
         normalized = _normalize_code(token)
         if normalized:
-            stock = await session.get(Stock, normalized)
+            stock = warm_state.stock(normalized) or await session.get(Stock, normalized)
+        if not stock:
+            stock = warm_state.stock_by_name(token)
         if not stock:
             stmt = select(Stock).where(Stock.name == token).limit(1)
             result = await session.execute(stmt)
             stock = result.scalars().first()
+        if cache is not None:
+            cache[token] = stock
         if stock:
             resolved.append(stock)
     return resolved
@@ -169,17 +600,222 @@ class QuoteView:
 
 
 async def _load_quotes(session: AsyncSession, code: str, start: date, end: date) -> List[QuoteView]:
+    settings = get_settings()
+    segment = shared_quotes.covers(code) if settings.shared_quotes_enabled else None
+    quotes = _segment_quotes(segment, code, start, end) if segment is not None else None
+    if quotes:
+        _maybe_revalidate(code, quotes[-1].date, end)
+        return quotes
+    if settings.quote_cache_enabled:
+        series = quote_cache.get(code)
+        # A one-off lookup reads just its window; the full history is loaded once the code comes back.
+        if series is None and quote_cache.seen_before(code) and quote_cache.would_admit(code):
+            series = await _load_series(session, code)
+            if series:
+                quote_cache.put(code, series, _series_bytes(series))
+        if series is not None:
+            quotes = _slice_quotes(series, start, end)
+        else:
+            quotes = await _query_quotes(session, code, start, end)
+    else:
+        quotes = await _query_quotes(session, code, start, end)
+    if quotes:
+        # Serve what is stored even when it lags behind ``end``; THS is consulted off the request path.
+        _maybe_revalidate(code, quotes[-1].date, end)
+        return quotes
+    ths_client = TongHuaShunClient()
+    with stage("quotes_ths"):
+        try:
+            fetched = await ths_client.get_daily_quotes_async(code, start, end)
+        except CircuitOpenError:
+            return []
+        return [_to_quote_view(r) for r in fetched]
+
+
+def _segment_quotes(segment: SharedSegment, code: str, start: date, end: date) -> List[QuoteView] | None:
+    window = segment.window(code, start, end)
+    if window is None:
+        return None
+    lo, hi = window
+    days = segment.dates[lo:hi].tolist()
+    columns = {name: segment.columns[name][lo:hi].tolist() for name in PRICE_FIELDS}
+    quotes: List[QuoteView] = []
+    for pos, day in enumerate(days):
+        values = {name: columns[name][pos] for name in PRICE_FIELDS}
+        for name in ("volume", "amount", "turnover", "adj_close"):
+            if values[name] != values[name]:
+                values[name] = None
+        quotes.append(QuoteView(date=date.fromordinal(day), flags=segment.flags.get(lo + pos, []), **values))
+    return quotes
+
+
+async def _query_quotes(session: AsyncSession, code: str, start: date, end: date) -> List[QuoteView]:
     stmt = (
         select(QuoteDaily)
         .where(QuoteDaily.code == code, QuoteDaily.date >= start, QuoteDaily.date <= end)
         .order_by(QuoteDaily.date.asc())
     )
-    result = await session.execute(stmt)
-    records = list(result.scalars().all())
-    if records:
-        return [_to_quote_view(r) for r in records]
-    ths_client = TongHuaShunClient()
-    return [_to_quote_view(r) for r in ths_client.get_daily_quotes(code, start, end)]
+    with stage("quotes_db"):
+        async with read_session(session) as reader:
+            result = await reader.execute(stmt)
+            return [_to_quote_view(r) for r in result.scalars().all()]
+
+
+async def _load_series(session: AsyncSession, code: str) -> List[QuoteView]:
+    """Every stored bar of ``code``; cached whole so any window is a bisect away."""
+    stmt = select(QuoteDaily).where(QuoteDaily.code == code).order_by(QuoteDaily.date.asc())
+    with stage("quotes_db"):
+        async with read_session(session) as reader:
+            result = await reader.execute(stmt)
+            return [_to_quote_view(r) for r in result.scalars().all()]
+
+
+def _quote_view_bytes() -> int:
+    sample = QuoteView(date.today(), 1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0, [])
+    fields = sum(sys.getsizeof(value) for value in vars(sample).values())
+    # Instance, its __dict__, the field values and the list slot pointing at it.
+    return sys.getsizeof(sample) + sys.getsizeof(vars(sample)) + fields + 8
+
+
+def _series_bytes(series: Sequence[QuoteView]) -> int:
+    return sys.getsizeof(series) + len(series) * QUOTE_VIEW_BYTES
+
+
+async def prewarm_quote_cache(limit: int | None = None) -> int:
+    """Load the series of the codes backtested most over the last few days, hottest first."""
+    settings = get_settings()
+    limit = settings.quote_cache_prewarm_top if limit is None else limit
+    since = datetime.utcnow() - timedelta(days=settings.quote_cache_prewarm_days)
+    stmt = (
+        select(BacktestItem.code, func.count().label("hits"))
+        .join(Backtest, Backtest.bt_id == BacktestItem.bt_id)
+        .where(Backtest.created_at >= since)
+        .group_by(BacktestItem.code)
+        .order_by(func.count().desc())
+        .limit(limit)
+    )
+    warmed = 0
+    async with ReadSessionMaker() as session:
+        popular = (await session.execute(stmt)).all()
+        for code, hits in popular:
+            quote_cache.record(code, hits)
+        for code, _ in popular:
+            series = await _load_series(session, code)
+            if not quote_cache.put(code, series, _series_bytes(series)):
+                break
+            warmed += 1
+    logger.info("Prewarmed quote cache with %s of %s popular codes (%s bytes)", warmed, len(popular), quote_cache.bytes)
+    return warmed
+
+
+async def watch_quote_sync() -> None:
+    """Warm the cache at startup, then drop and re-warm it whenever the sync marker moves.
+
+    Between syncs, the ``quote_refresh`` feed carries the codes any worker
+    refreshed in the background, so this process drops its copies of them too.
+    """
+    seen = sync_marker_mtime()
+    refreshes = await _follow_quote_refreshes(None)
+    if get_settings().quote_cache_enabled:
+        await _safe_prewarm()
+    while True:
+        settings = get_settings()
+        await asyncio.sleep(settings.quote_cache_poll_s)
+        refreshes = await _follow_quote_refreshes(refreshes)
+        mtime = sync_marker_mtime()
+        if mtime == seen:
+            continue
+        seen = mtime
+        quote_cache.clear()
+        # A sync replaces bars in bulk; memoized results computed from them must not outlive it here.
+        item_memo.clear()
+        if settings.quote_cache_enabled:
+            await _safe_prewarm()
+
+
+async def _follow_quote_refreshes(after: int | None) -> int | None:
+    """Apply feed rows past ``after`` and return the new position; ``None`` starts at the current end."""
+    try:
+        async with ReadSessionMaker() as session:
+            if after is None:
+                return (await session.execute(select(func.max(QuoteRefresh.id)))).scalar() or 0
+            rows = (
+                await session.execute(
+                    select(QuoteRefresh.id, QuoteRefresh.code, QuoteRefresh.rows)
+                    .where(QuoteRefresh.id > after)
+                    .order_by(QuoteRefresh.id)
+                )
+            ).all()
+    except Exception:  # noqa: BLE001
+        logger.exception("Polling the quote refresh feed failed")
+        return after
+    if not rows:
+        return after
+    now = time.monotonic()
+    for _, code, _ in rows:
+        _revalidated[code] = now
+    refreshed = [code for _, code, stored in rows if stored]
+    quote_cache.invalidate(refreshed)
+    shared_quotes.invalidate(refreshed)
+    item_memo.forget(refreshed)
+    return rows[-1][0]
+
+
+async def _safe_prewarm() -> None:
+    try:
+        await prewarm_quote_cache()
+    except Exception:  # noqa: BLE001
+        logger.exception("Quote cache prewarm failed")
+
+
+def _maybe_revalidate(code: str, last_stored: date, end: date) -> None:
+    settings = get_settings()
+    expected = min(end, date.today())
+    if last_stored >= expected - timedelta(days=settings.quotes_stale_grace_days):
+        return
+    now = time.monotonic()
+    last = _revalidated.get(code)
+    if last is not None and now - last < settings.quotes_revalidate_interval_s:
+        return
+    if ths_breaker.state == OPEN:
+        return
+    _revalidated[code] = now
+    task = asyncio.ensure_future(_revalidate(code, last_stored + timedelta(days=1), expected))
+    _revalidations.add(task)
+    task.add_done_callback(_revalidations.discard)
+
+
+async def _revalidate(code: str, start: date, end: date) -> None:
+    try:
+        if await _refreshed_elsewhere(code):
+            return
+        stored = await refresh_code_quotes(code, start, end)
+    except CircuitOpenError:
+        return
+    except Exception:  # noqa: BLE001
+        logger.exception("Background quote refresh failed for %s", code)
+        return
+    if stored:
+        logger.info("Refreshed %s stale quote rows for %s", stored, code)
+
+
+async def _refreshed_elsewhere(code: str) -> bool:
+    """Whether another worker refreshed ``code`` within the interval; its feed row reaches us on the next poll."""
+    interval = timedelta(seconds=get_settings().quotes_revalidate_interval_s)
+    async with SessionMaker() as session:
+        last = (
+            await session.execute(select(func.max(QuoteRefresh.created_at)).where(QuoteRefresh.code == code))
+        ).scalar()
+    return last is not None and datetime.utcnow() - last < interval
+
+
+def _slice_quotes(quotes: Sequence[QuoteView], start: date, end: date) -> List[QuoteView]:
+    lo = bisect_left(quotes, start, key=lambda q: q.date)
+    hi = bisect_right(quotes, end, key=lambda q: q.date)
+    return list(quotes[lo:hi])
+
+
+QUOTE_VIEW_BYTES = _quote_view_bytes()
 
 
 def _to_quote_view(obj: QuoteRecord | QuoteDaily) -> QuoteView:
@@ -198,8 +834,19 @@ def _to_quote_view(obj: QuoteRecord | QuoteDaily) -> QuoteView:
     )
 
 
-def _calculate_for_stock(stock: Stock, quotes: List[QuoteDaily], recommend_date: date, window_end: date) -> ItemCalcResult | None:
-    buy_quote = next((q for q in quotes if q.date > recommend_date), quotes[0])
+def _calculate_for_stock(
+    stock: Stock,
+    quotes: List[QuoteDaily],
+    recommend_date: date,
+    window_end: date,
+    exit_rules: ExitRules | None = None,
+) -> ItemCalcResult | None:
+    buy_index = next((idx for idx, q in enumerate(quotes) if q.date > recommend_date), 0)
+    buy_quote = quotes[buy_index]
+    exit_flag = None
+    if exit_rules is not None and buy_quote.open > 0:
+        sell_index, exit_flag = _apply_exit_rules(quotes, buy_index, buy_quote.open, exit_rules)
+        quotes = quotes[: sell_index + 1]
     sell_quote = next((q for q in reversed(quotes) if q.date <= window_end), quotes[-1])
     if buy_quote.date >= sell_quote.date:
         return None
@@ -211,7 +858,10 @@ def _calculate_for_stock(stock: Stock, quotes: List[QuoteDaily], recommend_date:
 
     ret = sell_price / buy_price - 1
     trading_days = max(1, (sell_quote.date - buy_quote.date).days)
-    ann = annualize(ret, trading_days)
+    if exit_rules is not None and trading_days < MIN_ANNUALIZE_DAYS:
+        ann = ret
+    else:
+        ann = annualize(ret, trading_days)
 
     daily_returns = _calc_daily_returns(quotes)
     sharpe = calc_sharpe(daily_returns)
@@ -223,6 +873,8 @@ def _calculate_for_stock(stock: Stock, quotes: List[QuoteDaily], recommend_date:
     flags: List[str] = []
     if trading_days < 2:
         flags.append("SHORT_WINDOW")
+    if exit_flag:
+        flags.append(exit_flag)
     return ItemCalcResult(
         code=stock.code,
         name=stock.name,
@@ -242,6 +894,32 @@ def _calculate_for_stock(stock: Stock, quotes: List[QuoteDaily], recommend_date:
     )
 
 
+def _apply_exit_rules(
+    quotes: Sequence[QuoteDaily], buy_index: int, buy_price: float, rules: ExitRules
+) -> tuple[int, str | None]:
+    """Return the index of the exit bar and the rule that fired (None when held to the end).
+
+    Rules are checked on each close after the buy bar; the grid evaluator in
+    ``exit_grid`` mirrors these semantics over the whole parameter space.
+    """
+    peak = buy_price
+    for idx in range(buy_index, len(quotes)):
+        close = quotes[idx].close
+        peak = max(peak, close)
+        if idx == buy_index:
+            continue
+        ret = close / buy_price - 1
+        if rules.stop_loss is not None and ret <= -rules.stop_loss:
+            return idx, "STOP_LOSS"
+        if rules.take_profit is not None and ret >= rules.take_profit:
+            return idx, "TAKE_PROFIT"
+        if rules.trailing_stop is not None and close / peak - 1 <= -rules.trailing_stop:
+            return idx, "TRAILING_STOP"
+        if rules.max_hold_days is not None and idx - buy_index >= rules.max_hold_days:
+            return idx, "MAX_HOLD"
+    return len(quotes) - 1, None
+
+
 def _aggregate_summary(items: List[ItemCalcResult]) -> BacktestSummary:
     win_rate = sum(1 for item in items if item.ret > 0) / len(items)
     avg_ret = statistics.mean(item.ret for item in items)
@@ -256,8 +934,7 @@ def _aggregate_summary(items: List[ItemCalcResult]) -> BacktestSummary:
         item.calmar is not None for item in items
     ) else None
 
-    bench_ret = 0.0
-    bench_ann = 0.0
+    bench_ret, bench_ann = _benchmark_returns()
     excess = avg_ret - bench_ret
 
     return BacktestSummary(
@@ -273,38 +950,22 @@ def _aggregate_summary(items: List[ItemCalcResult]) -> BacktestSummary:
     )
 
 
-async def _serialize_backtest(session: AsyncSession, bt: Backtest) -> BacktestResponse:
-    items = [
-        BacktestItemSchema(
-            code=item.code,
-            name=item.name,
-            buy_date=item.buy_date,
-            buy_price=item.buy_price,
-            sell_date=item.sell_date,
-            sell_price=item.sell_price,
-            ret=item.ret,
-            excess=item.excess,
-            ann=item.ann,
-            sharpe=item.sharpe,
-            mdd=item.mdd,
-            calmar=item.calmar,
-            score=item.score,
-            grade=item.grade,
-            flags=item.flags or [],
-        )
-        for item in bt.items
-    ]
+def _benchmark_returns() -> tuple[float, float]:
+    # Benchmark index series are not ingested yet, so the benchmark is flat.
+    return 0.0, 0.0
+
+
+async def _serialize_backtest(
+    session: AsyncSession,
+    bt: Backtest,
+    equities: Dict[str, EquityData] | None = None,
+) -> BacktestResponse:
+    items = [_item_schema(item) for item in bt.items]
     summary = BacktestSummary(**bt.summary_json)
-    window = BacktestWindow(
-        start=bt.start,
-        end=bt.end,
-        trading_days=(bt.end - bt.start).days,
-    )
-    equity = [
-        EquityPoint(date=window.start, portfolio_nv=1.0, bench_nv=1.0),
-        EquityPoint(date=window.end, portfolio_nv=1.0 + summary.ret, bench_nv=1.0 + summary.bench_ret),
-    ]
-    item_equities = await _build_item_equities(session, bt.items)
+    summary = _with_market(summary, items)
+    window = _window_for(bt)
+    equity = _portfolio_equity(window, summary)
+    item_equities = await _build_item_equities(session, bt.items, equities)
     return BacktestResponse(
         bt_id=bt.bt_id,
         window=window,
@@ -313,29 +974,150 @@ async def _serialize_backtest(session: AsyncSession, bt: Backtest) -> BacktestRe
         equity=equity,
         item_equities=item_equities,
         items=items,
+        live=bool(bt.live_items),
     )
 
 
-async def _build_item_equities(session: AsyncSession, bt_items: Sequence[BacktestItem]) -> List[ItemEquitySeries]:
-    equities: List[ItemEquitySeries] = []
-    for bt_item in bt_items:
-        base_price = bt_item.buy_price or 0
-        if base_price <= 0:
-            continue
-        quotes = await _load_quotes(session, bt_item.code, bt_item.buy_date, bt_item.sell_date)
-        if not quotes:
-            continue
-        points: List[ItemEquityPoint] = []
-        for quote in quotes:
-            if quote.close <= 0:
+async def _serialize_columnar(
+    session: AsyncSession,
+    bt: Backtest,
+    options: ColumnarOptions,
+    equities: Dict[str, EquityData] | None = None,
+) -> dict:
+    items = [_item_schema(item) for item in bt.items]
+    summary = BacktestSummary(**bt.summary_json)
+    summary = _with_market(summary, items)
+    window = _window_for(bt)
+    item_equities = await _collect_equity_data(session, bt.items, equities)
+    return {
+        "bt_id": bt.bt_id,
+        "window": window.model_dump(mode="json"),
+        "benchmark": bt.benchmark,
+        "summary": summary.model_dump(mode="json"),
+        "equity": [point.model_dump(mode="json") for point in _portfolio_equity(window, summary)],
+        "item_equities": encode_columnar(item_equities, options),
+        "items": [item.model_dump(mode="json") for item in items],
+        "live": bool(bt.live_items),
+    }
+
+
+def _market_section(buy_date: date, sell_date: date):
+    """Sorted market returns over the bars a position was held, entry bar to exit bar.
+
+    Entries fill at the buy bar's open but the index only keeps closes, so the
+    market leg starts at the close before the buy bar.
+    """
+    index = get_market_index()
+    return index.returns_between(buy_date - timedelta(days=1), sell_date) if index is not None else None
+
+
+def _with_market(summary: BacktestSummary, items: Sequence[BacktestItemSchema]) -> BacktestSummary:
+    """Rank each item against the market over its own holding period, and the basket over its span.
+
+    ``market_ret`` is the equal-weight mean return of every code in the market
+    index from the first entry to the last exit: a pseudo-index built from
+    ``quotes_daily``, not the benchmark, whose ``bench_ret`` stays 0 until
+    benchmark series are ingested.
+    """
+    if not items:
+        return summary
+    for item in items:
+        section = _market_section(item.buy_date, item.sell_date)
+        if section is not None:
+            item.market_pct = percentile(section, item.ret)
+    section = _market_section(min(item.buy_date for item in items), max(item.sell_date for item in items))
+    if section is None:
+        return summary
+    return summary.model_copy(
+        update={"market_ret": float(section.mean()), "market_pct": percentile(section, summary.ret)}
+    )
+
+
+def _item_schema(item: BacktestItem) -> BacktestItemSchema:
+    return BacktestItemSchema(
+        code=item.code,
+        name=item.name,
+        buy_date=item.buy_date,
+        buy_price=item.buy_price,
+        sell_date=item.sell_date,
+        sell_price=item.sell_price,
+        ret=item.ret,
+        excess=item.excess,
+        ann=item.ann,
+        sharpe=item.sharpe,
+        mdd=item.mdd,
+        calmar=item.calmar,
+        score=item.score,
+        grade=item.grade,
+        flags=item.flags or [],
+    )
+
+
+def _window_for(bt: Backtest) -> BacktestWindow:
+    return BacktestWindow(
+        start=bt.start,
+        end=bt.end,
+        trading_days=(bt.end - bt.start).days,
+    )
+
+
+def _portfolio_equity(window: BacktestWindow, summary: BacktestSummary) -> List[EquityPoint]:
+    return [
+        EquityPoint(date=window.start, portfolio_nv=1.0, bench_nv=1.0),
+        EquityPoint(date=window.end, portfolio_nv=1.0 + summary.ret, bench_nv=1.0 + summary.bench_ret),
+    ]
+
+
+async def _build_item_equities(
+    session: AsyncSession,
+    bt_items: Sequence[BacktestItem],
+    equities: Dict[str, EquityData] | None = None,
+) -> List[ItemEquitySeries]:
+    collected = await _collect_equity_data(session, bt_items, equities)
+    return [_to_equity_series(data) for data in collected]
+
+
+async def _collect_equity_data(
+    session: AsyncSession,
+    bt_items: Sequence[BacktestItem],
+    known: Dict[str, EquityData] | None = None,
+) -> List[EquityData]:
+    equities: List[EquityData] = []
+    with stage("item_equities"):
+        for bt_item in bt_items:
+            base_price = bt_item.buy_price or 0
+            if base_price <= 0:
+                continue
+            if known is not None and bt_item.code in known:
+                equities.append(known[bt_item.code])
                 continue
-            ret = quote.close / base_price - 1
-            points.append(ItemEquityPoint(date=quote.date, ret=ret))
-        if points:
-            equities.append(ItemEquitySeries(code=bt_item.code, name=bt_item.name, points=points))
+            quotes = await _load_quotes(session, bt_item.code, bt_item.buy_date, bt_item.sell_date)
+            data = _equity_data(bt_item.code, bt_item.name, base_price, quotes)
+            if data:
+                equities.append(data)
     return equities
 
 
+def _equity_data(code: str, name: str, base_price: float, quotes: Sequence[QuoteView]) -> EquityData | None:
+    if base_price <= 0:
+        return None
+    dates: List[date] = []
+    rets: List[float] = []
+    for quote in quotes:
+        if quote.close <= 0:
+            continue
+        dates.append(quote.date)
+        rets.append(quote.close / base_price - 1)
+    if not dates:
+        return None
+    return EquityData(code=code, name=name, dates=dates, rets=rets)
+
+
+def _to_equity_series(data: EquityData) -> ItemEquitySeries:
+    points = [ItemEquityPoint(date=day, ret=ret) for day, ret in zip(data.dates, data.rets)]
+    return ItemEquitySeries(code=data.code, name=data.name, points=points)
+
+
 def _calc_daily_returns(quotes: List[QuoteDaily]) -> List[float]:
     returns: List[float] = []
     for prev, curr in zip(quotes, quotes[1:]):
@@ -0,0 +1,324 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import time
+from datetime import date, datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from ..core.config import get_settings
+from ..core.deps import SessionMaker
+from ..core.metrics import Counter, register_collector
+from ..core.profiling import to_thread
+from ..db.models import Backtest, BacktestItem, BacktestLiveItem
+
+logger = logging.getLogger(__name__)
+
+WRITE_BEHIND_ROWS = Counter("zlm_write_behind_backtests_total", "Backtests persisted by the write-behind writer.")
+
+_BACKTEST_COLUMNS = ("bt_id", "user_id", "start", "end", "benchmark", "summary_json", "created_at")
+_ITEM_COLUMNS = (
+    "bt_id", "code", "name", "buy_date", "buy_price", "sell_date", "sell_price", "ret", "excess",
+    "ann", "sharpe", "mdd", "calmar", "score", "grade", "flags",
+)
+_LIVE_COLUMNS = ("bt_id", "code", "last_date", "last_close", "buy_price", "n", "mean", "m2", "peak", "mdd")
+_DATE_FIELDS = {"start", "end", "buy_date", "sell_date", "last_date"}
+_DATETIME_FIELDS = {"created_at"}
+# Minimum gap between attempts to replay the spool while the writer is running.
+SPOOL_RETRY_S = 30.0
+
+
+class BacktestWriter:
+    """Batch backtest inserts off the request path.
+
+    Submitted backtests stay readable through ``pending()`` until their batch is
+    committed. Batches that cannot be written (database down, shutdown timeout)
+    are appended to a JSONL spool file, which stays readable through ``spooled()``
+    and is replayed on start and, while running, after the next successful flush.
+    """
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker[AsyncSession],
+        batch_size: int,
+        flush_interval: float,
+        spool_path: str,
+        stop_timeout: float,
+    ) -> None:
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.spool_path = Path(spool_path)
+        self.stop_timeout = stop_timeout
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._pending: Dict[str, Backtest] = {}
+        # Spooled by this process and not replayed yet.
+        self._spooled: Dict[str, Backtest] = {}
+        self._next_replay = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        try:
+            await self._replay_spool()
+        except Exception:  # noqa: BLE001
+            # Serving without the database is still useful; the spool is kept and retried later.
+            logger.exception("Replaying %s failed, keeping it for a later attempt", self.spool_path)
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run(), name="backtest-writer")
+
+    async def stop(self) -> None:
+        if not self.running:
+            return
+        self._queue.put_nowait(None)
+        try:
+            # wait_for cancels the writer on timeout; whatever it had not committed is still pending.
+            await asyncio.wait_for(self._task, self.stop_timeout)
+        except asyncio.TimeoutError:
+            unwritten = list(self._pending.values())
+            logger.error(
+                "Write-behind writer did not drain within %.1fs, spooling %s backtests", self.stop_timeout, len(unwritten)
+            )
+            self._spool_backtests(unwritten)
+            self._pending.clear()
+        self._task = None
+
+    def submit(self, backtests: Sequence[Backtest]) -> None:
+        """Queue ``backtests`` as one unit: they are always committed in the same transaction."""
+        for backtest in backtests:
+            self._pending[backtest.bt_id] = backtest
+        self._queue.put_nowait(list(backtests))
+
+    def pending(self, bt_id: str) -> Backtest | None:
+        return self._pending.get(bt_id) or self._spooled.get(bt_id)
+
+    async def spooled(self, bt_id: str) -> Backtest | None:
+        """A backtest waiting in the spool file, including ones spooled by other workers."""
+        backtest = self._spooled.get(bt_id)
+        if backtest is None:
+            backtest = await to_thread(_scan_spool, self.spool_path, bt_id)
+        return backtest
+
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            first = await self._queue.get()
+            if first is None:
+                break
+            batch: List[Backtest] = list(first)
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    nxt = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if nxt is None:
+                    stopping = True
+                    break
+                batch.extend(nxt)
+            await self._flush(batch)
+
+    async def _flush(self, batch: Sequence[Backtest]) -> None:
+        backtest_rows = [_backtest_row(bt) for bt in batch]
+        item_rows = [_item_row(item) for bt in batch for item in bt.items]
+        live_rows = [_live_row(live) for bt in batch for live in bt.live_items]
+        try:
+            await write_rows(self.session_factory, backtest_rows, item_rows, live_rows)
+            WRITE_BEHIND_ROWS.inc(len(batch), outcome="written")
+            written = True
+        except Exception:  # noqa: BLE001
+            logger.exception("Write-behind flush of %s backtests failed, spooling to %s", len(batch), self.spool_path)
+            self._spool(backtest_rows, item_rows, live_rows)
+            self._spooled.update((bt.bt_id, bt) for bt in batch)
+            WRITE_BEHIND_ROWS.inc(len(batch), outcome="spooled")
+            written = False
+        # Not in a finally: a batch interrupted by cancellation stays pending so stop() can spool it.
+        for bt in batch:
+            self._pending.pop(bt.bt_id, None)
+        if written and time.monotonic() >= self._next_replay and self.spool_path.exists():
+            self._next_replay = time.monotonic() + SPOOL_RETRY_S
+            try:
+                await self._replay_spool()
+            except Exception:  # noqa: BLE001
+                logger.exception("Replaying %s failed, keeping it for a later attempt", self.spool_path)
+
+    def _spool_backtests(self, batch: Sequence[Backtest]) -> None:
+        if batch:
+            self._spool(
+                [_backtest_row(bt) for bt in batch],
+                [_item_row(item) for bt in batch for item in bt.items],
+                [_live_row(live) for bt in batch for live in bt.live_items],
+            )
+
+    def _spool(self, backtest_rows: List[dict], item_rows: List[dict], live_rows: List[dict]) -> None:
+        self.spool_path.parent.mkdir(parents=True, exist_ok=True)
+        record = {"backtests": backtest_rows, "items": item_rows, "live_items": live_rows}
+        with self.spool_path.open("a", encoding="utf-8") as fh:
+            fh.write(json.dumps(record, default=_encode, ensure_ascii=False))
+            fh.write("\n")
+            # The spool is the only copy of these rows; it must survive a crash right after this call.
+            fh.flush()
+            os.fsync(fh.fileno())
+
+    async def _replay_spool(self) -> None:
+        # Claim the file by renaming it, so concurrent workers never replay (or drop) the same lines.
+        claimed = self.spool_path.with_name(f"{self.spool_path.name}.{os.getpid()}.replay")
+        try:
+            os.replace(self.spool_path, claimed)
+        except FileNotFoundError:
+            return
+        try:
+            replayed = await self._replay_file(claimed)
+        except BaseException:
+            _return_claim(claimed, self.spool_path)
+            raise
+        claimed.unlink()
+        for bt_id in replayed:
+            self._spooled.pop(bt_id, None)
+        logger.info("Replayed %s spooled backtests from %s", len(replayed), self.spool_path)
+
+    async def _replay_file(self, path: Path) -> List[str]:
+        backtest_rows: List[dict] = []
+        item_rows: List[dict] = []
+        live_rows: List[dict] = []
+        for record in _read_spool(path):
+            backtest_rows.extend(_decode_row(row) for row in record["backtests"])
+            item_rows.extend(_decode_row(row) for row in record["items"])
+            live_rows.extend(_decode_row(row) for row in record.get("live_items", []))
+        async with self.session_factory() as session:
+            existing = set(
+                (await session.execute(select(Backtest.bt_id).where(Backtest.bt_id.in_([r["bt_id"] for r in backtest_rows]))))
+                .scalars()
+                .all()
+            ) if backtest_rows else set()
+        backtest_rows = [row for row in backtest_rows if row["bt_id"] not in existing]
+        item_rows = [row for row in item_rows if row["bt_id"] not in existing]
+        live_rows = [row for row in live_rows if row["bt_id"] not in existing]
+        await write_rows(self.session_factory, backtest_rows, item_rows, live_rows)
+        return [row["bt_id"] for row in backtest_rows] + sorted(existing)
+
+
+def _read_spool(path: Path) -> List[dict]:
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines() if line.strip()]
+
+
+def _return_claim(claimed: Path, spool_path: Path) -> None:
+    # Append rather than rename back: other workers may have spooled new batches meanwhile.
+    with spool_path.open("a", encoding="utf-8") as fh:
+        fh.write(claimed.read_text(encoding="utf-8"))
+        fh.flush()
+        os.fsync(fh.fileno())
+    claimed.unlink()
+
+
+def _scan_spool(path: Path, bt_id: str) -> Backtest | None:
+    try:
+        lines = path.read_text(encoding="utf-8").splitlines()
+    except FileNotFoundError:
+        return None
+    needle = f'"{bt_id}"'
+    for line in lines:
+        if needle not in line:
+            continue
+        record = json.loads(line)
+        row = next((row for row in record["backtests"] if row["bt_id"] == bt_id), None)
+        if row is None:
+            continue
+        backtest = Backtest(**_decode_row(row))
+        for item in record["items"]:
+            if item["bt_id"] == bt_id:
+                backtest.items.append(BacktestItem(**_decode_row(item)))
+        for live in record.get("live_items", []):
+            if live["bt_id"] == bt_id:
+                backtest.live_items.append(BacktestLiveItem(**_decode_row(live)))
+        return backtest
+    return None
+
+
+async def write_rows(
+    session_factory: async_sessionmaker[AsyncSession],
+    backtest_rows: List[dict],
+    item_rows: List[dict],
+    live_rows: Sequence[dict] = (),
+) -> None:
+    if not backtest_rows:
+        return
+    async with session_factory() as session:
+        await session.execute(insert(Backtest), backtest_rows)
+        if item_rows:
+            await session.execute(insert(BacktestItem), item_rows)
+        if live_rows:
+            await session.execute(insert(BacktestLiveItem), list(live_rows))
+        await session.commit()
+
+
+def _backtest_row(bt: Backtest) -> dict:
+    row = {column: getattr(bt, column) for column in _BACKTEST_COLUMNS}
+    row["created_at"] = row["created_at"] or datetime.utcnow()
+    return row
+
+
+def _item_row(item: BacktestItem) -> dict:
+    return {column: getattr(item, column) for column in _ITEM_COLUMNS}
+
+
+def _live_row(live: BacktestLiveItem) -> dict:
+    return {column: getattr(live, column) for column in _LIVE_COLUMNS}
+
+
+def _encode(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"Cannot spool {type(value).__name__}")
+
+
+def _decode_row(row: dict) -> dict:
+    decoded = dict(row)
+    for name in _DATE_FIELDS & decoded.keys():
+        decoded[name] = date.fromisoformat(decoded[name])
+    for name in _DATETIME_FIELDS & decoded.keys():
+        decoded[name] = datetime.fromisoformat(decoded[name])
+    return decoded
+
+
+settings = get_settings()
+backtest_writer = BacktestWriter(
+    SessionMaker,
+    batch_size=settings.write_behind_batch_size,
+    flush_interval=settings.write_behind_flush_ms / 1000,
+    spool_path=settings.write_behind_spool_path,
+    stop_timeout=settings.write_behind_stop_timeout_s,
+)
+register_collector(
+    lambda: [
+        "# TYPE zlm_write_behind_queue_depth gauge",
+        f"zlm_write_behind_queue_depth {backtest_writer.queue_depth()}",
+    ]
+)
+
+
+async def persist_backtests(session: AsyncSession, backtests: Sequence[Backtest]) -> None:
+    """Hand backtests to the write-behind writer, or commit them inline when it is not running."""
+    if backtest_writer.running:
+        backtest_writer.submit(backtests)
+        return
+    session.add_all(backtests)
+    await session.commit()
@@ -0,0 +1,271 @@
+from __future__ import annotations
+
+import hashlib
+import io
+import json
+import logging
+import os
+import shutil
+import tarfile
+import tempfile
+from dataclasses import dataclass
+from datetime import date, datetime
+from pathlib import Path
+from typing import Dict, IO, List, Sequence
+
+import numpy as np
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..core.config import get_settings
+from ..core.deps import ReadSessionMaker, SessionMaker
+from ..db.models import ItemMemo, QuoteDaily, QuoteRefresh, Stock, StockChange
+from .quote_cache import mark_quotes_synced
+from .warm_state import write_warm_state
+
+logger = logging.getLogger(__name__)
+
+BUNDLE_VERSION = 1
+MANIFEST = "manifest.json"
+MARKET_INDEX_MEMBER = "market_index.npz"
+# Rows per .npz part: bounds memory on both ends and gives COPY / executemany a natural batch.
+PART_ROWS = 200_000
+STREAM_CHUNK = 20_000
+
+
+@dataclass(frozen=True)
+class BundleColumn:
+    name: str
+    kind: str  # "str" | "json" | "date" | "float" | "nullable_float"
+
+
+BUNDLE_TABLES: Dict[str, tuple] = {
+    "stocks": (
+        Stock,
+        (
+            BundleColumn("code", "str"),
+            BundleColumn("name", "str"),
+            BundleColumn("exchange", "str"),
+            BundleColumn("status_tags", "json"),
+        ),
+    ),
+    "quotes_daily": (
+        QuoteDaily,
+        (
+            BundleColumn("code", "str"),
+            BundleColumn("date", "date"),
+            BundleColumn("open", "float"),
+            BundleColumn("close", "float"),
+            BundleColumn("high", "float"),
+            BundleColumn("low", "float"),
+            BundleColumn("volume", "nullable_float"),
+            BundleColumn("amount", "nullable_float"),
+            BundleColumn("turnover", "nullable_float"),
+            BundleColumn("adj_close", "nullable_float"),
+            BundleColumn("flags", "json"),
+        ),
+    ),
+}
+
+
+class BundleError(RuntimeError):
+    """Raised when a bundle is malformed, fails verification or cannot be loaded."""
+
+
+async def export_bundle(output: str) -> dict:
+    """Snapshot ``stocks``, ``quotes_daily`` and the market index file into one tar of compressed column parts."""
+    target = Path(output)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp = target.with_suffix(target.suffix + ".tmp")
+    manifest: dict = {"version": BUNDLE_VERSION, "created_at": datetime.utcnow().isoformat(), "tables": {}}
+    with tempfile.TemporaryDirectory() as workdir, tarfile.open(tmp, "w") as tar:
+        async with ReadSessionMaker() as session:
+            for table, (model, columns) in BUNDLE_TABLES.items():
+                manifest["tables"][table] = await _export_table(session, tar, Path(workdir), table, model, columns)
+        index_path = Path(get_settings().market_index_path)
+        if index_path.exists():
+            tar.add(index_path, arcname=MARKET_INDEX_MEMBER)
+            manifest["market_index"] = {"file": MARKET_INDEX_MEMBER, "sha256": _sha256_file(index_path)}
+        payload = json.dumps(manifest, indent=2).encode("utf-8")
+        info = tarfile.TarInfo(MANIFEST)
+        info.size = len(payload)
+        tar.addfile(info, io.BytesIO(payload))
+    os.replace(tmp, target)
+    logger.info("Exported bundle %s: %s", target, {name: meta["rows"] for name, meta in manifest["tables"].items()})
+    return manifest
+
+
+async def _export_table(
+    session: AsyncSession, tar: tarfile.TarFile, workdir: Path, table: str, model, columns: Sequence[BundleColumn]
+) -> dict:
+    stmt = select(*(getattr(model, column.name) for column in columns)).order_by(
+        *(getattr(model, key.name) for key in model.__table__.primary_key)
+    )
+    parts: List[dict] = []
+    buffered: List[tuple] = []
+    rows = 0
+    result = await session.stream(stmt.execution_options(yield_per=STREAM_CHUNK))
+    async for partition in result.partitions():
+        buffered.extend(partition)
+        while len(buffered) >= PART_ROWS:
+            parts.append(_write_part(tar, workdir, table, len(parts), columns, buffered[:PART_ROWS]))
+            rows += PART_ROWS
+            del buffered[:PART_ROWS]
+    if buffered or not parts:
+        parts.append(_write_part(tar, workdir, table, len(parts), columns, buffered))
+        rows += len(buffered)
+    return {"rows": rows, "columns": [column.name for column in columns], "parts": parts}
+
+
+def _write_part(
+    tar: tarfile.TarFile, workdir: Path, table: str, seq: int, columns: Sequence[BundleColumn], rows: Sequence[tuple]
+) -> dict:
+    arrays = {column.name: _encode_column(column, [row[idx] for row in rows]) for idx, column in enumerate(columns)}
+    name = f"{table}-{seq:05d}.npz"
+    path = workdir / name
+    np.savez_compressed(path, **arrays)
+    tar.add(path, arcname=name)
+    meta = {"file": name, "rows": len(rows), "sha256": _sha256_file(path)}
+    path.unlink()
+    return meta
+
+
+def _encode_column(column: BundleColumn, values: list) -> np.ndarray:
+    if column.kind == "date":
+        return np.array([value.toordinal() for value in values], dtype=np.int32)
+    if column.kind in ("float", "nullable_float"):
+        return np.array([np.nan if value is None else value for value in values], dtype=np.float64)
+    if column.kind == "json":
+        values = [json.dumps(value or [], ensure_ascii=False) for value in values]
+    return np.array(["" if value is None else value for value in values], dtype=str)
+
+
+def _decode_column(column: BundleColumn, array: np.ndarray) -> list:
+    if column.kind == "date":
+        return [date.fromordinal(value) for value in array.tolist()]
+    if column.kind == "nullable_float":
+        return [None if value != value else value for value in array.tolist()]
+    return array.tolist()
+
+
+async def import_bundle(path: str, replace: bool = False) -> Dict[str, int]:
+    """Verify every checksum in ``path``, then bulk-load it: COPY on PostgreSQL, executemany on SQLite.
+
+    Refuses to load into non-empty tables unless ``replace`` is set, in which
+    case existing rows, the change feeds and memoized results computed from
+    them are removed first. Everything is loaded in one transaction, so a failed
+    import leaves the database as it was.
+    """
+    with tarfile.open(path, "r") as tar:
+        manifest = _read_manifest(tar)
+        _verify(tar, manifest)
+        loaded: Dict[str, int] = {}
+        async with SessionMaker() as session:
+            replaced = await _prepare_tables(session, replace)
+            now = datetime.utcnow()
+            for table, (_, columns) in BUNDLE_TABLES.items():
+                meta = manifest["tables"][table]
+                if meta["columns"] != [column.name for column in columns]:
+                    raise BundleError(f"{table} columns in bundle do not match this schema: {meta['columns']}")
+                loaded[table] = 0
+                for part in meta["parts"]:
+                    with np.load(_member(tar, part["file"]), allow_pickle=False) as data:
+                        decoded = [_decode_column(column, data[column.name]) for column in columns]
+                    stamps = [[now] * part["rows"]] * (2 if table == "quotes_daily" else 1)
+                    names = [column.name for column in columns] + (
+                        ["created_at", "updated_at"] if table == "quotes_daily" else ["updated_at"]
+                    )
+                    await _bulk_load(session, table, names, list(zip(*decoded, *stamps)))
+                    loaded[table] += part["rows"]
+                logger.info("Loaded %s rows into %s", loaded[table], table)
+            await session.commit()
+        if "market_index" in manifest:
+            target = Path(get_settings().market_index_path)
+            target.parent.mkdir(parents=True, exist_ok=True)
+            tmp = target.with_suffix(".tmp")
+            with _member(tar, manifest["market_index"]["file"]) as src, tmp.open("wb") as dst:
+                shutil.copyfileobj(src, dst)
+            os.replace(tmp, target)
+    mark_quotes_synced()
+    snapshot = Path(get_settings().warm_state_path)
+    if replaced and snapshot.exists():
+        # The old snapshot describes the replaced stock master and a feed position that no longer exists.
+        await write_warm_state(str(snapshot))
+    return loaded
+
+
+def _read_manifest(tar: tarfile.TarFile) -> dict:
+    try:
+        manifest = json.load(_member(tar, MANIFEST))
+    except (KeyError, json.JSONDecodeError) as exc:
+        raise BundleError(f"bundle has no readable {MANIFEST}") from exc
+    if manifest.get("version") != BUNDLE_VERSION:
+        raise BundleError(f"unsupported bundle version {manifest.get('version')}")
+    missing = set(BUNDLE_TABLES) - set(manifest.get("tables", {}))
+    if missing:
+        raise BundleError(f"bundle is missing tables: {sorted(missing)}")
+    return manifest
+
+
+def _verify(tar: tarfile.TarFile, manifest: dict) -> None:
+    """Check every part before touching the database so a corrupt bundle loads nothing."""
+    entries = [part for meta in manifest["tables"].values() for part in meta["parts"]]
+    if "market_index" in manifest:
+        entries.append(manifest["market_index"])
+    for entry in entries:
+        digest = hashlib.sha256()
+        with _member(tar, entry["file"]) as fh:
+            for block in iter(lambda: fh.read(1 << 20), b""):
+                digest.update(block)
+        if digest.hexdigest() != entry["sha256"]:
+            raise BundleError(f"checksum mismatch for {entry['file']}")
+
+
+def _member(tar: tarfile.TarFile, name: str) -> IO[bytes]:
+    try:
+        fh = tar.extractfile(name)
+    except KeyError:
+        raise BundleError(f"bundle member {name} is missing") from None
+    if fh is None:
+        raise BundleError(f"bundle member {name} is not a file")
+    return fh
+
+
+async def _prepare_tables(session: AsyncSession, replace: bool) -> bool:
+    """Empty the target tables when ``replace`` allows it; returns whether anything was removed."""
+    existing = (await session.execute(select(QuoteDaily.code).limit(1))).first() or (
+        await session.execute(select(Stock.code).limit(1))
+    ).first()
+    if existing is None:
+        return False
+    if not replace:
+        raise BundleError("stocks/quotes_daily already contain data; rerun with --replace to overwrite")
+    await session.execute(delete(QuoteDaily))
+    await session.execute(delete(Stock))
+    # Feeds describe changes to the rows being replaced; consumers restart from the new snapshot.
+    await session.execute(delete(StockChange))
+    await session.execute(delete(QuoteRefresh))
+    # Memoized per-stock results were computed from the bars being replaced.
+    await session.execute(delete(ItemMemo))
+    return True
+
+
+async def _bulk_load(session: AsyncSession, table: str, names: Sequence[str], records: List[tuple]) -> None:
+    if not records:
+        return
+    conn = await session.connection()
+    if conn.dialect.name == "postgresql":
+        raw = await conn.get_raw_connection()
+        await raw.driver_connection.copy_records_to_table(table, records=records, columns=list(names))
+        return
+    placeholders = ", ".join("?" for _ in names)
+    # One executemany per part inside one transaction; the engine already runs SQLite in WAL mode.
+    await conn.exec_driver_sql(f"INSERT INTO {table} ({', '.join(names)}) VALUES ({placeholders})", records)
+
+
+def _sha256_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as fh:
+        for block in iter(lambda: fh.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
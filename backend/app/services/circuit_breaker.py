@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections import deque
+from typing import Deque, List, Tuple
+
+from ..core.metrics import Counter, register_collector
+
+logger = logging.getLogger(__name__)
+
+CIRCUIT_REJECTED = Counter("zlm_circuit_rejected_total", "Calls failed fast because a circuit breaker was open.")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+_registry: List["CircuitBreaker"] = []
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling the upstream while its breaker is open."""
+
+
+class CircuitBreaker:
+    """Failure-rate circuit breaker shared by threads calling one upstream.
+
+    Closed: calls pass and outcomes are tracked over a sliding ``window_s``; once
+    at least ``min_calls`` outcomes are seen and the failure share reaches
+    ``failure_rate`` the breaker opens. Open: calls fail fast for ``open_s``.
+    Half-open: up to ``half_open_probes`` calls go through; the first outcome
+    closes or re-opens the breaker.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_rate: float = 0.5,
+        min_calls: int = 5,
+        window_s: float = 60.0,
+        open_s: float = 30.0,
+        half_open_probes: int = 1,
+    ) -> None:
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.window_s = window_s
+        self.open_s = open_s
+        self.half_open_probes = half_open_probes
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probes = 0
+        self._outcomes: Deque[Tuple[float, bool]] = deque()
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state(time.monotonic())
+
+    def before_call(self) -> None:
+        """Reserve a call slot or raise ``CircuitOpenError``; every reserved call must be ``record``-ed."""
+        with self._lock:
+            state = self._current_state(time.monotonic())
+            if state == CLOSED:
+                return
+            if state == HALF_OPEN and self._probes < self.half_open_probes:
+                self._probes += 1
+                return
+        CIRCUIT_REJECTED.inc(breaker=self.name)
+        raise CircuitOpenError(f"{self.name} circuit is open")
+
+    def record(self, ok: bool) -> None:
+        now = time.monotonic()
+        with self._lock:
+            state = self._current_state(now)
+            if state == HALF_OPEN:
+                if ok:
+                    self._close()
+                else:
+                    self._open(now)
+                return
+            if state == OPEN:
+                # A slow call that started before the breaker opened; its outcome is stale.
+                return
+            self._outcomes.append((now, ok))
+            while self._outcomes and self._outcomes[0][0] < now - self.window_s:
+                self._outcomes.popleft()
+            failures = sum(1 for _, success in self._outcomes if not success)
+            if len(self._outcomes) >= self.min_calls and failures / len(self._outcomes) >= self.failure_rate:
+                self._open(now)
+
+    def _current_state(self, now: float) -> str:
+        if self._state == OPEN and now - self._opened_at >= self.open_s:
+            self._state = HALF_OPEN
+            self._probes = 0
+        return self._state
+
+    def _open(self, now: float) -> None:
+        if self._state != OPEN:
+            logger.warning("Circuit %s opened; failing fast for %.0fs", self.name, self.open_s)
+        self._state = OPEN
+        self._opened_at = now
+        self._outcomes.clear()
+
+    def _close(self) -> None:
+        logger.info("Circuit %s closed", self.name)
+        self._state = CLOSED
+        self._outcomes.clear()
+
+
+def _collect() -> List[str]:
+    codes = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+    lines = ["# TYPE zlm_circuit_state gauge"]
+    lines.extend(f'zlm_circuit_state{{breaker="{breaker.name}"}} {codes[breaker.state]}' for breaker in _registry)
+    return lines
+
+
+register_collector(_collect)
@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass
+from datetime import date
+from typing import Dict, List, Optional, Sequence
+
+from fastapi import Response
+
+try:  # Optional fast paths; plain json is used when they are not installed.
+    import orjson
+except ImportError:  # pragma: no cover - depends on the deployment
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - depends on the deployment
+    msgpack = None
+
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack")
+DEFAULT_DELTA_PRECISION = 6
+
+
+@dataclass
+class EquityData:
+    code: str
+    name: str
+    dates: List[date]
+    rets: List[float]
+
+
+@dataclass
+class ColumnarOptions:
+    precision: Optional[int] = None
+    delta: bool = False
+
+
+def encode_columnar(series: Sequence[EquityData], options: ColumnarOptions) -> dict:
+    """Encode item equities as one shared date axis plus one value array per series.
+
+    Missing dates are ``null``. With ``precision`` the returns are stored as
+    integers scaled by ``10 ** precision``; ``delta`` additionally stores each
+    value as the difference from the previous non-null value in the series
+    (delta always quantizes, defaulting to 6 decimals, so decoding is exact).
+    """
+    axis = sorted({day for item in series for day in item.dates})
+    positions = {day: idx for idx, day in enumerate(axis)}
+    precision = options.precision
+    if precision is None and options.delta:
+        precision = DEFAULT_DELTA_PRECISION
+    scale = 10**precision if precision is not None else None
+
+    encoded = []
+    for item in series:
+        values: List[Optional[float]] = [None] * len(axis)
+        for day, ret in zip(item.dates, item.rets):
+            values[positions[day]] = round(ret * scale) if scale else ret
+        if options.delta:
+            values = _delta(values)
+        encoded.append({"code": item.code, "name": item.name, "values": values})
+
+    if options.delta:
+        encoding = "delta"
+    elif scale:
+        encoding = "quantized"
+    else:
+        encoding = "float"
+    return {
+        "format": "columnar",
+        "encoding": encoding,
+        "scale": scale,
+        "dates": [day.isoformat() for day in axis],
+        "series": encoded,
+    }
+
+
+def render(payload: dict, accept: str = "") -> Response:
+    if msgpack is not None and any(media in accept for media in MSGPACK_MEDIA_TYPES):
+        return Response(content=msgpack.packb(payload, use_bin_type=True), media_type="application/msgpack")
+    if orjson is not None:
+        body = orjson.dumps(payload)
+    else:
+        body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return Response(content=body, media_type="application/json")
+
+
+def _delta(values: List[Optional[float]]) -> List[Optional[float]]:
+    previous = 0
+    encoded: List[Optional[float]] = []
+    for value in values:
+        if value is None:
+            encoded.append(None)
+            continue
+        encoded.append(value - previous)
+        previous = value
+    return encoded
+
+
+def decode_series(column: Dict, encoding: str, scale: Optional[int]) -> List[Optional[float]]:
+    """Inverse of ``encode_columnar`` for a single series, mainly for clients and tests."""
+    values = column["values"]
+    if encoding == "delta":
+        running = 0
+        decoded: List[Optional[float]] = []
+        for value in values:
+            if value is None:
+                decoded.append(None)
+                continue
+            running += value
+            decoded.append(running)
+        values = decoded
+    if scale:
+        values = [None if value is None else value / scale for value in values]
+    return values
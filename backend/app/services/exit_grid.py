@@ -0,0 +1,268 @@
+from __future__ import annotations
+
+import itertools
+import math
+from dataclasses import dataclass
+from datetime import date
+from typing import List, Sequence
+
+import numpy as np
+from fastapi import HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..core.profiling import to_thread
+from ..schemas.backtest import BacktestWindow, ExitGridRequest, ExitGridResponse, ExitGridRow
+from .backtest_engine import (
+    ANNUAL_TRADING_DAYS,
+    MIN_ANNUALIZE_DAYS,
+    QuoteView,
+    _load_quotes,
+    _resolve_stocks,
+    _validate_window,
+)
+
+MAX_GRID_COMBINATIONS = 400
+# Cells (combination x stock x bar) per evaluation chunk; one float64 cube of this size is ~16MB.
+GRID_CHUNK_CELLS = 2_000_000
+
+
+@dataclass
+class PriceMatrix:
+    """Per-stock quote paths padded to a common length (NaN after the last bar)."""
+
+    codes: List[str]
+    closes: np.ndarray
+    ordinals: np.ndarray
+    buy_price: np.ndarray
+    buy_index: np.ndarray
+    last_index: np.ndarray
+
+
+@dataclass
+class GridResult:
+    win_rate: np.ndarray
+    ret: np.ndarray
+    ann: np.ndarray
+    sharpe: np.ndarray
+    mdd: np.ndarray
+    calmar: np.ndarray
+    score: np.ndarray
+
+
+async def run_exit_grid(session: AsyncSession, payload: ExitGridRequest) -> ExitGridResponse:
+    window_end = _validate_window(payload.stocks, payload.recommend_date, payload.end_date)
+    axes = (payload.stop_loss, payload.take_profit, payload.max_hold_days, payload.trailing_stop)
+    if math.prod(len(axis) for axis in axes) > MAX_GRID_COMBINATIONS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"参数组合过多，最多 {MAX_GRID_COMBINATIONS} 组",
+        )
+    combos = list(itertools.product(*axes))
+
+    stocks = await _resolve_stocks(session, payload.stocks)
+    if not stocks:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="未找到可回测的股票代码")
+
+    series = []
+    for stock in stocks:
+        quotes = await _load_quotes(session, stock.code, payload.recommend_date, window_end)
+        if quotes:
+            series.append((stock.code, quotes))
+    matrix = build_price_matrix(series, payload.recommend_date)
+    if matrix is None:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="所选股票区间缺少行情数据")
+
+    params = np.array(
+        [[math.inf if value is None else value for value in combo] for combo in combos], dtype=np.float64
+    )
+    # CPU-bound numpy work: keep it off the event loop.
+    result = await to_thread(
+        evaluate_exit_grid, matrix, params[:, 0], params[:, 1], params[:, 2], params[:, 3]
+    )
+
+    order = np.argsort(-np.nan_to_num(result.score, nan=-np.inf), kind="stable")[: payload.top]
+    rows = [
+        ExitGridRow(
+            stop_loss=combos[idx][0],
+            take_profit=combos[idx][1],
+            max_hold_days=combos[idx][2],
+            trailing_stop=combos[idx][3],
+            win_rate=float(result.win_rate[idx]),
+            ret=float(result.ret[idx]),
+            ann=float(result.ann[idx]),
+            sharpe=_optional(result.sharpe[idx]),
+            mdd=_optional(result.mdd[idx]),
+            calmar=_optional(result.calmar[idx]),
+            score=_optional(result.score[idx]),
+        )
+        for idx in order
+    ]
+    window = BacktestWindow(
+        start=payload.recommend_date,
+        end=window_end,
+        trading_days=(window_end - payload.recommend_date).days,
+    )
+    return ExitGridResponse(window=window, stocks=len(matrix.codes), combinations=len(combos), items=rows)
+
+
+def build_price_matrix(series: Sequence[tuple[str, List[QuoteView]]], recommend_date: date) -> PriceMatrix | None:
+    usable = []
+    for code, quotes in series:
+        buy_index = next((idx for idx, q in enumerate(quotes) if q.date > recommend_date), 0)
+        last_index = len(quotes) - 1
+        buy_price = quotes[buy_index].open
+        if buy_index >= last_index or buy_price <= 0 or quotes[last_index].close <= 0:
+            continue
+        usable.append((code, quotes, buy_index, buy_price))
+    if not usable:
+        return None
+
+    width = max(len(quotes) for _, quotes, _, _ in usable)
+    closes = np.full((len(usable), width), np.nan)
+    ordinals = np.zeros((len(usable), width), dtype=np.int64)
+    for row, (_, quotes, _, _) in enumerate(usable):
+        closes[row, : len(quotes)] = [q.close if q.close > 0 else np.nan for q in quotes]
+        ordinals[row, : len(quotes)] = [q.date.toordinal() for q in quotes]
+    return PriceMatrix(
+        codes=[code for code, _, _, _ in usable],
+        closes=closes,
+        ordinals=ordinals,
+        buy_price=np.array([price for _, _, _, price in usable]),
+        buy_index=np.array([idx for _, _, idx, _ in usable]),
+        last_index=np.array([len(quotes) - 1 for _, quotes, _, _ in usable]),
+    )
+
+
+def evaluate_exit_grid(
+    matrix: PriceMatrix,
+    stop_loss: np.ndarray,
+    take_profit: np.ndarray,
+    max_hold_days: np.ndarray,
+    trailing_stop: np.ndarray,
+) -> GridResult:
+    """Evaluate every exit-rule combination over the basket with broadcast passes.
+
+    Parameter arrays have shape (C,) with ``inf`` meaning "rule disabled"; the
+    per-stock metrics follow ``_calculate_for_stock`` and are averaged the same
+    way as ``_aggregate_summary``. Combinations are processed in chunks so the
+    (C, S, T) cubes stay within ``GRID_CHUNK_CELLS``.
+    """
+    n_stocks, width = matrix.closes.shape
+    step = max(1, GRID_CHUNK_CELLS // max(1, n_stocks * width))
+    paths = _StockPaths.build(matrix)
+    chunks = [
+        _evaluate_chunk(
+            matrix,
+            paths,
+            stop_loss[lo : lo + step],
+            take_profit[lo : lo + step],
+            max_hold_days[lo : lo + step],
+            trailing_stop[lo : lo + step],
+        )
+        for lo in range(0, len(stop_loss), step)
+    ]
+    return GridResult(
+        **{name: np.concatenate([getattr(chunk, name) for chunk in chunks]) for name in GridResult.__dataclass_fields__}
+    )
+
+
+@dataclass
+class _StockPaths:
+    """Per-stock (S, T) arrays shared by every combination chunk."""
+
+    steps: np.ndarray
+    rows: np.ndarray
+    rets: np.ndarray
+    trail_dd: np.ndarray
+    hold_days: np.ndarray
+    sellable: np.ndarray
+    daily: np.ndarray
+    pair_valid: np.ndarray
+    drawdown: np.ndarray
+
+    @classmethod
+    def build(cls, matrix: PriceMatrix) -> "_StockPaths":
+        closes = matrix.closes
+        n_stocks, width = closes.shape
+        steps = np.arange(width)
+        valid = ~np.isnan(closes)
+        buy_index = matrix.buy_index[:, None]
+        buy_price = matrix.buy_price[:, None]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            held = valid & (steps >= buy_index)
+            trail_peak = np.maximum(buy_price, np.maximum.accumulate(np.where(held, closes, -np.inf), axis=1))
+            peak = np.maximum(buy_price, np.maximum.accumulate(np.where(valid, closes, -np.inf), axis=1))
+            return cls(
+                steps=steps,
+                rows=np.arange(n_stocks),
+                rets=closes / buy_price - 1,
+                trail_dd=closes / trail_peak - 1,
+                hold_days=steps - buy_index,
+                sellable=held & (steps > buy_index),
+                daily=closes[:, 1:] / closes[:, :-1] - 1,
+                pair_valid=valid[:, 1:] & valid[:, :-1],
+                drawdown=np.where(valid, closes / peak - 1, 0.0),
+            )
+
+
+def _evaluate_chunk(
+    matrix: PriceMatrix,
+    paths: _StockPaths,
+    stop_loss: np.ndarray,
+    take_profit: np.ndarray,
+    max_hold_days: np.ndarray,
+    trailing_stop: np.ndarray,
+) -> GridResult:
+    closes = matrix.closes
+    steps, rows, daily = paths.steps, paths.rows, paths.daily
+    with np.errstate(invalid="ignore", divide="ignore"):
+        # (C, S, T) trigger cube: the first sellable bar where any enabled rule fires.
+        triggered = (
+            (paths.rets[None] <= -stop_loss[:, None, None])
+            | (paths.rets[None] >= take_profit[:, None, None])
+            | (paths.trail_dd[None] <= -trailing_stop[:, None, None])
+            | (paths.hold_days[None] >= max_hold_days[:, None, None])
+        ) & paths.sellable[None]
+        exit_index = np.where(triggered.any(axis=-1), triggered.argmax(axis=-1), matrix.last_index[None, :])
+        del triggered
+
+        sell_price = closes[rows[None, :], exit_index]
+        ret = sell_price / matrix.buy_price[None, :] - 1
+        days = np.maximum(1, matrix.ordinals[rows[None, :], exit_index] - matrix.ordinals[rows, matrix.buy_index])
+        # Same cut-off as exit-rule runs in _calculate_for_stock: short holds keep their raw return.
+        ann = np.where(days < MIN_ANNUALIZE_DAYS, ret, (1 + ret) ** (ANNUAL_TRADING_DAYS / days) - 1)
+
+        in_window = (steps[1:][None, None, :] <= exit_index[:, :, None]) & paths.pair_valid[None]
+        counts = in_window.sum(axis=-1)
+        mean = np.where(in_window, daily[None], 0.0).sum(axis=-1) / np.maximum(counts, 1)
+        var = np.where(in_window, (daily[None] - mean[:, :, None]) ** 2, 0.0).sum(axis=-1) / np.maximum(counts - 1, 1)
+        del in_window
+        stdev = np.sqrt(var)
+        sharpe = np.where((counts >= 2) & (stdev > 0), mean / stdev * math.sqrt(ANNUAL_TRADING_DAYS), np.nan)
+
+        held_to = steps[None, None, :] <= exit_index[:, :, None]
+        mdd = np.minimum(np.where(held_to, paths.drawdown[None], 0.0).min(axis=-1), 0.0)
+        calmar = np.where(mdd != 0, ann / np.abs(mdd), np.nan)
+
+        # Vector form of calc_score: a missing Sharpe simply drops its term.
+        item_score = 0.5 * ann + 0.3 * np.nan_to_num(sharpe, nan=0.0) - 0.2 * np.abs(mdd)
+
+        return GridResult(
+            win_rate=(ret > 0).mean(axis=1),
+            ret=ret.mean(axis=1),
+            ann=ann.mean(axis=1),
+            sharpe=_nanmean(sharpe),
+            mdd=mdd.mean(axis=1),
+            calmar=_nanmean(calmar),
+            score=item_score.mean(axis=1),
+        )
+
+
+def _nanmean(values: np.ndarray) -> np.ndarray:
+    counts = (~np.isnan(values)).sum(axis=1)
+    totals = np.nansum(values, axis=1)
+    return np.where(counts > 0, totals / np.maximum(counts, 1), np.nan)
+
+
+def _optional(value: float) -> float | None:
+    return None if math.isnan(value) else float(value)
@@ -0,0 +1,196 @@
+from __future__ import annotations
+
+import csv
+import io
+import json
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from typing import AsyncIterator, List, Literal, Optional, Sequence
+
+from sqlalchemy import Select, select
+
+from ..core.deps import ReadSessionMaker
+from ..db.models import Backtest, BacktestItem, QuoteDaily
+
+try:  # Optional; only needed for Parquet exports.
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - depends on the deployment
+    pa = None
+    pq = None
+
+ExportFormat = Literal["csv", "parquet"]
+
+# Rows fetched per server-side cursor round trip; also one CSV chunk / Parquet row group.
+EXPORT_CHUNK = 5000
+
+
+@dataclass(frozen=True)
+class ExportColumn:
+    name: str
+    kind: Literal["str", "date", "datetime", "float", "json"]
+
+
+BACKTEST_ITEM_COLUMNS = (
+    ExportColumn("bt_id", "str"),
+    ExportColumn("created_at", "datetime"),
+    ExportColumn("user_id", "str"),
+    ExportColumn("code", "str"),
+    ExportColumn("name", "str"),
+    ExportColumn("buy_date", "date"),
+    ExportColumn("buy_price", "float"),
+    ExportColumn("sell_date", "date"),
+    ExportColumn("sell_price", "float"),
+    ExportColumn("ret", "float"),
+    ExportColumn("excess", "float"),
+    ExportColumn("ann", "float"),
+    ExportColumn("sharpe", "float"),
+    ExportColumn("mdd", "float"),
+    ExportColumn("calmar", "float"),
+    ExportColumn("score", "float"),
+    ExportColumn("grade", "str"),
+    ExportColumn("flags", "json"),
+)
+
+QUOTE_COLUMNS = (
+    ExportColumn("code", "str"),
+    ExportColumn("date", "date"),
+    ExportColumn("open", "float"),
+    ExportColumn("close", "float"),
+    ExportColumn("high", "float"),
+    ExportColumn("low", "float"),
+    ExportColumn("volume", "float"),
+    ExportColumn("amount", "float"),
+    ExportColumn("turnover", "float"),
+    ExportColumn("adj_close", "float"),
+    ExportColumn("flags", "json"),
+)
+
+
+class ExportUnavailable(RuntimeError):
+    """Raised when the requested format needs an optional dependency that is not installed."""
+
+
+def backtest_items_query(
+    codes: Sequence[str] = (),
+    user_id: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+) -> Select:
+    stmt = select(
+        BacktestItem.bt_id,
+        Backtest.created_at,
+        Backtest.user_id,
+        *(getattr(BacktestItem, column.name) for column in BACKTEST_ITEM_COLUMNS[3:]),
+    ).join(Backtest, Backtest.bt_id == BacktestItem.bt_id)
+    if codes:
+        stmt = stmt.where(BacktestItem.code.in_(list(codes)))
+    if user_id:
+        stmt = stmt.where(Backtest.user_id == user_id)
+    if date_from:
+        stmt = stmt.where(Backtest.created_at >= datetime.combine(date_from, time.min))
+    if date_to:
+        stmt = stmt.where(Backtest.created_at < datetime.combine(date_to + timedelta(days=1), time.min))
+    return stmt.order_by(Backtest.created_at, BacktestItem.id)
+
+
+def quotes_query(codes: Sequence[str] = (), start: Optional[date] = None, end: Optional[date] = None) -> Select:
+    stmt = select(*(getattr(QuoteDaily, column.name) for column in QUOTE_COLUMNS))
+    if codes:
+        stmt = stmt.where(QuoteDaily.code.in_(list(codes)))
+    if start:
+        stmt = stmt.where(QuoteDaily.date >= start)
+    if end:
+        stmt = stmt.where(QuoteDaily.date <= end)
+    return stmt.order_by(QuoteDaily.code, QuoteDaily.date)
+
+
+def export_stream(stmt: Select, columns: Sequence[ExportColumn], fmt: ExportFormat) -> AsyncIterator[bytes]:
+    """Encode ``stmt`` chunk by chunk; memory stays at one ``EXPORT_CHUNK`` whatever the result size."""
+    if fmt == "parquet":
+        if pa is None:
+            raise ExportUnavailable("pyarrow is not installed")
+        return _parquet_chunks(_partitions(stmt), columns)
+    return _csv_chunks(_partitions(stmt), columns)
+
+
+async def _partitions(stmt: Select) -> AsyncIterator[Sequence[tuple]]:
+    # A session of our own: the response body is streamed after request dependencies are closed.
+    async with ReadSessionMaker() as session:
+        result = await session.stream(stmt.execution_options(yield_per=EXPORT_CHUNK))
+        async for partition in result.partitions():
+            yield partition
+
+
+async def _csv_chunks(partitions: AsyncIterator[Sequence[tuple]], columns: Sequence[ExportColumn]) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # BOM so Excel opens the Chinese names correctly.
+    buffer.write("\ufeff")
+    writer.writerow([column.name for column in columns])
+    json_idx = [idx for idx, column in enumerate(columns) if column.kind == "json"]
+    async for partition in partitions:
+        for row in partition:
+            if json_idx:
+                row = list(row)
+                for idx in json_idx:
+                    row[idx] = json.dumps(row[idx] or [], ensure_ascii=False)
+            writer.writerow(row)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file object that hands out whatever Parquet wrote since the last drain."""
+
+    def __init__(self) -> None:
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        chunk = bytes(data)
+        self._chunks.append(chunk)
+        self._position += len(chunk)
+        return len(chunk)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+async def _parquet_chunks(
+    partitions: AsyncIterator[Sequence[tuple]], columns: Sequence[ExportColumn]
+) -> AsyncIterator[bytes]:
+    types = {
+        "str": pa.string(),
+        "date": pa.date32(),
+        "datetime": pa.timestamp("us"),
+        "float": pa.float64(),
+        "json": pa.string(),
+    }
+    schema = pa.schema([(column.name, types[column.kind]) for column in columns])
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    try:
+        async for partition in partitions:
+            arrays = []
+            for idx, column in enumerate(columns):
+                values = [row[idx] for row in partition]
+                if column.kind == "json":
+                    values = [json.dumps(value or [], ensure_ascii=False) for value in values]
+                arrays.append(pa.array(values, type=types[column.kind]))
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+import gzip
+import json
+import logging
+import os
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import List, Optional
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from ..core.config import get_settings
+from ..core.deps import SessionMaker
+from ..core.profiling import to_thread
+from ..db.models import Backtest, BacktestArchiveIndex, BacktestItem, BacktestLiveItem
+from .backtest_writer import _backtest_row, _decode_row, _encode, _item_row
+
+logger = logging.getLogger(__name__)
+
+# Rankings look back at most 30 days, so retention below that would drop ranked rows.
+MIN_RETENTION_DAYS = 30
+ARCHIVE_CHUNK = 500
+
+
+@dataclass
+class ArchivedMonth:
+    month: str
+    archive_file: str
+    backtests: int
+
+
+async def archive_history(retention_days: Optional[int] = None, today: Optional[date] = None) -> List[ArchivedMonth]:
+    """Move whole months older than the retention window into gzip JSONL archives.
+
+    Each archived backtest keeps a row in ``backtest_archive_index`` so it can
+    still be replayed by ``bt_id``; the hot ``backtest``/``backtest_item`` tables
+    only hold the retention window.
+    """
+    settings = get_settings()
+    retention_days = settings.history_retention_days if retention_days is None else retention_days
+    if retention_days < MIN_RETENTION_DAYS:
+        raise ValueError(f"retention must be at least {MIN_RETENTION_DAYS} days")
+    horizon = (today or date.today()) - timedelta(days=retention_days)
+    boundary = datetime(horizon.year, horizon.month, 1)
+    archive_dir = Path(settings.archive_dir)
+    archive_dir.mkdir(parents=True, exist_ok=True)
+
+    async with SessionMaker() as session:
+        oldest = (await session.execute(select(func.min(Backtest.created_at)))).scalar()
+    archived: List[ArchivedMonth] = []
+    month_start = datetime(oldest.year, oldest.month, 1) if oldest else boundary
+    while month_start < boundary:
+        month_end = _next_month(month_start)
+        result = await _archive_month(archive_dir, month_start, month_end)
+        if result is not None:
+            archived.append(result)
+        month_start = month_end
+    return archived
+
+
+async def _archive_month(archive_dir: Path, month_start: datetime, month_end: datetime) -> ArchivedMonth | None:
+    month = month_start.strftime("%Y-%m")
+    filename = f"backtest-{month}-{datetime.utcnow():%Y%m%d%H%M%S}.jsonl.gz"
+    target = archive_dir / filename
+    tmp = target.with_suffix(".tmp")
+    # (bt_id, byte offset, byte length): every backtest is its own gzip member, so a
+    # lookup seeks straight to it while the file still reads as one gzip JSONL stream.
+    members: List[tuple[str, int, int]] = []
+
+    async with SessionMaker() as session:
+        with tmp.open("wb") as fh:
+            last_id = ""
+            while True:
+                stmt = (
+                    select(Backtest)
+                    .options(selectinload(Backtest.items))
+                    .where(Backtest.created_at >= month_start, Backtest.created_at < month_end, Backtest.bt_id > last_id)
+                    .order_by(Backtest.bt_id)
+                    .limit(ARCHIVE_CHUNK)
+                )
+                chunk = (await session.execute(stmt)).scalars().all()
+                if not chunk:
+                    break
+                for bt in chunk:
+                    record = {"backtest": _backtest_row(bt), "items": [_item_row(item) for item in bt.items]}
+                    line = json.dumps(record, default=_encode, ensure_ascii=False) + "\n"
+                    member = gzip.compress(line.encode("utf-8"))
+                    members.append((bt.bt_id, fh.tell(), len(member)))
+                    fh.write(member)
+                last_id = chunk[-1].bt_id
+                session.expunge_all()
+
+    if not members:
+        tmp.unlink()
+        return None
+    os.replace(tmp, target)
+
+    # The archive file is durable before any hot row is removed; a rerun after a crash
+    # re-archives the leftovers into a new file and repoints their index rows.
+    async with SessionMaker() as session:
+        archived_at = datetime.utcnow()
+        for start in range(0, len(members), ARCHIVE_CHUNK):
+            chunk_members = members[start : start + ARCHIVE_CHUNK]
+            ids = [bt_id for bt_id, _, _ in chunk_members]
+            await session.execute(delete(BacktestArchiveIndex).where(BacktestArchiveIndex.bt_id.in_(ids)))
+            await session.execute(
+                insert(BacktestArchiveIndex),
+                [
+                    {
+                        "bt_id": bt_id,
+                        "month": month,
+                        "archive_file": filename,
+                        "byte_offset": offset,
+                        "byte_length": length,
+                        "archived_at": archived_at,
+                    }
+                    for bt_id, offset, length in chunk_members
+                ],
+            )
+            await session.execute(delete(BacktestItem).where(BacktestItem.bt_id.in_(ids)))
+            await session.execute(delete(BacktestLiveItem).where(BacktestLiveItem.bt_id.in_(ids)))
+            await session.execute(delete(Backtest).where(Backtest.bt_id.in_(ids)))
+            await session.commit()
+    logger.info("Archived %s backtests for %s into %s", len(members), month, target)
+    return ArchivedMonth(month=month, archive_file=filename, backtests=len(members))
+
+
+async def load_archived_backtest(session: AsyncSession, bt_id: str) -> Backtest | None:
+    entry = await session.get(BacktestArchiveIndex, bt_id)
+    if entry is None:
+        return None
+    path = Path(get_settings().archive_dir) / entry.archive_file
+    if entry.byte_offset is not None and entry.byte_length is not None:
+        record = await to_thread(_read_member, path, bt_id, entry.byte_offset, entry.byte_length)
+    else:
+        record = await to_thread(_scan_archive, path, bt_id)
+    if record is None:
+        logger.warning("Backtest %s is indexed in %s but missing from the file", bt_id, path)
+        return None
+    backtest = Backtest(**_decode_row(record["backtest"]))
+    for row in record["items"]:
+        backtest.items.append(BacktestItem(**_decode_row(row)))
+    return backtest
+
+
+def _read_member(path: Path, bt_id: str, offset: int, length: int) -> dict | None:
+    if not path.exists():
+        return None
+    with path.open("rb") as fh:
+        fh.seek(offset)
+        record = json.loads(gzip.decompress(fh.read(length)))
+    return record if record["backtest"]["bt_id"] == bt_id else None
+
+
+def _scan_archive(path: Path, bt_id: str) -> dict | None:
+    # Archives written before per-backtest members were indexed: decompress and search the whole file.
+    if not path.exists():
+        return None
+    needle = f'"bt_id": "{bt_id}"'
+    with gzip.open(path, "rt", encoding="utf-8") as fh:
+        for line in fh:
+            if needle not in line:
+                continue
+            record = json.loads(line)
+            if record["backtest"]["bt_id"] == bt_id:
+                return record
+    return None
+
+
+def _next_month(month_start: datetime) -> datetime:
+    if month_start.month == 12:
+        return datetime(month_start.year + 1, 1, 1)
+    return datetime(month_start.year, month_start.month + 1, 1)
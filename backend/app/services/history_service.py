@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import base64
+import binascii
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from typing import Dict, List, Optional
+
+from fastapi import HTTPException, status
+from sqlalchemy import exists, func, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..db.models import Backtest, BacktestArchiveIndex, BacktestItem
+from ..schemas.backtest import BacktestListItem, BacktestListResponse, BacktestSummary, BacktestWindow
+
+
+async def list_backtests(
+    session: AsyncSession,
+    user_id: str,
+    code: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    limit: int = 20,
+    cursor: Optional[str] = None,
+) -> BacktestListResponse:
+    """List backtests newest first with (created_at, bt_id) keyset pagination.
+
+    Only ``backtest`` columns and the item codes of the page are read, so deep
+    pages cost the same as the first one and no equity series is rebuilt.
+    History is always scoped to one ``user_id``; archived months are not listed
+    and the response says where the archive cut-off lies.
+    """
+    stmt = select(
+        Backtest.bt_id,
+        Backtest.user_id,
+        Backtest.start,
+        Backtest.end,
+        Backtest.benchmark,
+        Backtest.summary_json,
+        Backtest.created_at,
+    ).where(Backtest.user_id == user_id)
+    if code:
+        stmt = stmt.where(exists().where(BacktestItem.bt_id == Backtest.bt_id, BacktestItem.code == code))
+    if date_from:
+        stmt = stmt.where(Backtest.created_at >= datetime.combine(date_from, time.min))
+    if date_to:
+        stmt = stmt.where(Backtest.created_at < datetime.combine(date_to + timedelta(days=1), time.min))
+    if cursor:
+        created_at, bt_id = _decode_cursor(cursor)
+        stmt = stmt.where(tuple_(Backtest.created_at, Backtest.bt_id) < tuple_(created_at, bt_id))
+    stmt = stmt.order_by(Backtest.created_at.desc(), Backtest.bt_id.desc()).limit(limit + 1)
+
+    rows = (await session.execute(stmt)).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    codes = await _codes_for(session, [row.bt_id for row in rows])
+    items = [
+        BacktestListItem(
+            bt_id=row.bt_id,
+            user_id=row.user_id,
+            window=BacktestWindow(start=row.start, end=row.end, trading_days=(row.end - row.start).days),
+            benchmark=row.benchmark,
+            summary=BacktestSummary(**row.summary_json),
+            codes=codes.get(row.bt_id, []),
+            created_at=row.created_at,
+        )
+        for row in rows
+    ]
+    next_cursor = _encode_cursor(rows[-1].created_at, rows[-1].bt_id) if has_more else None
+    return BacktestListResponse(items=items, next_cursor=next_cursor, archived_before=await _archive_cutoff(session))
+
+
+async def _archive_cutoff(session: AsyncSession) -> Optional[datetime]:
+    """Start of the month after the newest archived one; the archiver only moves whole months."""
+    month = (await session.execute(select(func.max(BacktestArchiveIndex.month)))).scalar()
+    if month is None:
+        return None
+    year, mon = (int(part) for part in month.split("-"))
+    return datetime(year + mon // 12, mon % 12 + 1, 1)
+
+
+async def _codes_for(session: AsyncSession, bt_ids: List[str]) -> Dict[str, List[str]]:
+    if not bt_ids:
+        return {}
+    stmt = select(BacktestItem.bt_id, BacktestItem.code).where(BacktestItem.bt_id.in_(bt_ids)).order_by(BacktestItem.id)
+    codes: Dict[str, List[str]] = defaultdict(list)
+    for bt_id, code in (await session.execute(stmt)).all():
+        codes[bt_id].append(code)
+    return codes
+
+
+def _encode_cursor(created_at: datetime, bt_id: str) -> str:
+    raw = f"{created_at.isoformat()}|{bt_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> tuple[datetime, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8")
+        created_at, bt_id = raw.split("|", 1)
+        return datetime.fromisoformat(created_at), bt_id
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="无效的分页游标")
@@ -2,28 +2,53 @@ from __future__ import annotations
 
 import asyncio
 import logging
-from datetime import date
-from typing import Iterable, Sequence
+from datetime import date, datetime
+from typing import Iterable, List, Sequence, Set
 
-from sqlalchemy import select
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from ..core.config import get_settings
 from ..core.deps import SessionMaker
-from ..db.models import QuoteDaily, Stock
+from ..db.partitioning import ensure_year_partitions
+from ..db.models import QuoteDaily, QuoteRefresh, Stock, StockChange
 from .akshare_client import AkShareClient
+from .circuit_breaker import CircuitOpenError
 from .data_models import QuoteRecord, StockInfo
+from .item_memo import item_memo
+from .quote_cache import mark_quotes_synced, quote_cache
+from .shared_quotes import shared_quotes
 from .ths_client import TongHuaShunClient
 
 logger = logging.getLogger(__name__)
 
+# ~13 bound parameters per row keeps each statement under SQLite's 32766 parameter limit.
+QUOTE_UPSERT_CHUNK = 500
+# Codes missing from the AKShare list are kept (backtests reference them) but tagged.
+DELISTED_TAG = "DELISTED"
 
-async def sync_stock_master() -> None:
+QUOTE_UPDATE_COLUMNS = ("open", "close", "high", "low", "volume", "amount", "turnover", "adj_close", "flags")
+# Years whose quote partitions this process has already ensured.
+_partitioned_years: Set[int] = set()
+
+
+async def sync_stock_master() -> List[StockChange]:
+    """Diff the AKShare security list against ``stocks`` and write only what changed.
+
+    Changes are appended to the ``stock_change`` feed, which workers poll to
+    roll their warm state forward (``warm_state.catch_up``).
+    """
     client = AkShareClient()
     stocks = client.list_a_stocks()
+    if not stocks:
+        raise RuntimeError("AKShare returned an empty security list; refusing to diff the stock master")
     async with SessionMaker() as session:
-        await _upsert_stocks(session, stocks)
+        changes = await _apply_stock_master(session, stocks)
         await session.commit()
-    logger.info("Stock master sync completed")
+    logger.info("Stock master sync completed with %s changes", len(changes))
+    return changes
 
 
 async def sync_quotes_for_codes(codes: Sequence[str], start: date, end: date) -> None:
@@ -33,59 +58,140 @@ async def sync_quotes_for_codes(codes: Sequence[str], start: date, end: date) ->
             try:
                 quotes = client.get_daily_quotes(code, start, end)
                 await _upsert_quotes(session, quotes)
+                # Memoized per-stock results may have been computed from the bars just replaced.
+                await item_memo.invalidate(session, [code])
                 await session.commit()
+                quote_cache.invalidate([code])
+                shared_quotes.invalidate([code])
+            except CircuitOpenError:
+                logger.warning("THS circuit is open; stopping quote sync before %s", code)
+                break
             except Exception as exc:  # noqa: BLE001
                 logger.exception("Failed to sync quotes for %s: %s", code, exc)
+    mark_quotes_synced()
     logger.info("Quote sync completed for %s codes", len(codes))
 
 
-async def _upsert_stocks(session: AsyncSession, stocks: Iterable[StockInfo]) -> None:
-    for stock in stocks:
-        existing = await session.get(Stock, stock.code)
-        if existing:
-            existing.name = stock.name
-            existing.exchange = stock.exchange
-            existing.status_tags = stock.status_tags
-        else:
-            session.add(
-                Stock(
-                    code=stock.code,
-                    name=stock.name,
-                    exchange=stock.exchange,
-                    status_tags=stock.status_tags,
-                )
+async def refresh_code_quotes(code: str, start: date, end: date) -> int:
+    """Fetch ``[start, end]`` for one code from THS and upsert it; returns the number of bars stored.
+
+    Every attempt, empty or not, replaces the code's row in the ``quote_refresh``
+    feed so other workers skip their own refresh and drop stale copies.
+    """
+    quotes = await TongHuaShunClient().get_daily_quotes_async(code, start, end)
+    async with SessionMaker() as session:
+        if quotes:
+            await _upsert_quotes(session, quotes)
+            await item_memo.invalidate(session, [code])
+        await session.execute(delete(QuoteRefresh).where(QuoteRefresh.code == code))
+        session.add(QuoteRefresh(code=code, rows=len(quotes)))
+        await session.commit()
+    if quotes:
+        quote_cache.invalidate([code])
+        shared_quotes.invalidate([code])
+    return len(quotes)
+
+
+async def _apply_stock_master(session: AsyncSession, stocks: Iterable[StockInfo]) -> List[StockChange]:
+    rows = await session.execute(select(Stock.code, Stock.name, Stock.exchange, Stock.status_tags))
+    current = {row.code: row for row in rows.all()}
+    incoming = {stock.code: stock for stock in stocks}
+    now = datetime.utcnow()
+    inserts: List[dict] = []
+    updates: List[dict] = []
+    changes: List[StockChange] = []
+
+    for code, stock in incoming.items():
+        row = current.get(code)
+        if row is None:
+            inserts.append(
+                {
+                    "code": code,
+                    "name": stock.name,
+                    "exchange": stock.exchange,
+                    "status_tags": stock.status_tags,
+                    "updated_at": now,
+                }
+            )
+            changes.append(StockChange(code=code, kind="insert", name=stock.name, status_tags=stock.status_tags))
+            continue
+        old_tags = row.status_tags or []
+        renamed = row.name != stock.name
+        if not renamed and row.exchange == stock.exchange and sorted(old_tags) == sorted(stock.status_tags):
+            continue
+        updates.append(
+            {"code": code, "name": stock.name, "exchange": stock.exchange, "status_tags": stock.status_tags, "updated_at": now}
+        )
+        kind = "rename" if renamed else ("status" if sorted(old_tags) != sorted(stock.status_tags) else "exchange")
+        changes.append(
+            StockChange(
+                code=code,
+                kind=kind,
+                name=stock.name,
+                previous_name=row.name if renamed else None,
+                status_tags=stock.status_tags,
             )
+        )
+
+    for code, row in current.items():
+        tags = row.status_tags or []
+        if code in incoming or DELISTED_TAG in tags:
+            continue
+        tags = [*tags, DELISTED_TAG]
+        updates.append({"code": code, "status_tags": tags, "updated_at": now})
+        changes.append(StockChange(code=code, kind="delist", name=row.name, status_tags=tags))
+
+    if inserts:
+        await session.execute(insert(Stock), inserts)
+    if updates:
+        await session.execute(update(Stock), updates)
+    if changes:
+        session.add_all(changes)
+    return changes
 
 
 async def _upsert_quotes(session: AsyncSession, quotes: Iterable[QuoteRecord]) -> None:
-    for quote in quotes:
-        existing = await session.get(QuoteDaily, (quote.code, quote.trade_date))
-        if existing:
-            existing.open = quote.open
-            existing.close = quote.close
-            existing.high = quote.high
-            existing.low = quote.low
-            existing.volume = quote.volume
-            existing.amount = quote.amount
-            existing.turnover = quote.turnover
-            existing.adj_close = quote.adj_close
-            existing.flags = quote.flags
-        else:
-            session.add(
-                QuoteDaily(
-                    code=quote.code,
-                    date=quote.trade_date,
-                    open=quote.open,
-                    close=quote.close,
-                    high=quote.high,
-                    low=quote.low,
-                    volume=quote.volume,
-                    amount=quote.amount,
-                    turnover=quote.turnover,
-                    adj_close=quote.adj_close,
-                    flags=quote.flags,
-                )
-            )
+    """Insert or refresh quote rows in bulk ``INSERT ... ON CONFLICT (code, date) DO UPDATE`` statements."""
+    rows = [
+        {
+            "code": quote.code,
+            "date": quote.trade_date,
+            "open": quote.open,
+            "close": quote.close,
+            "high": quote.high,
+            "low": quote.low,
+            "volume": quote.volume,
+            "amount": quote.amount,
+            "turnover": quote.turnover,
+            "adj_close": quote.adj_close,
+            "flags": quote.flags,
+        }
+        for quote in quotes
+    ]
+    stmt_factory = _dialect_insert(session)
+    await _ensure_partitions(session, {row["date"].year for row in rows})
+    for offset in range(0, len(rows), QUOTE_UPSERT_CHUNK):
+        stmt = stmt_factory(QuoteDaily).values(rows[offset : offset + QUOTE_UPSERT_CHUNK])
+        updated = {name: stmt.excluded[name] for name in QUOTE_UPDATE_COLUMNS}
+        updated["updated_at"] = datetime.utcnow()
+        await session.execute(stmt.on_conflict_do_update(index_elements=["code", "date"], set_=updated))
+
+
+async def _ensure_partitions(session: AsyncSession, years: Set[int]) -> None:
+    """Create yearly partitions before their first bars arrive, instead of filling the default partition."""
+    settings = get_settings()
+    missing = years - _partitioned_years
+    if not missing or not settings.quotes_partitioning or session.bind.dialect.name != "postgresql":
+        return
+    conn = await session.connection()
+    await conn.run_sync(ensure_year_partitions, missing, settings.quotes_partition_hash_modulus)
+    _partitioned_years.update(missing)
+
+
+def _dialect_insert(session: AsyncSession):
+    if session.bind.dialect.name == "postgresql":
+        return postgresql_insert
+    return sqlite_insert
 
 
 async def list_known_codes(limit: int = 20) -> list[str]:
@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Set, TypeVar
+
+from sqlalchemy import and_, delete, or_, select
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from ..core.config import get_settings
+from ..core.deps import SessionMaker
+from ..core.metrics import Counter
+from ..db.models import ItemMemo
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+ITEM_MEMO_LOOKUPS = Counter("zlm_item_memo_lookups_total", "Per-stock memo lookups by tier that answered.")
+
+
+@dataclass
+class MemoRecord:
+    key: str
+    code: str
+    value: Any
+    payload: dict
+    expires_at: Optional[datetime] = None
+
+
+class ItemMemoStore:
+    """Two-tier memo of per-stock backtest results: an in-process LRU over the ``item_memo`` table.
+
+    LRU entries live at most ``ttl`` so workers pick up invalidations from other
+    processes; persistent rows carry an ``expires_at`` and are removed by ``purge``.
+    """
+
+    def __init__(self, session_factory: async_sessionmaker[AsyncSession], max_entries: int, ttl: float) -> None:
+        self.session_factory = session_factory
+        self.max_entries = max_entries
+        self.ttl = timedelta(seconds=ttl)
+        self._lru: OrderedDict[str, tuple[str, Any, datetime]] = OrderedDict()
+        self._writes: Set[asyncio.Task] = set()
+
+    async def get_many(self, session: AsyncSession, keys: Sequence[str], decode: Callable[[dict], T]) -> Dict[str, T]:
+        now = datetime.utcnow()
+        found: Dict[str, T] = {}
+        missing: List[str] = []
+        for key in keys:
+            cached = self._lru.get(key)
+            if cached is not None and cached[2] > now:
+                self._lru.move_to_end(key)
+                found[key] = cached[1]
+            else:
+                missing.append(key)
+        if found:
+            ITEM_MEMO_LOOKUPS.inc(len(found), tier="lru")
+        if not missing:
+            return found
+
+        rows = (await session.execute(select(ItemMemo).where(ItemMemo.key.in_(missing)))).scalars().all()
+        hits = 0
+        for row in rows:
+            if row.expires_at is not None and row.expires_at <= now:
+                continue
+            value = decode(row.payload)
+            self._remember(row.key, row.code, value, row.expires_at)
+            found[row.key] = value
+            hits += 1
+        if hits:
+            ITEM_MEMO_LOOKUPS.inc(hits, tier="db")
+        if len(missing) > hits:
+            ITEM_MEMO_LOOKUPS.inc(len(missing) - hits, tier="miss")
+        return found
+
+    def put_many(self, records: Sequence[MemoRecord]) -> None:
+        """Cache records in the LRU now and persist them in the background, off the request path."""
+        if not records:
+            return
+        for record in records:
+            self._remember(record.key, record.code, record.value, record.expires_at)
+        task = asyncio.ensure_future(self._persist(records))
+        self._writes.add(task)
+        task.add_done_callback(self._writes.discard)
+
+    async def invalidate(self, session: AsyncSession, codes: Iterable[str]) -> None:
+        codes = set(codes)
+        if not codes:
+            return
+        self.forget(codes)
+        await session.execute(delete(ItemMemo).where(ItemMemo.code.in_(codes)))
+
+    def clear(self) -> None:
+        self._lru.clear()
+
+    def forget(self, codes: Iterable[str]) -> None:
+        """Drop this process's copies only; the stored rows were already invalidated elsewhere."""
+        codes = set(codes)
+        for key in [key for key, (code, _, _) in self._lru.items() if code in codes]:
+            del self._lru[key]
+
+    def _remember(self, key: str, code: str, value: Any, expires_at: Optional[datetime]) -> None:
+        deadline = datetime.utcnow() + self.ttl
+        if expires_at is not None:
+            deadline = min(deadline, expires_at)
+        self._lru[key] = (code, value, deadline)
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+
+    async def purge(self, now: Optional[datetime] = None) -> int:
+        """Delete expired rows; rows written before every row had ``expires_at`` age out by ``created_at``."""
+        now = now or datetime.utcnow()
+        horizon = now - timedelta(seconds=get_settings().item_memo_row_ttl_s)
+        async with self.session_factory() as session:
+            result = await session.execute(
+                delete(ItemMemo).where(
+                    or_(ItemMemo.expires_at <= now, and_(ItemMemo.expires_at.is_(None), ItemMemo.created_at <= horizon))
+                )
+            )
+            await session.commit()
+        return result.rowcount or 0
+
+    async def _persist(self, records: Sequence[MemoRecord]) -> None:
+        rows = [
+            {
+                "key": record.key,
+                "code": record.code,
+                "payload": record.payload,
+                "expires_at": record.expires_at,
+                "created_at": datetime.utcnow(),
+            }
+            for record in records
+        ]
+        try:
+            async with self.session_factory() as session:
+                insert = postgresql_insert if session.bind.dialect.name == "postgresql" else sqlite_insert
+                stmt = insert(ItemMemo).values(rows)
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=["key"],
+                    set_={name: stmt.excluded[name] for name in ("payload", "expires_at", "created_at")},
+                )
+                await session.execute(stmt)
+                await session.commit()
+        except Exception:  # noqa: BLE001
+            logger.exception("Failed to persist %s item memo rows", len(rows))
+
+
+settings = get_settings()
+item_memo = ItemMemoStore(SessionMaker, settings.item_memo_lru_size, settings.item_memo_ttl_s)
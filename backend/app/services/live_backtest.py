@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import logging
+import math
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Sequence
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..core.deps import SessionMaker
+from ..db.models import Backtest, BacktestItem, BacktestLiveItem
+from .backtest_engine import (
+    ANNUAL_TRADING_DAYS,
+    QuoteView,
+    _aggregate_summary,
+    _benchmark_returns,
+    _load_quotes,
+    annualize,
+    calc_calmar,
+    calc_score,
+    classify_grade,
+)
+
+logger = logging.getLogger(__name__)
+
+
+async def advance_live_backtests(today: Optional[date] = None) -> int:
+    """Append bars newer than each live item's ``last_date`` and update its metrics in O(new bars).
+
+    Quotes are loaded once per code for all live items holding it. Returns the
+    number of backtests whose results changed.
+    """
+    today = today or date.today()
+    touched: set[str] = set()
+    async with SessionMaker() as session:
+        states = (await session.execute(select(BacktestLiveItem))).scalars().all()
+        by_code: Dict[str, List[BacktestLiveItem]] = defaultdict(list)
+        for state in states:
+            by_code[state.code].append(state)
+        items = await _items_by_key(session, {state.bt_id for state in states})
+
+        bench_ret, _ = _benchmark_returns()
+        for code, code_states in by_code.items():
+            since = min(state.last_date for state in code_states) + timedelta(days=1)
+            if since > today:
+                continue
+            quotes = await _load_quotes(session, code, since, today)
+            for state in code_states:
+                bars = [q for q in quotes if q.date > state.last_date]
+                item = items.get((state.bt_id, code))
+                if not bars or item is None:
+                    continue
+                _advance(state, item, bars, bench_ret)
+                touched.add(state.bt_id)
+
+        if touched:
+            backtests = (
+                await session.execute(select(Backtest).where(Backtest.bt_id.in_(touched)))
+            ).scalars().all()
+            for backtest in backtests:
+                bt_items = [item for (bt_id, _), item in items.items() if bt_id == backtest.bt_id]
+                backtest.summary_json = _aggregate_summary(bt_items).model_dump()
+                backtest.end = max(backtest.end, max(item.sell_date for item in bt_items))
+        await session.commit()
+    logger.info("Advanced %s live backtests to %s", len(touched), today)
+    return len(touched)
+
+
+async def _items_by_key(session: AsyncSession, bt_ids: set[str]) -> Dict[tuple[str, str], BacktestItem]:
+    if not bt_ids:
+        return {}
+    rows = (await session.execute(select(BacktestItem).where(BacktestItem.bt_id.in_(bt_ids)))).scalars().all()
+    return {(item.bt_id, item.code): item for item in rows}
+
+
+def _advance(state: BacktestLiveItem, item: BacktestItem, bars: Sequence[QuoteView], bench_ret: float) -> None:
+    for bar in bars:
+        if state.last_close > 0:
+            # Welford's online update of the daily-return mean and sum of squared deviations.
+            value = bar.close / state.last_close - 1
+            state.n += 1
+            delta = value - state.mean
+            state.mean += delta / state.n
+            state.m2 += delta * (value - state.mean)
+        state.peak = max(state.peak, bar.close)
+        state.mdd = min(state.mdd, (bar.close - state.peak) / state.peak)
+        state.last_close = bar.close
+        state.last_date = bar.date
+
+    ret = state.last_close / state.buy_price - 1
+    trading_days = max(1, (state.last_date - item.buy_date).days)
+    ann = annualize(ret, trading_days)
+    sharpe = _sharpe(state)
+    item.sell_date = state.last_date
+    item.sell_price = round(state.last_close, 4)
+    item.ret = ret
+    item.excess = ret - bench_ret
+    item.ann = ann
+    item.sharpe = sharpe
+    item.mdd = state.mdd
+    item.calmar = calc_calmar(ann, state.mdd)
+    item.score = calc_score(ann, sharpe, state.mdd)
+    item.grade = classify_grade(ann)
+    item.flags = [flag for flag in item.flags or [] if flag != "SHORT_WINDOW" or trading_days < 2]
+
+
+def _sharpe(state: BacktestLiveItem) -> float | None:
+    if state.n < 2:
+        return None
+    stdev = math.sqrt(state.m2 / (state.n - 1))
+    if stdev == 0:
+        return None
+    return (state.mean / stdev) * math.sqrt(ANNUAL_TRADING_DAYS)
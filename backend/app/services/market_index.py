@@ -0,0 +1,176 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+from collections import OrderedDict
+from datetime import date
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import select
+
+from ..core.config import get_settings
+from ..core.deps import ReadSessionMaker
+from ..db.models import QuoteDaily
+from .shared_quotes import shared_quotes
+
+logger = logging.getLogger(__name__)
+
+CROSS_SECTION_CACHE = 256
+# A code's last close is carried over at most this many bars (short suspensions);
+# past that it drops out, so delisted codes do not count as flat in later windows.
+MAX_FILL_BARS = 5
+
+
+class MarketIndex:
+    """Dates x codes matrix of closes, forward-filled over short suspensions, for cross-sectional lookups."""
+
+    def __init__(self, dates: np.ndarray, codes: np.ndarray, closes: np.ndarray) -> None:
+        self.dates = dates
+        self.codes = codes
+        self.closes = closes
+        self._sections: OrderedDict[tuple[int, int], Optional[np.ndarray]] = OrderedDict()
+
+    def returns_between(self, start: date, end: date) -> Optional[np.ndarray]:
+        """Sorted close-to-close returns of every code trading at both ``start`` and ``end`` (last bar on or before).
+
+        "Trading" allows a gap of up to ``MAX_FILL_BARS`` bars before the date.
+        """
+        key = (start.toordinal(), end.toordinal())
+        if key in self._sections:
+            self._sections.move_to_end(key)
+            return self._sections[key]
+        lo = int(np.searchsorted(self.dates, key[0], side="right")) - 1
+        hi = int(np.searchsorted(self.dates, key[1], side="right")) - 1
+        section = None
+        if lo >= 0 and hi > lo:
+            base = self.closes[lo]
+            last = self.closes[hi]
+            valid = np.isfinite(base) & np.isfinite(last) & (base > 0)
+            if valid.any():
+                section = np.sort(last[valid] / base[valid] - 1)
+        self._sections[key] = section
+        if len(self._sections) > CROSS_SECTION_CACHE:
+            self._sections.popitem(last=False)
+        return section
+
+    def save(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        with tmp.open("wb") as fh:
+            np.savez(fh, dates=self.dates, codes=self.codes, closes=self.closes)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: Path) -> "MarketIndex":
+        with np.load(path, allow_pickle=False) as data:
+            return cls(data["dates"], data["codes"], data["closes"])
+
+
+def percentile(section: np.ndarray, value: float) -> float:
+    """Mid-rank percentile of ``value`` within a sorted cross-section, in [0, 1]."""
+    left = np.searchsorted(section, value, side="left")
+    right = np.searchsorted(section, value, side="right")
+    return float((left + right) / 2 / len(section))
+
+
+async def build_market_index(path: Optional[str] = None) -> MarketIndex:
+    """Rebuild the index from ``quotes_daily`` and write it atomically to ``market_index_path``."""
+    target = Path(path or get_settings().market_index_path)
+    # Rows are kept as compact numpy chunks (code id, date ordinal, close), not Python objects.
+    code_ids: Dict[str, int] = {}
+    chunks: List[tuple[np.ndarray, np.ndarray, np.ndarray]] = []
+    async with ReadSessionMaker() as session:
+        stmt = select(QuoteDaily.code, QuoteDaily.date, QuoteDaily.close).execution_options(yield_per=50_000)
+        result = await session.stream(stmt)
+        async for partition in result.partitions():
+            chunks.append(
+                (
+                    np.fromiter((code_ids.setdefault(row[0], len(code_ids)) for row in partition), np.int32, len(partition)),
+                    np.fromiter((row[1].toordinal() for row in partition), np.int32, len(partition)),
+                    np.fromiter((row[2] for row in partition), np.float32, len(partition)),
+                )
+            )
+
+    ids, ordinals, closes = (
+        np.concatenate([chunk[pos] for chunk in chunks]) if chunks else np.empty(0, dtype=dtype)
+        for pos, dtype in enumerate((np.int32, np.int32, np.float32))
+    )
+    names = np.array(list(code_ids), dtype=str)
+    order = np.argsort(names, kind="stable")
+    unique_codes = names[order]
+    code_idx = np.empty(len(order), dtype=np.int64)
+    code_idx[order] = np.arange(len(order))
+    unique_dates, date_idx = np.unique(ordinals, return_inverse=True)
+    matrix = np.full((len(unique_dates), len(unique_codes)), np.nan, dtype=np.float32)
+    matrix[date_idx, code_idx[ids]] = closes
+    del ids, ordinals, closes, chunks
+    if len(unique_dates):
+        # Forward-fill each column over gaps of up to MAX_FILL_BARS bars.
+        steps = np.arange(len(unique_dates))[:, None]
+        rows = np.where(np.isfinite(matrix), steps, 0)
+        np.maximum.accumulate(rows, axis=0, out=rows)
+        matrix = matrix[rows, np.arange(len(unique_codes))[None, :]]
+        matrix[steps - rows > MAX_FILL_BARS] = np.nan
+
+    index = MarketIndex(unique_dates, unique_codes, matrix)
+    index.save(target)
+    logger.info("Built market index %s: %s dates x %s codes", target, len(unique_dates), len(unique_codes))
+    _cache.update(path=target, mtime=target.stat().st_mtime, index=index)
+    return index
+
+
+_cache: dict = {"path": None, "mtime": None, "index": None}
+_reload: Optional[asyncio.Task] = None
+
+
+async def load_market_index() -> Optional[MarketIndex]:
+    """Read the on-disk index in a worker thread; run at startup and whenever the file changes."""
+    path = Path(get_settings().market_index_path)
+    try:
+        mtime = path.stat().st_mtime
+    except FileNotFoundError:
+        return None
+    index = await asyncio.to_thread(MarketIndex.load, path)
+    _cache.update(path=path, mtime=mtime, index=index)
+    logger.info("Loaded market index %s: %s dates x %s codes", path, len(index.dates), len(index.codes))
+    return index
+
+
+def get_market_index() -> Optional[MarketIndex]:
+    """Return the loaded index; None when not built (or not loaded) yet.
+
+    A rebuilt file is picked up by a background reload, and the previous index is
+    served until it finishes. With shared quotes enabled the matrix is read from
+    the host-wide segment instead of a private copy.
+    """
+    settings = get_settings()
+    segment = shared_quotes.segment() if settings.shared_quotes_enabled else None
+    if segment is not None and segment.market is not None:
+        key = ("shared", segment.version)
+        if _cache["path"] != key:
+            _cache.update(path=key, mtime=None, index=MarketIndex(*segment.market))
+        return _cache["index"]
+    path = Path(settings.market_index_path)
+    try:
+        mtime = path.stat().st_mtime
+    except FileNotFoundError:
+        return None
+    if _cache["path"] != path or _cache["mtime"] != mtime:
+        _schedule_reload(path, mtime)
+    return _cache["index"] if _cache["path"] == path else None
+
+
+def _schedule_reload(path: Path, mtime: float) -> None:
+    global _reload
+    if _reload is not None and not _reload.done():
+        return
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        # Scripts outside an event loop have no requests to keep responsive.
+        _cache.update(path=path, mtime=mtime, index=MarketIndex.load(path))
+        return
+    _reload = loop.create_task(load_market_index())
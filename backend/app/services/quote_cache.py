@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+import logging
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Iterable, Optional
+
+from ..core.config import get_settings
+from ..core.metrics import Counter, register_collector
+
+logger = logging.getLogger(__name__)
+
+QUOTE_CACHE_LOOKUPS = Counter("zlm_quote_cache_lookups_total", "Hot quote series cache lookups by result.")
+
+SKETCH_DEPTH = 4
+SKETCH_MAX_COUNT = 15
+
+
+class FrequencySketch:
+    """Count-min sketch of recent access frequency with 4-bit saturating counters.
+
+    Counters are halved every ``sample_size`` increments so popularity decays
+    and yesterday's trend does not pin the cache forever.
+    """
+
+    def __init__(self, width: int) -> None:
+        self.width = 1 << max(4, (width - 1).bit_length())
+        self.sample_size = 10 * self.width
+        self._mask = self.width - 1
+        self._rows = [bytearray(self.width) for _ in range(SKETCH_DEPTH)]
+        self._additions = 0
+
+    def increment(self, key: str, amount: int = 1) -> None:
+        for seed, row in enumerate(self._rows):
+            idx = hash((seed, key)) & self._mask
+            row[idx] = min(SKETCH_MAX_COUNT, row[idx] + amount)
+        self._additions += amount
+        if self._additions >= self.sample_size:
+            self._age()
+
+    def estimate(self, key: str) -> int:
+        return min(row[hash((seed, key)) & self._mask] for seed, row in enumerate(self._rows))
+
+    def _age(self) -> None:
+        for row in self._rows:
+            row[:] = bytes(count >> 1 for count in row)
+        self._additions //= 2
+
+
+class QuoteSeriesCache:
+    """Per-code quote series kept in process under a byte budget.
+
+    Eviction is LRU, but admission is TinyLFU-style: when the budget is full a
+    new code only gets in if the sketch says it is requested more often than
+    every entry it would push out, so one-off lookups cannot flush hot codes.
+    Sizes are supplied by the caller, which knows what a series costs.
+    """
+
+    def __init__(self, max_bytes: int, expected_entries: int = 10000) -> None:
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._entries: OrderedDict[str, tuple[Any, int]] = OrderedDict()
+        self._sketch = FrequencySketch(expected_entries * 2)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, code: str) -> Optional[Any]:
+        self._sketch.increment(code)
+        entry = self._entries.get(code)
+        if entry is None:
+            QUOTE_CACHE_LOOKUPS.inc(result="miss")
+            return None
+        self._entries.move_to_end(code)
+        QUOTE_CACHE_LOOKUPS.inc(result="hit")
+        return entry[0]
+
+    def record(self, code: str, hits: int) -> None:
+        """Seed the frequency of ``code`` from an external popularity signal."""
+        self._sketch.increment(code, min(hits, SKETCH_MAX_COUNT))
+
+    def seen_before(self, code: str) -> bool:
+        """Whether ``code`` was looked up more than once recently, counting the current lookup."""
+        return self._sketch.estimate(code) >= 2
+
+    def would_admit(self, code: str) -> bool:
+        """Cheap pre-check so callers skip loading a full series that ``put`` would reject."""
+        if self.bytes < self.max_bytes or not self._entries:
+            return True
+        victim = next(iter(self._entries))
+        return self._sketch.estimate(code) > self._sketch.estimate(victim)
+
+    def put(self, code: str, series: Any, nbytes: int) -> bool:
+        if nbytes > self.max_bytes:
+            return False
+        self._discard(code)
+        frequency = self._sketch.estimate(code)
+        victims = []
+        free = self.max_bytes - self.bytes
+        for victim, (_, size) in self._entries.items():
+            if free >= nbytes:
+                break
+            if self._sketch.estimate(victim) >= frequency:
+                return False
+            victims.append(victim)
+            free += size
+        for victim in victims:
+            self._discard(victim)
+        self._entries[code] = (series, nbytes)
+        self.bytes += nbytes
+        return True
+
+    def invalidate(self, codes: Iterable[str]) -> None:
+        for code in codes:
+            self._discard(code)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.bytes = 0
+
+    def _discard(self, code: str) -> None:
+        entry = self._entries.pop(code, None)
+        if entry is not None:
+            self.bytes -= entry[1]
+
+
+def mark_quotes_synced() -> None:
+    """Touch the sync marker so API processes drop and re-warm their quote caches."""
+    path = Path(get_settings().quote_sync_marker_path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(datetime.utcnow().isoformat(), encoding="utf-8")
+
+
+def sync_marker_mtime() -> Optional[float]:
+    try:
+        return Path(get_settings().quote_sync_marker_path).stat().st_mtime
+    except FileNotFoundError:
+        return None
+
+
+settings = get_settings()
+quote_cache = QuoteSeriesCache(settings.quote_cache_bytes)
+register_collector(
+    lambda: [
+        "# TYPE zlm_quote_cache_bytes gauge",
+        f"zlm_quote_cache_bytes {quote_cache.bytes}",
+        "# TYPE zlm_quote_cache_entries gauge",
+        f"zlm_quote_cache_entries {len(quote_cache)}",
+    ]
+)
@@ -8,12 +8,16 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..db.models import Stock
 from ..schemas.random_pick import RandomPickResponse
+from .warm_state import warm_state
 
 
 async def pick_random_stock(session: AsyncSession) -> RandomPickResponse:
-    stmt = select(Stock).order_by(func.random()).limit(1)
-    result = await session.execute(stmt)
-    stock = result.scalars().first()
+    await warm_state.catch_up(session)
+    stock = warm_state.random_stock()
+    if stock is None:
+        stmt = select(Stock).order_by(func.random()).limit(1)
+        result = await session.execute(stmt)
+        stock = result.scalars().first()
     if not stock:
         raise ValueError("Stock universe is empty")
     grade = random.choice(["NPC", "人上人", "顶级"])
@@ -0,0 +1,340 @@
+from __future__ import annotations
+
+import asyncio
+import fcntl
+import json
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import time
+from dataclasses import dataclass
+from datetime import date, datetime
+from pathlib import Path
+from typing import IO, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from ..core.config import get_settings
+from ..core.deps import create_engine_for
+from ..core.metrics import register_collector
+from ..db.models import QuoteDaily
+from .quote_cache import sync_marker_mtime
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"ZLMSHQ01"
+# magic, header offset, header length; the JSON header sits after the arrays.
+PREAMBLE = struct.Struct("<8sQQ")
+ALIGN = 64
+CONTROL_FILE = "current.json"
+LOCK_FILE = "loader.lock"
+PRICE_FIELDS = ("open", "close", "high", "low", "volume", "amount", "turnover", "adj_close")
+BUILD_CHUNK = 50_000
+
+
+@dataclass
+class SharedSegment:
+    """Read-only views over one mapped segment version."""
+
+    version: int
+    codes: Dict[str, int]
+    offsets: List[int]
+    dates: np.ndarray
+    columns: Dict[str, np.ndarray]
+    flags: Dict[int, List[str]]
+    market: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]]
+    nbytes: int
+
+    def window(self, code: str, start: date, end: date) -> Optional[Tuple[int, int]]:
+        """Row range of ``code`` within ``[start, end]``; None when the code is not in the segment."""
+        idx = self.codes.get(code)
+        if idx is None:
+            return None
+        lo, hi = self.offsets[idx], self.offsets[idx + 1]
+        dates = self.dates[lo:hi]
+        first = lo + int(np.searchsorted(dates, start.toordinal(), side="left"))
+        last = lo + int(np.searchsorted(dates, end.toordinal(), side="right"))
+        return first, last
+
+
+class SharedQuoteStore:
+    """Attach to the newest segment published in ``directory``; every worker on the host shares its pages.
+
+    Segments are immutable files (``/dev/shm`` by default) swapped by rewriting
+    the control file, so readers never see a half-built version and keep their
+    old mapping alive until they move on.
+    """
+
+    def __init__(self, directory: str, poll_s: float) -> None:
+        self.directory = Path(directory)
+        self.poll_s = poll_s
+        self._segment: Optional[SharedSegment] = None
+        self._checked = 0.0
+        self._control_mtime: Optional[float] = None
+        self._bypass: Set[str] = set()
+
+    def segment(self) -> Optional[SharedSegment]:
+        now = time.monotonic()
+        if now - self._checked >= self.poll_s:
+            self._checked = now
+            self.refresh()
+        return self._segment
+
+    def covers(self, code: str) -> Optional[SharedSegment]:
+        """The current segment, unless ``code`` was refreshed in this process after the segment was built."""
+        if code in self._bypass:
+            return None
+        return self.segment()
+
+    def invalidate(self, codes: Iterable[str]) -> None:
+        self._bypass.update(codes)
+
+    def refresh(self) -> None:
+        control_path = self.directory / CONTROL_FILE
+        try:
+            mtime = control_path.stat().st_mtime
+        except FileNotFoundError:
+            return
+        if mtime == self._control_mtime and self._segment is not None:
+            return
+        try:
+            control = json.loads(control_path.read_text(encoding="utf-8"))
+            if self._segment is None or control["version"] != self._segment.version:
+                self._segment = _attach(self.directory / control["file"], control["version"])
+                self._bypass.clear()
+                logger.info("Attached shared quote segment v%s (%s bytes)", control["version"], self._segment.nbytes)
+            self._control_mtime = mtime
+        except (FileNotFoundError, ValueError, KeyError):
+            # Raced with a swap: the loader replaced the file between our reads; retry next poll.
+            logger.debug("Shared quote control file changed while attaching", exc_info=True)
+
+
+def _attach(path: Path, version: int) -> SharedSegment:
+    with path.open("rb") as fh:
+        mapped = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, header_offset, header_len = PREAMBLE.unpack_from(mapped, 0)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a shared quote segment")
+    header = json.loads(mapped[header_offset : header_offset + header_len])
+
+    def view(name: str) -> np.ndarray:
+        spec = header["arrays"][name]
+        count = int(np.prod(spec["shape"]))
+        return np.frombuffer(mapped, dtype=spec["dtype"], count=count, offset=spec["offset"]).reshape(spec["shape"])
+
+    market = None
+    if "market_closes" in header["arrays"]:
+        market = (view("market_dates"), np.array(header["market_codes"]), view("market_closes"))
+    return SharedSegment(
+        version=version,
+        codes={code: idx for idx, code in enumerate(header["codes"])},
+        offsets=header["offsets"],
+        dates=view("dates"),
+        columns={name: view(name) for name in PRICE_FIELDS},
+        flags={int(row): flags for row, flags in header["flags"].items()},
+        market=market,
+        nbytes=len(mapped),
+    )
+
+
+async def build_segment(directory: Path, version: int) -> Path:
+    """Pack ``quotes_daily`` (code, date order) and the market index into ``quotes-<version>.bin``.
+
+    The build runs on its own thread, event loop and engine, so the serving
+    worker that holds the loader lock keeps answering requests meanwhile.
+    """
+    return await asyncio.to_thread(asyncio.run, _build_segment(directory, version))
+
+
+async def _build_segment(directory: Path, version: int) -> Path:
+    settings = get_settings()
+    engine = create_engine_for(settings.database_read_url or settings.database_url, settings)
+    try:
+        with tempfile.TemporaryFile() as spill:
+            chunks, codes, offsets, flags = await _spill_quotes(engine, spill)
+            path = _write_segment(directory, version, spill, chunks, codes, offsets, flags)
+    finally:
+        await engine.dispose()
+    logger.info("Built shared quote segment v%s: %s rows, %s codes", version, offsets[-1], len(codes))
+    return path
+
+
+async def _spill_quotes(
+    engine: AsyncEngine, spill: IO[bytes]
+) -> Tuple[List[int], List[str], List[int], Dict[int, List[str]]]:
+    """Stream every bar into ``spill`` as per-chunk column blocks.
+
+    One statement reads the whole table, so the segment is a single consistent
+    snapshot and is sized from the rows actually read.
+    """
+    chunks: List[int] = []
+    codes: List[str] = []
+    offsets: List[int] = []
+    flags: Dict[int, List[str]] = {}
+    row = 0
+    stmt = select(
+        QuoteDaily.code, QuoteDaily.date, QuoteDaily.flags, *(getattr(QuoteDaily, f) for f in PRICE_FIELDS)
+    ).order_by(QuoteDaily.code, QuoteDaily.date)
+    async with engine.connect() as conn:
+        result = await conn.stream(stmt.execution_options(yield_per=BUILD_CHUNK))
+        async for partition in result.partitions():
+            n = len(partition)
+            for idx, (code, _, row_flags, *_) in enumerate(partition):
+                if not codes or codes[-1] != code:
+                    codes.append(code)
+                    offsets.append(row + idx)
+                if row_flags:
+                    flags[row + idx] = list(row_flags)
+            spill.write(np.array([r[1].toordinal() for r in partition], dtype="<i4").tobytes())
+            for pos, _field in enumerate(PRICE_FIELDS, start=3):
+                spill.write(np.array([np.nan if r[pos] is None else r[pos] for r in partition], dtype="<f8").tobytes())
+            chunks.append(n)
+            row += n
+    offsets.append(row)
+    return chunks, codes, offsets, flags
+
+
+def _write_segment(
+    directory: Path,
+    version: int,
+    spill: IO[bytes],
+    chunks: Sequence[int],
+    codes: List[str],
+    offsets: List[int],
+    flags: Dict[int, List[str]],
+) -> Path:
+    total = offsets[-1]
+    market = _load_market_arrays()
+    specs: Dict[str, dict] = {}
+    cursor = ALIGN
+    for name, dtype, shape in [("dates", "<i4", [total])] + [(field, "<f8", [total]) for field in PRICE_FIELDS] + (
+        [("market_dates", "<i4", list(market[0].shape)), ("market_closes", "<f4", list(market[2].shape))]
+        if market
+        else []
+    ):
+        specs[name] = {"dtype": dtype, "shape": shape, "offset": cursor}
+        cursor += -(-int(np.prod(shape)) * np.dtype(dtype).itemsize // ALIGN) * ALIGN
+    arrays_end = cursor
+
+    path = directory / f"quotes-{version}.bin"
+    with path.open("w+b") as fh:
+        fh.truncate(max(arrays_end, ALIGN))
+        mapped = mmap.mmap(fh.fileno(), 0)
+        target = {
+            name: np.frombuffer(mapped, dtype=spec["dtype"], count=int(np.prod(spec["shape"])), offset=spec["offset"])
+            for name, spec in specs.items()
+        }
+        if market:
+            target["market_dates"][:] = market[0]
+            target["market_closes"][:] = market[2].ravel()
+        spill.seek(0)
+        row = 0
+        for n in chunks:
+            target["dates"][row : row + n] = np.frombuffer(spill.read(n * 4), dtype="<i4")
+            for field in PRICE_FIELDS:
+                target[field][row : row + n] = np.frombuffer(spill.read(n * 8), dtype="<f8")
+            row += n
+        del target
+        mapped.flush()
+        mapped.close()
+
+        header = json.dumps(
+            {
+                "built_at": datetime.utcnow().isoformat(),
+                "rows": total,
+                "codes": codes,
+                "offsets": offsets,
+                "flags": flags,
+                "arrays": specs,
+                "market_codes": market[1].tolist() if market else [],
+            }
+        ).encode("utf-8")
+        fh.seek(arrays_end)
+        fh.write(header)
+        fh.seek(0)
+        fh.write(PREAMBLE.pack(MAGIC, arrays_end, len(header)))
+    return path
+
+
+def _load_market_arrays() -> Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    path = Path(get_settings().market_index_path)
+    if not path.exists():
+        return None
+    with np.load(path, allow_pickle=False) as data:
+        return data["dates"].astype("<i4"), data["codes"], data["closes"].astype("<f4")
+
+
+def _publish(directory: Path, path: Path, version: int, sources: dict) -> None:
+    control = {"version": version, "file": path.name, **sources}
+    tmp = directory / f"{CONTROL_FILE}.tmp"
+    tmp.write_text(json.dumps(control), encoding="utf-8")
+    os.replace(tmp, directory / CONTROL_FILE)
+    # Workers still mapping an older version keep its pages until they re-attach.
+    for stale in directory.glob("quotes-*.bin"):
+        if stale != path:
+            stale.unlink(missing_ok=True)
+
+
+def _sources() -> dict:
+    market = Path(get_settings().market_index_path)
+    return {"quotes_marker": sync_marker_mtime(), "market_mtime": market.stat().st_mtime if market.exists() else None}
+
+
+async def maintain_shared_quotes() -> None:
+    """Lifespan task: one worker per host wins the flock and (re)builds segments; all workers re-attach."""
+    directory = shared_quotes.directory
+    directory.mkdir(parents=True, exist_ok=True)
+    lock_fd = os.open(directory / LOCK_FILE, os.O_CREAT | os.O_RDWR, 0o644)
+    is_loader = False
+    try:
+        while True:
+            if not is_loader:
+                try:
+                    fcntl.flock(lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    is_loader = True
+                    logger.info("Worker %s is the shared quote loader", os.getpid())
+                except BlockingIOError:
+                    pass
+            if is_loader:
+                try:
+                    await _rebuild_if_stale(directory)
+                except Exception:  # noqa: BLE001
+                    logger.exception("Shared quote segment build failed")
+            shared_quotes.refresh()
+            await asyncio.sleep(shared_quotes.poll_s)
+    finally:
+        os.close(lock_fd)
+
+
+async def _rebuild_if_stale(directory: Path) -> None:
+    sources = _sources()
+    try:
+        control = json.loads((directory / CONTROL_FILE).read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        control = None
+    if control is not None and all(control.get(key) == value for key, value in sources.items()):
+        return
+    version = (control["version"] + 1) if control else 1
+    path = await build_segment(directory, version)
+    _publish(directory, path, version, sources)
+
+
+settings = get_settings()
+shared_quotes = SharedQuoteStore(settings.shared_quotes_dir, settings.shared_quotes_poll_s)
+
+
+def _collect() -> List[str]:
+    segment = shared_quotes._segment
+    return [
+        "# TYPE zlm_shared_quotes_version gauge",
+        f"zlm_shared_quotes_version {segment.version if segment else 0}",
+        "# TYPE zlm_shared_quotes_bytes gauge",
+        f"zlm_shared_quotes_bytes {segment.nbytes if segment else 0}",
+    ]
+
+
+register_collector(_collect)
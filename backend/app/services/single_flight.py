@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, Hashable, List, TypeVar
+
+from ..core.metrics import register_collector
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_registry: List["SingleFlight"] = []
+
+
+class SingleFlight:
+    """Coalesce concurrent calls sharing a key into one in-flight execution."""
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.calls = 0
+        self.executions = 0
+        self.coalesced = 0
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        _registry.append(self)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        self.calls += 1
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            logger.debug("Coalesced %s call for %s", self.name, key)
+            return await asyncio.shield(task)
+
+        self.executions += 1
+        task = asyncio.ensure_future(fn())
+        self._inflight[key] = task
+        task.add_done_callback(lambda done: self._forget(key, done))
+        # Shield so a cancelled caller does not cancel the work other callers are awaiting.
+        return await asyncio.shield(task)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "calls": self.calls,
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+            "inflight": len(self._inflight),
+        }
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()
+
+
+def flight_stats() -> Dict[str, Dict[str, int]]:
+    return {flight.name: flight.stats() for flight in _registry}
+
+
+def _collect() -> List[str]:
+    lines: List[str] = []
+    for metric, kind in (("calls", "counter"), ("executions", "counter"), ("coalesced", "counter"), ("inflight", "gauge")):
+        name = f"zlm_single_flight_{metric}" + ("_total" if kind == "counter" else "")
+        lines.append(f"# TYPE {name} {kind}")
+        lines.extend(f'{name}{{flight="{flight.name}"}} {flight.stats()[metric]}' for flight in _registry)
+    return lines
+
+
+register_collector(_collect)
@@ -2,70 +2,128 @@ from __future__ import annotations
 
 import json
 import logging
+import time
 from datetime import date, datetime
 from typing import List, Optional
 
 import requests
 
+from ..core.config import get_settings
+from ..core.metrics import THS_FETCH_ERRORS, THS_FETCH_SECONDS
+from ..core.profiling import to_thread
+from .circuit_breaker import CircuitBreaker
 from .data_models import QuoteRecord
+from .single_flight import SingleFlight
 
 logger = logging.getLogger(__name__)
 
+ths_flight = SingleFlight("ths_fetch")
+
+_settings = get_settings()
+ths_breaker = CircuitBreaker(
+    "ths",
+    failure_rate=_settings.ths_breaker_failure_rate,
+    min_calls=_settings.ths_breaker_min_calls,
+    window_s=_settings.ths_breaker_window_s,
+    open_s=_settings.ths_breaker_open_s,
+)
+# 403/429 are how THS throttles or blocks us; other 4xx only mean the (prefix, year) file does not exist.
+UPSTREAM_FAILURE_STATUSES = {403, 429}
+
 
 class TongHuaShunClient:
-    BASE_URL = "https://d.10jqka.com.cn/v6/line/{prefix}_{code}/01/{year}.js"
+    PATH_TEMPLATE = "/v6/line/{prefix}_{code}/01/{year}.js"
+
+    def __init__(self, base_url: Optional[str] = None, timeout: Optional[float] = None) -> None:
+        settings = get_settings()
+        self.base_url = (base_url or settings.ths_base_url).rstrip("/")
+        self.timeout = timeout or settings.ths_timeout_s
 
     def get_daily_quotes(self, code: str, start: date, end: date) -> List[QuoteRecord]:
         quotes: List[QuoteRecord] = []
         for year in range(start.year, end.year + 1):
-            text = self._fetch_year_data(code, year)
-            if not text:
+            quotes.extend(self._parse_year(code, self._fetch_year_data(code, year), start, end))
+        quotes.sort(key=lambda q: q.trade_date)
+        logger.info("Loaded %s THS quote rows for %s", len(quotes), code)
+        return quotes
+
+    async def get_daily_quotes_async(self, code: str, start: date, end: date) -> List[QuoteRecord]:
+        """Non-blocking variant; concurrent downloads of the same (code, year) share one request."""
+        quotes: List[QuoteRecord] = []
+        for year in range(start.year, end.year + 1):
+            text = await ths_flight.do(
+                (code, year), lambda year=year: to_thread(self._fetch_year_data, code, year)
+            )
+            quotes.extend(self._parse_year(code, text, start, end))
+        quotes.sort(key=lambda q: q.trade_date)
+        logger.info("Loaded %s THS quote rows for %s", len(quotes), code)
+        return quotes
+
+    def _parse_year(self, code: str, text: Optional[str], start: date, end: date) -> List[QuoteRecord]:
+        if not text:
+            return []
+        payload = self._parse_js_payload(text)
+        if not payload:
+            return []
+        quotes: List[QuoteRecord] = []
+        for entry in payload.split(";"):
+            if not entry.strip():
+                continue
+            fields = entry.split(",")
+            if len(fields) < 7:
                 continue
-            payload = self._parse_js_payload(text)
-            if not payload:
+            trade_date = datetime.strptime(fields[0], "%Y%m%d").date()
+            if trade_date < start or trade_date > end:
                 continue
-            for entry in payload.split(";"):
-                if not entry.strip():
-                    continue
-                fields = entry.split(",")
-                if len(fields) < 7:
-                    continue
-                trade_date = datetime.strptime(fields[0], "%Y%m%d").date()
-                if trade_date < start or trade_date > end:
-                    continue
-                quotes.append(
-                    QuoteRecord(
-                        code=code,
-                        trade_date=trade_date,
-                        close=self._safe_float(fields[1]),
-                        open=self._safe_float(fields[2]),
-                        high=self._safe_float(fields[3]),
-                        low=self._safe_float(fields[4]),
-                        volume=self._safe_float(fields[5]),
-                        amount=self._safe_float(fields[6]),
-                        turnover=None,
-                        adj_close=self._safe_float(fields[1]),
-                        flags=[],
-                    )
+            quotes.append(
+                QuoteRecord(
+                    code=code,
+                    trade_date=trade_date,
+                    close=self._safe_float(fields[1]),
+                    open=self._safe_float(fields[2]),
+                    high=self._safe_float(fields[3]),
+                    low=self._safe_float(fields[4]),
+                    volume=self._safe_float(fields[5]),
+                    amount=self._safe_float(fields[6]),
+                    turnover=None,
+                    adj_close=self._safe_float(fields[1]),
+                    flags=[],
                 )
-        quotes.sort(key=lambda q: q.trade_date)
-        logger.info("Loaded %s THS quote rows for %s", len(quotes), code)
+            )
         return quotes
 
     def _fetch_year_data(self, code: str, year: int) -> Optional[str]:
+        """Download one (code, year) file; raises ``CircuitOpenError`` while THS is marked down."""
         prefixes = self._prefixes_for(code)
         headers = {
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119 Safari/537.36",
             "Referer": "https://finance.10jqka.com.cn/",
         }
-        for prefix in prefixes:
-            url = self.BASE_URL.format(prefix=prefix, code=code, year=year)
-            try:
-                response = requests.get(url, timeout=10, headers=headers)
-                response.raise_for_status()
+        ths_breaker.before_call()
+        # Outcome of the last attempt: a 404 on one prefix followed by a timeout on the next is a failure.
+        healthy = False
+        try:
+            for prefix in prefixes:
+                url = self.base_url + self.PATH_TEMPLATE.format(prefix=prefix, code=code, year=year)
+                started = time.perf_counter()
+                healthy = False
+                try:
+                    response = requests.get(url, timeout=self.timeout, headers=headers)
+                    response.raise_for_status()
+                except requests.RequestException as exc:
+                    THS_FETCH_SECONDS.observe(time.perf_counter() - started, outcome="error")
+                    THS_FETCH_ERRORS.inc(prefix=prefix)
+                    status = exc.response.status_code if exc.response is not None else None
+                    if status is not None and status < 500 and status not in UPSTREAM_FAILURE_STATUSES:
+                        healthy = True
+                        continue
+                    # Timeouts, connection errors and throttling will not improve with the next prefix.
+                    break
+                THS_FETCH_SECONDS.observe(time.perf_counter() - started, outcome="ok")
+                healthy = True
                 return response.text
-            except requests.RequestException:
-                continue
+        finally:
+            ths_breaker.record(healthy)
         logger.warning("THS data unavailable for %s in %s", code, year)
         return None
 
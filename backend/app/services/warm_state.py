@@ -0,0 +1,189 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import random
+import struct
+import time
+import zlib
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..core.config import get_settings
+from ..core.deps import ReadSessionMaker
+from ..db.models import Stock, StockChange
+from ..schemas.rank import RankResponse
+from .ranking_service import get_rankings
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"ZLMWARM1"
+FORMAT_VERSION = 1
+# magic, format version, created_at (unix seconds); a zlib-compressed JSON body follows.
+HEADER = struct.Struct("<8sHd")
+# Route defaults, i.e. what a cold worker is asked first.
+SNAPSHOT_RANKINGS = (("hot", 10, 20, 5), ("best", 10, 20, 5), ("worst", 10, 20, 5))
+
+
+@dataclass
+class WarmState:
+    created_at: float
+    # code -> (name, exchange, status_tags); Stock objects are built on first use.
+    stocks: Dict[str, tuple]
+    by_name: Dict[str, str]
+    rankings: Dict[tuple, RankResponse]
+    last_change_id: int
+    codes: List[str] = field(default_factory=list)
+    objects: Dict[str, Stock] = field(default_factory=dict)
+
+    def get(self, code: str) -> Optional[Stock]:
+        stock = self.objects.get(code)
+        if stock is None and code in self.stocks:
+            name, exchange, tags = self.stocks[code]
+            stock = self.objects[code] = Stock(code=code, name=name, exchange=exchange, status_tags=tags)
+        return stock
+
+
+class WarmStateStore:
+    """Read-side state restored from the last snapshot instead of rebuilt from the database.
+
+    Nothing here is authoritative: lookups that miss fall through to the
+    database, and the stock table is rolled forward from the ``stock_change`` feed.
+    """
+
+    def __init__(self, path: str, max_age_s: float, rank_ttl_s: float, poll_s: float) -> None:
+        self.path = Path(path)
+        self.max_age_s = max_age_s
+        self.rank_ttl_s = rank_ttl_s
+        self.poll_s = poll_s
+        self.state: Optional[WarmState] = None
+        self._caught_up = 0.0
+
+    async def load(self) -> bool:
+        try:
+            self.state = await asyncio.to_thread(self._read)
+        except FileNotFoundError:
+            logger.info("No warm-state snapshot at %s; serving from the database", self.path)
+            return False
+        except (ValueError, KeyError, zlib.error) as exc:
+            logger.warning("Ignoring warm-state snapshot %s: %s", self.path, exc)
+            return False
+        logger.info(
+            "Loaded warm-state snapshot from %s (%s stocks, %.0fs old)",
+            self.path,
+            len(self.state.stocks),
+            time.time() - self.state.created_at,
+        )
+        return True
+
+    def _read(self) -> WarmState:
+        raw = self.path.read_bytes()
+        magic, version, created_at = HEADER.unpack_from(raw, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"unsupported snapshot format {magic!r} v{version}")
+        if time.time() - created_at > self.max_age_s:
+            raise ValueError(f"snapshot is older than {self.max_age_s:.0f}s")
+        body = json.loads(zlib.decompress(raw[HEADER.size :]))
+        stocks = {code: (name, exchange, tags) for code, name, exchange, tags in body["stocks"]}
+        rankings = {
+            tuple(entry["key"]): RankResponse.model_validate(entry["response"]) for entry in body["rankings"]
+        }
+        return WarmState(
+            created_at=created_at,
+            stocks=stocks,
+            by_name={name: code for code, (name, _, _) in stocks.items()},
+            rankings=rankings,
+            last_change_id=body["last_change_id"],
+            codes=list(stocks),
+        )
+
+    def stock(self, code: str) -> Optional[Stock]:
+        return self.state.get(code) if self.state else None
+
+    def stock_by_name(self, name: str) -> Optional[Stock]:
+        code = self.state.by_name.get(name) if self.state else None
+        return self.state.get(code) if code else None
+
+    def random_stock(self) -> Optional[Stock]:
+        if not self.state or not self.state.codes:
+            return None
+        return self.state.get(random.choice(self.state.codes))
+
+    def ranking(self, rank_type: str, days: int, limit: int, k: int) -> Optional[RankResponse]:
+        if self.state is None or time.time() - self.state.created_at > self.rank_ttl_s:
+            return None
+        return self.state.rankings.get((rank_type, days, limit, k))
+
+    async def catch_up(self, session: AsyncSession) -> None:
+        """Apply stock master changes recorded since the snapshot, at most once per ``poll_s``."""
+        state = self.state
+        now = time.monotonic()
+        if state is None or now - self._caught_up < self.poll_s:
+            return
+        self._caught_up = now
+        newest = (await session.execute(select(func.max(StockChange.id)))).scalar() or 0
+        if newest < state.last_change_id:
+            # The feed was emptied and restarted (a replacing bundle import on a table created
+            # before ids stopped being reused); replay it from the start.
+            logger.warning("stock_change feed restarted below %s; replaying it", state.last_change_id)
+            state.last_change_id = 0
+        rows = await session.execute(
+            select(StockChange.id, StockChange.code).where(StockChange.id > state.last_change_id).order_by(StockChange.id)
+        )
+        changes = rows.all()
+        if not changes:
+            return
+        codes = {code for _, code in changes}
+        current = await session.execute(
+            select(Stock.code, Stock.name, Stock.exchange, Stock.status_tags).where(Stock.code.in_(codes))
+        )
+        for code, name, exchange, tags in current.all():
+            previous = state.stocks.get(code)
+            if previous is None:
+                state.codes.append(code)
+            elif state.by_name.get(previous[0]) == code:
+                del state.by_name[previous[0]]
+            state.stocks[code] = (name, exchange, tags or [])
+            state.by_name[name] = code
+            state.objects.pop(code, None)
+        state.last_change_id = changes[-1][0]
+
+
+async def write_warm_state(path: Optional[str] = None) -> Path:
+    """Snapshot the stock master and default rankings for the next worker start."""
+    target = Path(path or get_settings().warm_state_path)
+    async with ReadSessionMaker() as session:
+        last_change_id = (await session.execute(select(func.max(StockChange.id)))).scalar() or 0
+        stocks = (
+            await session.execute(select(Stock.code, Stock.name, Stock.exchange, Stock.status_tags).order_by(Stock.code))
+        ).all()
+        rankings = []
+        for rank_type, days, limit, k in SNAPSHOT_RANKINGS:
+            response = await get_rankings(session, rank_type, days, limit, k)
+            rankings.append({"key": [rank_type, days, limit, k], "response": response.model_dump(mode="json")})
+    body = {
+        "stocks": [[code, name, exchange, tags or []] for code, name, exchange, tags in stocks],
+        "rankings": rankings,
+        "last_change_id": last_change_id,
+    }
+    payload = HEADER.pack(MAGIC, FORMAT_VERSION, time.time()) + zlib.compress(
+        json.dumps(body, ensure_ascii=False, separators=(",", ":")).encode("utf-8"), 6
+    )
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp = target.with_suffix(".tmp")
+    tmp.write_bytes(payload)
+    os.replace(tmp, target)
+    logger.info("Wrote warm-state snapshot %s: %s stocks, %s bytes", target, len(stocks), len(payload))
+    return target
+
+
+settings = get_settings()
+warm_state = WarmStateStore(
+    settings.warm_state_path, settings.warm_state_max_age_s, settings.warm_state_rank_ttl_s, settings.warm_state_poll_s
+)
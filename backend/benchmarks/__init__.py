@@ -0,0 +1 @@
+"""Benchmark and load-test tooling; run from the repository root, e.g. ``python -m backend.benchmarks.run``."""
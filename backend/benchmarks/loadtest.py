@@ -0,0 +1,277 @@
+"""Async load generator validating the PRD latency targets.
+
+Three ways to point it at the API (run from the repository root):
+
+    # in-process create_app() against a seeded SQLite DB and a local THS stub
+    python -m backend.benchmarks.loadtest --duration 30 --concurrency 16
+    # same seeded data, served by N uvicorn worker processes on localhost
+    python -m backend.benchmarks.loadtest --workers 4 --concurrency 64
+    # an already running deployment
+    python -m backend.benchmarks.loadtest --target http://127.0.0.1:8000
+
+Targets (准了么开发计划 §4): POST /backtest P95 <= 3s, other API routes P95 < 300ms.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+
+from .run import _git_commit, _percentile
+from .seed import seed_database
+from .synthetic import generate_universe
+from .ths_stub import ThsStubServer
+
+ROUTES = ("backtest_post", "backtest_get", "rank", "random")
+TARGETS_MS = {"backtest_post": 3000.0, "backtest_get": 300.0, "rank": 300.0, "random": 300.0}
+
+
+@dataclass
+class RouteStats:
+    latencies: List[float] = field(default_factory=list)
+    errors: int = 0
+
+    def summary(self, elapsed: float) -> Dict[str, float]:
+        ordered = sorted(self.latencies)
+        total = len(ordered)
+        return {
+            "requests": total,
+            "errors": self.errors,
+            "error_rate": self.errors / total if total else 0.0,
+            "throughput_rps": total / elapsed if elapsed else 0.0,
+            "p50_ms": _percentile(ordered, 0.50) * 1000,
+            "p95_ms": _percentile(ordered, 0.95) * 1000,
+            "p99_ms": _percentile(ordered, 0.99) * 1000,
+        }
+
+
+@dataclass
+class Workload:
+    codes: List[str]
+    basket: int
+    api_prefix: str
+    rng: random.Random
+    bt_ids: List[str] = field(default_factory=list)
+
+    def backtest_body(self) -> dict:
+        today = date.today()
+        recommend = today - timedelta(days=self.rng.randrange(30, 500))
+        return {
+            "stocks": self.rng.sample(self.codes, min(self.basket, len(self.codes))),
+            "recommend_date": recommend.isoformat(),
+            "end_date": today.isoformat(),
+        }
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="准了么 | 压测工具")
+    parser.add_argument("--target", type=str, default="", help="已部署服务地址；为空时在本地启动")
+    parser.add_argument("--workers", type=int, default=0, help=">0 时用 uvicorn 多进程在 localhost 启动服务")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=30.0, help="压测时长（秒）")
+    parser.add_argument("--mix", type=str, default="backtest_post=2,backtest_get=4,rank=4,random=1")
+    parser.add_argument("--codes", type=int, default=300, help="合成股票数量")
+    parser.add_argument("--years", type=int, default=3, help="入库行情年数")
+    parser.add_argument("--basket", type=int, default=10, help="每次回测的股票数")
+    parser.add_argument("--stub-latency", type=float, default=0.05, help="THS 桩服务单次响应延迟（秒）")
+    parser.add_argument("--api-prefix", type=str, default="/api")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", type=str, default="", help="JSON 报告输出路径")
+    parser.add_argument("--no-assert", action="store_true", help="只输出报告，不校验 PRD 指标")
+    return parser.parse_args()
+
+
+def parse_mix(raw: str) -> Dict[str, float]:
+    weights: Dict[str, float] = {}
+    for part in raw.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ROUTES:
+            raise SystemExit(f"未知路由 {name}，可选: {', '.join(ROUTES)}")
+        weights[name] = float(weight or 1)
+    return weights
+
+
+async def issue(client: httpx.AsyncClient, route: str, workload: Workload) -> bool:
+    prefix = workload.api_prefix
+    if route == "backtest_post":
+        response = await client.post(f"{prefix}/backtest", json=workload.backtest_body())
+        if response.status_code == 200:
+            workload.bt_ids.append(response.json()["bt_id"])
+    elif route == "backtest_get":
+        response = await client.get(f"{prefix}/backtest/{workload.rng.choice(workload.bt_ids)}")
+    elif route == "rank":
+        kind = workload.rng.choice(("hot", "best", "worst"))
+        response = await client.get(f"{prefix}/rank/{kind}", params={"days": 30})
+    else:
+        response = await client.get(f"{prefix}/random")
+    return response.status_code < 400
+
+
+async def drive(client: httpx.AsyncClient, workload: Workload, mix: Dict[str, float], args: argparse.Namespace):
+    stats: Dict[str, RouteStats] = defaultdict(RouteStats)
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    deadline = time.perf_counter() + args.duration
+
+    async def worker() -> None:
+        while time.perf_counter() < deadline:
+            route = workload.rng.choices(names, weights)[0]
+            if route == "backtest_get" and not workload.bt_ids:
+                # Nothing to read yet; the POST that creates one is recorded as a POST, not a GET.
+                route = "backtest_post"
+            started = time.perf_counter()
+            try:
+                ok = await issue(client, route, workload)
+            except httpx.HTTPError:
+                ok = False
+            stats[route].latencies.append(time.perf_counter() - started)
+            if not ok:
+                stats[route].errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    return stats, time.perf_counter() - started
+
+
+async def discover_codes(client: httpx.AsyncClient, prefix: str, wanted: int) -> List[str]:
+    codes = set()
+    for _ in range(wanted * 3):
+        response = await client.get(f"{prefix}/random")
+        if response.status_code == 200:
+            codes.add(response.json()["code"])
+        if len(codes) >= wanted:
+            break
+    return sorted(codes)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def _wait_ready(base_url: str, timeout: float = 60.0) -> None:
+    deadline = time.perf_counter() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while time.perf_counter() < deadline:
+            try:
+                if (await client.get("/healthz")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.2)
+    raise SystemExit(f"服务未在 {timeout:.0f}s 内就绪: {base_url}")
+
+
+async def main_async(args: argparse.Namespace) -> dict:
+    mix = parse_mix(args.mix)
+    rng = random.Random(args.seed)
+    server: Optional[subprocess.Popen] = None
+    stub: Optional[ThsStubServer] = None
+    lifespan = None
+
+    if args.target:
+        client = httpx.AsyncClient(base_url=args.target, timeout=30)
+        codes = await discover_codes(client, args.api_prefix, args.codes)
+        mode = "remote"
+    else:
+        stub = ThsStubServer(latency=args.stub_latency).start()
+        workdir = tempfile.mkdtemp(prefix="zlm-load-")
+        os.environ["ZLM_DATABASE_URL"] = f"sqlite+aiosqlite:///{Path(workdir) / 'load.db'}"
+        os.environ["ZLM_THS_BASE_URL"] = stub.base_url
+        universe = generate_universe(args.codes)
+        end = date.today()
+        # Most of the universe has stored quotes; the rest exercises the THS path.
+        stored = [stock.code for stock in universe[: int(len(universe) * 0.8)]]
+        await seed_database(universe, stored, date(end.year - args.years + 1, 1, 1), end)
+        codes = [stock.code for stock in universe]
+        if args.workers > 0:
+            port = _free_port()
+            command = [sys.executable, "-m", "uvicorn", "backend.app.main:app", "--port", str(port)]
+            command += ["--workers", str(args.workers), "--log-level", "warning"]
+            server = subprocess.Popen(command, env=os.environ.copy())
+            base_url = f"http://127.0.0.1:{port}"
+            await _wait_ready(base_url)
+            client = httpx.AsyncClient(base_url=base_url, timeout=30)
+            mode = f"uvicorn x{args.workers}"
+        else:
+            from ..app.main import create_app
+
+            app = create_app()
+            # ASGITransport does not send lifespan events; run startup/shutdown ourselves.
+            lifespan = app.router.lifespan_context(app)
+            await lifespan.__aenter__()
+            transport = httpx.ASGITransport(app=app)
+            client = httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=30)
+            mode = "in-process"
+
+    workload = Workload(codes=codes, basket=args.basket, api_prefix=args.api_prefix, rng=rng)
+    try:
+        stats, elapsed = await drive(client, workload, mix, args)
+    finally:
+        await client.aclose()
+        if lifespan is not None:
+            await lifespan.__aexit__(None, None, None)
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+        if stub is not None:
+            stub.stop()
+
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "mode": mode,
+            "concurrency": args.concurrency,
+            "duration_s": elapsed,
+            "mix": mix,
+        },
+        "routes": {route: route_stats.summary(elapsed) for route, route_stats in sorted(stats.items())},
+    }
+
+
+def check_targets(report: dict) -> List[str]:
+    failures: List[str] = []
+    for route, stats in report["routes"].items():
+        target = TARGETS_MS.get(route)
+        if target is not None and stats["p95_ms"] > target:
+            failures.append(f"{route} P95 {stats['p95_ms']:.0f}ms > {target:.0f}ms")
+        if stats["error_rate"] > 0.01:
+            failures.append(f"{route} 错误率 {stats['error_rate']:.1%}")
+    return failures
+
+
+def main() -> None:
+    args = parse_args()
+    report = asyncio.run(main_async(args))
+    total = sum(stats["requests"] for stats in report["routes"].values())
+    print(f"mode={report['meta']['mode']} requests={total} throughput={total / report['meta']['duration_s']:.1f} rps")
+    for route, stats in report["routes"].items():
+        print(
+            f"{route:<14} n={stats['requests']:<6} err={stats['error_rate']:>6.1%} "
+            f"p50={stats['p50_ms']:>8.1f}ms p95={stats['p95_ms']:>8.1f}ms p99={stats['p99_ms']:>8.1f}ms"
+        )
+    if args.out:
+        Path(args.out).write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+    failures = check_targets(report)
+    if failures and not args.no_assert:
+        sys.exit("未达到 PRD 指标: " + "; ".join(failures))
+
+
+if __name__ == "__main__":
+    main()
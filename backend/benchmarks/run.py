@@ -0,0 +1,212 @@
+"""Repeatable end-to-end benchmarks against synthetic market data.
+
+Usage (from the repository root)::
+
+    python -m backend.benchmarks.run --codes 500 --years 3 --out bench.json
+    python -m backend.benchmarks.run --compare bench.json --threshold 0.2
+
+Each run builds a throw-away SQLite database and a local THS stub, so results
+only depend on the code under test and the machine.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List
+
+from .seed import seed_database
+from .synthetic import generate_universe, ths_year_payload
+from .ths_stub import ThsStubServer
+
+
+@dataclass
+class ScenarioResult:
+    name: str
+    samples: List[float] = field(default_factory=list)
+
+    def summary(self) -> Dict[str, float]:
+        ordered = sorted(self.samples)
+        return {
+            "n": len(ordered),
+            "mean_ms": statistics.mean(ordered) * 1000,
+            "p50_ms": _percentile(ordered, 0.50) * 1000,
+            "p95_ms": _percentile(ordered, 0.95) * 1000,
+            "max_ms": ordered[-1] * 1000,
+        }
+
+
+def _percentile(ordered: List[float], q: float) -> float:
+    if not ordered:
+        return 0.0
+    idx = min(len(ordered) - 1, max(0, round(q * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+async def _measure(name: str, repeat: int, fn: Callable[[int], Awaitable[None]]) -> ScenarioResult:
+    result = ScenarioResult(name)
+    for idx in range(repeat):
+        started = time.perf_counter()
+        await fn(idx)
+        result.samples.append(time.perf_counter() - started)
+    return result
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="准了么 | 端到端基准测试")
+    parser.add_argument("--codes", type=int, default=300, help="合成股票数量")
+    parser.add_argument("--years", type=int, default=3, help="入库行情年数")
+    parser.add_argument("--basket", type=int, default=10, help="每次回测的股票数")
+    parser.add_argument("--repeat", type=int, default=20, help="每个场景重复次数")
+    parser.add_argument("--stub-latency", type=float, default=0.0, help="THS 桩服务单次响应延迟（秒）")
+    parser.add_argument("--out", type=str, default="", help="JSON 报告输出路径")
+    parser.add_argument("--compare", type=str, default="", help="用于对比的历史报告")
+    parser.add_argument("--threshold", type=float, default=0.2, help="p50/p95 允许的回退比例")
+    return parser.parse_args()
+
+
+async def run_scenarios(args: argparse.Namespace, stub: ThsStubServer) -> Dict[str, ScenarioResult]:
+    # Imported late: the engine binds ZLM_DATABASE_URL / ZLM_THS_BASE_URL at import time.
+    from ..app.core.deps import SessionMaker
+    from ..app.schemas.backtest import BacktestRequest
+    from ..app.services.backtest_engine import get_backtest_response, run_backtest
+    from ..app.services.ingestor import sync_quotes_for_codes
+    from ..app.services.ranking_service import get_rankings
+    from ..app.services.ths_client import TongHuaShunClient
+
+    universe = generate_universe(args.codes)
+    end = date.today()
+    start = date(end.year - args.years + 1, 1, 1)
+    warm_codes = [stock.code for stock in universe[: len(universe) // 2]]
+    cold_codes = [stock.code for stock in universe[len(universe) // 2 :]]
+    await seed_database(universe, warm_codes, start, end)
+
+    results: Dict[str, ScenarioResult] = {}
+    recommend = date(end.year - 1, 3, 1)
+    bt_ids: List[str] = []
+
+    def basket(pool: List[str], idx: int) -> List[str]:
+        offset = (idx * args.basket) % max(1, len(pool) - args.basket)
+        return pool[offset : offset + args.basket]
+
+    payloads = [ths_year_payload(code, end.year - 1) for code in cold_codes[: args.repeat]]
+    parser = TongHuaShunClient(base_url=stub.base_url)
+
+    async def ths_parser(idx: int) -> None:
+        parser._parse_year("000000", payloads[idx % len(payloads)], date(end.year - 1, 1, 1), date(end.year - 1, 12, 31))
+
+    results["ths_parser"] = await _measure("ths_parser", args.repeat, ths_parser)
+
+    async def backtest_warm(idx: int) -> None:
+        async with SessionMaker() as session:
+            response = await run_backtest(
+                session, BacktestRequest(stocks=basket(warm_codes, idx), recommend_date=recommend, end_date=end)
+            )
+            bt_ids.append(response.bt_id)
+
+    results["backtest_warm"] = await _measure("backtest_warm", args.repeat, backtest_warm)
+
+    async def backtest_cold(idx: int) -> None:
+        async with SessionMaker() as session:
+            await run_backtest(
+                session, BacktestRequest(stocks=basket(cold_codes, idx), recommend_date=recommend, end_date=end)
+            )
+
+    results["backtest_cold"] = await _measure("backtest_cold", args.repeat, backtest_cold)
+
+    async def backtest_replay(idx: int) -> None:
+        async with SessionMaker() as session:
+            await get_backtest_response(session, bt_ids[idx % len(bt_ids)])
+
+    results["backtest_replay"] = await _measure("backtest_replay", args.repeat, backtest_replay)
+
+    async def rankings(idx: int) -> None:
+        async with SessionMaker() as session:
+            await get_rankings(session, ("hot", "best", "worst")[idx % 3], 3 * 365, 20)
+
+    results["rankings"] = await _measure("rankings", args.repeat, rankings)
+
+    ingest_codes = cold_codes[-min(len(cold_codes), 10) :]
+
+    async def ingestor(idx: int) -> None:
+        await sync_quotes_for_codes(ingest_codes[idx : idx + 1], start, end)
+
+    results["ingestor"] = await _measure("ingestor", len(ingest_codes), ingestor)
+    return results
+
+
+def build_report(args: argparse.Namespace, results: Dict[str, ScenarioResult]) -> dict:
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "created_at": datetime.utcnow().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "params": {
+                "codes": args.codes,
+                "years": args.years,
+                "basket": args.basket,
+                "repeat": args.repeat,
+                "stub_latency": args.stub_latency,
+            },
+        },
+        "scenarios": {name: result.summary() for name, result in results.items()},
+    }
+
+
+def compare_reports(current: dict, baseline: dict, threshold: float) -> List[str]:
+    regressions: List[str] = []
+    for name, stats in current["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if not previous:
+            continue
+        for metric in ("p50_ms", "p95_ms"):
+            if previous[metric] <= 0:
+                continue
+            change = stats[metric] / previous[metric] - 1
+            marker = "REGRESSION" if change > threshold else ""
+            print(f"{name:<18} {metric:<7} {previous[metric]:>10.2f} -> {stats[metric]:>10.2f} ({change:+.1%}) {marker}")
+            if marker:
+                regressions.append(f"{name}.{metric}")
+    return regressions
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main() -> None:
+    args = parse_args()
+    workdir = tempfile.mkdtemp(prefix="zlm-bench-")
+    with ThsStubServer(latency=args.stub_latency) as stub:
+        os.environ["ZLM_DATABASE_URL"] = f"sqlite+aiosqlite:///{Path(workdir) / 'bench.db'}"
+        os.environ["ZLM_THS_BASE_URL"] = stub.base_url
+        results = asyncio.run(run_scenarios(args, stub))
+
+    report = build_report(args, results)
+    for name, stats in report["scenarios"].items():
+        print(f"{name:<18} n={stats['n']:<4} p50={stats['p50_ms']:>9.2f}ms p95={stats['p95_ms']:>9.2f}ms")
+    if args.out:
+        Path(args.out).write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        regressions = compare_reports(report, baseline, args.threshold)
+        if regressions:
+            sys.exit(f"性能回退: {', '.join(regressions)}")
+
+
+if __name__ == "__main__":
+    main()
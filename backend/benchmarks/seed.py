@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+from datetime import date
+from typing import Sequence
+
+from ..app.services.data_models import StockInfo
+from .synthetic import HISTORY_START, generate_quotes
+
+
+async def seed_database(universe: Sequence[StockInfo], quote_codes: Sequence[str], start: date, end: date) -> None:
+    """Create the schema, insert the stock master and bulk-load quotes for ``quote_codes``.
+
+    Imports are deferred so callers can point ZLM_DATABASE_URL somewhere else first.
+    """
+    from sqlalchemy import insert
+
+    from ..app.core.deps import SessionMaker
+    from ..app.db.init_db import init_db
+    from ..app.db.models import QuoteDaily, Stock
+
+    await init_db()
+    async with SessionMaker() as session:
+        await session.execute(
+            insert(Stock),
+            [{"code": s.code, "name": s.name, "exchange": s.exchange, "status_tags": []} for s in universe],
+        )
+        for code in quote_codes:
+            rows = [
+                {
+                    "code": q.code,
+                    "date": q.trade_date,
+                    "open": q.open,
+                    "close": q.close,
+                    "high": q.high,
+                    "low": q.low,
+                    "volume": q.volume,
+                    "amount": q.amount,
+                    "adj_close": q.adj_close,
+                    "flags": [],
+                }
+                for q in generate_quotes(code, HISTORY_START, end)
+                if q.trade_date >= start
+            ]
+            await session.execute(insert(QuoteDaily), rows)
+        await session.commit()
@@ -0,0 +1,116 @@
+"""Worker startup latency: import time plus time until the first requests are served.
+
+Usage (from the repository root)::
+
+    python -m backend.benchmarks.startup --codes 5000 --repeat 5
+    python -m backend.benchmarks.startup --out startup.json
+
+Every sample starts a fresh interpreter, so imports are cold, and runs once
+with the warm-state snapshot and once with the database only.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from datetime import date
+from pathlib import Path
+from typing import Dict, List
+
+from .seed import seed_database
+from .synthetic import generate_universe
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+
+# Runs in the child interpreter; prints one JSON line of millisecond timings.
+PROBE = r"""
+import asyncio, json, sys, time
+started = time.perf_counter()
+from backend.app.main import create_app
+from backend.app.services.warm_state import warm_state
+imported = time.perf_counter()
+import httpx
+
+async def main():
+    app = create_app()
+    async with app.router.lifespan_context(app):
+        lifespan = time.perf_counter()
+        if sys.argv[1] == "snapshot":
+            while warm_state.state is None:
+                await asyncio.sleep(0.001)
+        loaded = time.perf_counter()
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for route in ("/api/random", "/api/rank/hot"):
+                (await client.get(route)).raise_for_status()
+        ready = time.perf_counter()
+    print(json.dumps({
+        "import_ms": (imported - started) * 1000,
+        "lifespan_ms": (lifespan - imported) * 1000,
+        "snapshot_ms": (loaded - lifespan) * 1000,
+        "first_requests_ms": (ready - loaded) * 1000,
+        "ready_ms": (ready - started) * 1000,
+    }))
+
+asyncio.run(main())
+"""
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="准了么 | API 进程启动耗时基准")
+    parser.add_argument("--codes", type=int, default=5000, help="合成股票数量")
+    parser.add_argument("--repeat", type=int, default=5, help="每种模式启动次数")
+    parser.add_argument("--out", type=str, default="", help="JSON 报告输出路径")
+    return parser.parse_args()
+
+
+async def prepare(workdir: Path, codes: int) -> None:
+    # Imported late: settings bind ZLM_* environment variables at import time.
+    from ..app.services.warm_state import write_warm_state
+
+    today = date.today()
+    await seed_database(generate_universe(codes), [], today, today)
+    await write_warm_state(str(workdir / "warm_state.bin"))
+
+
+def run_probe(mode: str, env: Dict[str, str]) -> Dict[str, float]:
+    output = subprocess.check_output([sys.executable, "-c", PROBE, mode], cwd=REPO_ROOT, env=env, text=True)
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main() -> None:
+    args = parse_args()
+    workdir = Path(tempfile.mkdtemp(prefix="zlm-startup-"))
+    env = {
+        **os.environ,
+        "ZLM_DATABASE_URL": f"sqlite+aiosqlite:///{workdir / 'bench.db'}",
+        "ZLM_WARM_STATE_PATH": str(workdir / "warm_state.bin"),
+        "ZLM_QUOTE_SYNC_MARKER_PATH": str(workdir / "quotes_synced"),
+        "ZLM_WRITE_BEHIND_SPOOL_PATH": str(workdir / "write_behind.jsonl"),
+    }
+    os.environ.update(env)
+    asyncio.run(prepare(workdir, args.codes))
+
+    report: Dict[str, Dict[str, float]] = {}
+    for mode in ("snapshot", "database"):
+        probe_env = dict(env)
+        if mode == "database":
+            probe_env["ZLM_WARM_STATE_PATH"] = str(workdir / "missing.bin")
+        samples: List[Dict[str, float]] = [run_probe(mode, probe_env) for _ in range(args.repeat)]
+        report[mode] = {key: statistics.median(sample[key] for sample in samples) for key in samples[0]}
+        stats = report[mode]
+        print(
+            f"{mode:<9} import={stats['import_ms']:>8.1f}ms snapshot={stats['snapshot_ms']:>7.1f}ms "
+            f"first_requests={stats['first_requests_ms']:>7.1f}ms ready={stats['ready_ms']:>8.1f}ms"
+        )
+    if args.out:
+        Path(args.out).write_text(json.dumps({"codes": args.codes, "median": report}, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
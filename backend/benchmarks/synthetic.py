@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import json
+import math
+import random
+from datetime import date, timedelta
+from typing import Dict, Iterator, List
+
+from ..app.services.data_models import QuoteRecord, StockInfo
+
+PREFIXES = ("600", "601", "603", "688", "000", "002", "300")
+HISTORY_START = date(2015, 1, 1)
+
+
+def generate_universe(count: int, seed: int = 7) -> List[StockInfo]:
+    """Deterministic A-share-like symbol list with plausible code prefixes."""
+    rng = random.Random(seed)
+    seen: Dict[str, StockInfo] = {}
+    while len(seen) < count:
+        prefix = rng.choice(PREFIXES)
+        code = prefix + f"{rng.randrange(1000):03d}"
+        if code in seen:
+            continue
+        exchange = "SSE" if code.startswith(("60", "68")) else "SZSE"
+        seen[code] = StockInfo(code=code, name=f"合成{len(seen):04d}", exchange=exchange, status_tags=[])
+    return list(seen.values())
+
+
+def trading_days(start: date, end: date) -> Iterator[date]:
+    day = start
+    while day <= end:
+        if day.weekday() < 5:
+            yield day
+        day += timedelta(days=1)
+
+
+def generate_quotes(code: str, start: date, end: date) -> List[QuoteRecord]:
+    """Geometric random walk seeded by the code, so every caller sees the same bars."""
+    rng = random.Random(f"{code}:{start.isoformat()}")
+    price = 5 + rng.random() * 95
+    drift = rng.gauss(0.0003, 0.0005)
+    vol = 0.01 + rng.random() * 0.03
+    quotes: List[QuoteRecord] = []
+    for day in trading_days(start, end):
+        open_price = price * math.exp(rng.gauss(0, vol / 3))
+        price = max(0.5, price * math.exp(rng.gauss(drift, vol)))
+        high = max(open_price, price) * (1 + rng.random() * vol / 2)
+        low = min(open_price, price) * (1 - rng.random() * vol / 2)
+        volume = float(rng.randrange(10_000, 5_000_000))
+        quotes.append(
+            QuoteRecord(
+                code=code,
+                trade_date=day,
+                open=round(open_price, 2),
+                close=round(price, 2),
+                high=round(high, 2),
+                low=round(low, 2),
+                volume=volume,
+                amount=round(volume * price, 2),
+                turnover=None,
+                adj_close=round(price, 2),
+                flags=[],
+            )
+        )
+    return quotes
+
+
+def ths_year_payload(code: str, year: int, prefix: str = "hs", history_start: date = HISTORY_START) -> str:
+    """Render one year of synthetic bars in the JSONP shape ``TongHuaShunClient`` parses."""
+    quotes = [
+        q for q in generate_quotes(code, history_start, date(year, 12, 31)) if q.trade_date.year == year
+    ]
+    rows = ";".join(
+        f"{q.trade_date:%Y%m%d},{q.close},{q.open},{q.high},{q.low},{q.volume:.0f},{q.amount}" for q in quotes
+    )
+    body = json.dumps({"data": rows})
+    return f"quotebridge_v6_line_{prefix}_{code}_01_{year}({body})"
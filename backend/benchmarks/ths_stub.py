@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import re
+import threading
+import time
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .synthetic import ths_year_payload
+
+PATH_PATTERN = re.compile(r"^/v6/line/(?P<prefix>\w+)_(?P<code>\d+)/01/(?P<year>\d{4})\.js$")
+
+
+@lru_cache(maxsize=4096)
+def _payload(prefix: str, code: str, year: int) -> bytes:
+    return ths_year_payload(code, year, prefix).encode("utf-8")
+
+
+class ThsStubServer:
+    """Local HTTP server answering ``TongHuaShunClient`` yearly requests with synthetic data.
+
+    ``latency`` adds a fixed delay per response to imitate the real upstream;
+    ``requests`` counts served payloads so scenarios can assert cache behaviour.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0) -> None:
+        stub = self
+        self.latency = latency
+        self.requests = 0
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:  # noqa: N802 - http.server naming
+                match = PATH_PATTERN.match(self.path)
+                if not match:
+                    self.send_error(404)
+                    return
+                if stub.latency:
+                    time.sleep(stub.latency)
+                stub.requests += 1
+                body = _payload(match["prefix"], match["code"], int(match["year"]))
+                self.send_response(200)
+                self.send_header("Content-Type", "application/javascript")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args) -> None:  # noqa: A002
+                return
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "ThsStubServer":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "ThsStubServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="同花顺日线接口本地桩服务")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="每个响应的固定延迟（秒）")
+    args = parser.parse_args()
+    server = ThsStubServer(port=args.port, latency=args.latency)
+    print(f"THS stub listening on {server.base_url}")
+    server._server.serve_forever()
@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import os
+import tempfile
+from pathlib import Path
+
+# Settings and engines bind ZLM_* variables at import time, so point every
+# path at a scratch directory before anything under backend.app is imported.
+_WORKDIR = Path(tempfile.mkdtemp(prefix="zlm-tests-"))
+os.environ.update(
+    {
+        "ZLM_DATABASE_URL": f"sqlite+aiosqlite:///{_WORKDIR / 'test.db'}",
+        "ZLM_WRITE_BEHIND_SPOOL_PATH": str(_WORKDIR / "write_behind.jsonl"),
+        "ZLM_QUOTE_SYNC_MARKER_PATH": str(_WORKDIR / "quotes_synced"),
+        "ZLM_MARKET_INDEX_PATH": str(_WORKDIR / "market_index.npz"),
+        "ZLM_WARM_STATE_PATH": str(_WORKDIR / "warm_state.bin"),
+        "ZLM_ARCHIVE_DIR": str(_WORKDIR / "archive"),
+        "ZLM_SHARED_QUOTES_ENABLED": "false",
+        # Synthetic history ends in the past; never reach out to THS to "refresh" it.
+        "ZLM_QUOTES_STALE_GRACE_DAYS": "100000",
+    }
+)
+
+from datetime import date  # noqa: E402
+from typing import Sequence  # noqa: E402
+
+import pytest  # noqa: E402
+from sqlalchemy import insert  # noqa: E402
+
+from backend.benchmarks.seed import seed_database  # noqa: E402
+from backend.benchmarks.synthetic import HISTORY_START, generate_quotes, generate_universe  # noqa: E402
+from backend.app.core.config import get_settings  # noqa: E402
+from backend.app.core.deps import SessionMaker, _engine  # noqa: E402
+from backend.app.db.base import Base  # noqa: E402
+from backend.app.db.init_db import init_db  # noqa: E402
+from backend.app.db.models import QuoteDaily  # noqa: E402
+from backend.app.services.item_memo import item_memo  # noqa: E402
+from backend.app.services.quote_cache import quote_cache  # noqa: E402
+
+
+@pytest.fixture
+def workdir() -> Path:
+    return _WORKDIR
+
+
+@pytest.fixture
+async def database():
+    """A freshly created schema and empty in-process caches for every test."""
+    async with _engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+    await init_db()
+    quote_cache.clear()
+    item_memo._lru.clear()
+    yield
+    await _engine.dispose()
+
+
+@pytest.fixture
+def settings():
+    return get_settings()
+
+
+@pytest.fixture
+async def universe(database):
+    """Eight synthetic stocks with daily bars for the first five, 2023-01-02 .. 2024-06-03."""
+    stocks = generate_universe(8)
+    await seed_database(stocks, [stock.code for stock in stocks[:5]], date(2023, 1, 2), date(2024, 6, 3))
+    return stocks
+
+
+async def append_quotes(codes: Sequence[str], start: date, end: date) -> int:
+    """Insert the synthetic bars of ``codes`` dated ``start`` .. ``end``, continuing the seeded walk."""
+    rows = [
+        {
+            "code": q.code,
+            "date": q.trade_date,
+            "open": q.open,
+            "close": q.close,
+            "high": q.high,
+            "low": q.low,
+            "volume": q.volume,
+            "amount": q.amount,
+            "adj_close": q.adj_close,
+            "flags": [],
+        }
+        for code in codes
+        for q in generate_quotes(code, HISTORY_START, end)
+        if q.trade_date >= start
+    ]
+    async with SessionMaker() as session:
+        await session.execute(insert(QuoteDaily), rows)
+        await session.commit()
+    return len(rows)
@@ -0,0 +1,43 @@
+from __future__ import annotations
+
+from collections import Counter
+from datetime import date
+
+import pytest
+
+from backend.app.core.deps import SessionMaker
+from backend.app.schemas.backtest import BacktestRequest
+from backend.app.services import backtest_engine
+from backend.app.services.backtest_engine import run_backtest, run_backtest_batch
+
+
+async def test_batch_loads_each_code_once_and_matches_single_runs(universe, settings, monkeypatch):
+    monkeypatch.setattr(settings, "item_memo_enabled", False)
+    codes = [stock.code for stock in universe[:4]]
+    payloads = [
+        BacktestRequest(stocks=codes[:3], recommend_date=date(2024, 1, 5), end_date=date(2024, 3, 1)),
+        BacktestRequest(stocks=codes[1:], recommend_date=date(2024, 2, 1), end_date=date(2024, 5, 31)),
+        BacktestRequest(stocks=[], recommend_date=date(2024, 2, 1)),
+    ]
+    loads = Counter()
+    load = backtest_engine._load_quotes
+
+    async def counting_load(session, code, start, end):
+        loads[code] += 1
+        return await load(session, code, start, end)
+
+    monkeypatch.setattr(backtest_engine, "_load_quotes", counting_load)
+    async with SessionMaker() as session:
+        batch = await run_backtest_batch(session, payloads)
+    assert loads == {code: 1 for code in codes}
+
+    assert [result.index for result in batch.items] == [0, 1, 2]
+    assert batch.items[2].result is None and batch.items[2].error
+    monkeypatch.setattr(backtest_engine, "_load_quotes", load)
+    for payload, result in zip(payloads, batch.items):
+        if result.result is None:
+            continue
+        async with SessionMaker() as session:
+            single = await run_backtest(session, payload)
+        assert [item.sell_price for item in result.result.items] == [item.sell_price for item in single.items]
+        assert result.result.summary.ret == pytest.approx(single.summary.ret)
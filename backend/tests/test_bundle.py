@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import pytest
+from sqlalchemy import func, select
+
+from backend.app.core.deps import SessionMaker
+from backend.app.db.models import QuoteDaily, Stock, StockChange
+from backend.app.services import bundle
+from backend.app.services.bundle import BundleError, export_bundle, import_bundle
+
+QUOTE_COLUMNS = (QuoteDaily.code, QuoteDaily.date, QuoteDaily.open, QuoteDaily.close, QuoteDaily.volume, QuoteDaily.flags)
+
+
+async def _snapshot() -> tuple:
+    async with SessionMaker() as session:
+        stocks = (await session.execute(select(Stock.code, Stock.name, Stock.exchange).order_by(Stock.code))).all()
+        quotes = (await session.execute(select(*QUOTE_COLUMNS).order_by(QuoteDaily.code, QuoteDaily.date))).all()
+    return stocks, quotes
+
+
+async def test_round_trip_restores_every_row(universe, workdir, monkeypatch):
+    monkeypatch.setattr(bundle, "PART_ROWS", 500)
+    before = await _snapshot()
+    manifest = await export_bundle(str(workdir / "bundle.tar"))
+    assert manifest["tables"]["quotes_daily"]["rows"] == len(before[1])
+    assert len(manifest["tables"]["quotes_daily"]["parts"]) > 1
+
+    with pytest.raises(BundleError):
+        await import_bundle(str(workdir / "bundle.tar"))
+    async with SessionMaker() as session:
+        session.add(StockChange(code=before[0][0].code, kind="rename", name="old"))
+        await session.commit()
+
+    loaded = await import_bundle(str(workdir / "bundle.tar"), replace=True)
+
+    assert loaded == {"stocks": len(before[0]), "quotes_daily": len(before[1])}
+    assert await _snapshot() == before
+    async with SessionMaker() as session:
+        assert (await session.execute(select(func.count()).select_from(StockChange))).scalar() == 0
+        # Workers keep their feed cursor across the import, so ids must not be reused.
+        change = StockChange(code=before[0][0].code, kind="rename", name="new")
+        session.add(change)
+        await session.commit()
+    assert change.id == 2
+
+
+async def test_failed_import_leaves_tables_untouched(universe, workdir, monkeypatch):
+    before = await _snapshot()
+    await export_bundle(str(workdir / "bundle.tar"))
+    load = bundle._bulk_load
+
+    async def fail_on_quotes(session, table, names, records):
+        if table == "quotes_daily":
+            raise RuntimeError("disk full")
+        await load(session, table, names, records)
+
+    monkeypatch.setattr(bundle, "_bulk_load", fail_on_quotes)
+    with pytest.raises(RuntimeError):
+        await import_bundle(str(workdir / "bundle.tar"), replace=True)
+
+    assert await _snapshot() == before
@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+from datetime import date
+from types import SimpleNamespace
+
+import pytest
+
+from backend.app.core.deps import SessionMaker
+from backend.app.services import backtest_engine, circuit_breaker, ths_client
+from backend.app.services.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = SimpleNamespace(value=1000.0)
+    monkeypatch.setattr(circuit_breaker, "time", SimpleNamespace(monotonic=lambda: now.value))
+    # Keep test breakers out of the metrics registry.
+    monkeypatch.setattr(circuit_breaker, "_registry", [])
+    return now
+
+
+def _fail(breaker: CircuitBreaker, times: int) -> None:
+    for _ in range(times):
+        breaker.before_call()
+        breaker.record(False)
+
+
+def test_opens_on_failure_rate_then_probes_half_open(clock):
+    breaker = CircuitBreaker("test", failure_rate=0.5, min_calls=4, window_s=60, open_s=30)
+    breaker.before_call()
+    breaker.record(True)
+    _fail(breaker, 2)
+    assert breaker.state == CLOSED
+    _fail(breaker, 1)
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    clock.value += 30
+    assert breaker.state == HALF_OPEN
+    breaker.before_call()
+    # Only one probe at a time while half-open.
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record(False)
+    assert breaker.state == OPEN
+
+    clock.value += 30
+    breaker.before_call()
+    breaker.record(True)
+    assert breaker.state == CLOSED
+    breaker.before_call()
+
+
+def test_failures_outside_the_window_do_not_count(clock):
+    breaker = CircuitBreaker("test", failure_rate=0.5, min_calls=4, window_s=60, open_s=30)
+    _fail(breaker, 3)
+    clock.value += 61
+    _fail(breaker, 3)
+    assert breaker.state == CLOSED
+    _fail(breaker, 1)
+    assert breaker.state == OPEN
+
+
+async def test_open_circuit_yields_no_quotes(universe, clock, monkeypatch):
+    breaker = CircuitBreaker("ths-test", min_calls=1)
+    _fail(breaker, 1)
+    monkeypatch.setattr(ths_client, "ths_breaker", breaker)
+    monkeypatch.setattr(ths_client.requests, "get", pytest.fail)
+
+    # The last three stocks have no stored bars, so the lookup falls through to THS.
+    async with SessionMaker() as session:
+        quotes = await backtest_engine._load_quotes(session, universe[-1].code, date(2024, 1, 2), date(2024, 3, 1))
+    assert quotes == []
@@ -0,0 +1,20 @@
+from __future__ import annotations
+
+from sqlalchemy import text
+
+from backend.app.core.deps import create_engine_for
+
+
+async def test_sqlite_connections_get_wal_and_tuning_pragmas(settings, workdir, monkeypatch):
+    monkeypatch.setattr(settings, "sqlite_wal", True)
+    monkeypatch.setattr(settings, "sqlite_synchronous", "NORMAL")
+    monkeypatch.setattr(settings, "sqlite_busy_timeout_ms", 4321)
+    engine = create_engine_for(f"sqlite+aiosqlite:///{workdir / 'pragmas.db'}", settings)
+    try:
+        async with engine.connect() as conn:
+            assert (await conn.execute(text("PRAGMA journal_mode"))).scalar() == "wal"
+            # NORMAL is 1.
+            assert (await conn.execute(text("PRAGMA synchronous"))).scalar() == 1
+            assert (await conn.execute(text("PRAGMA busy_timeout"))).scalar() == 4321
+    finally:
+        await engine.dispose()
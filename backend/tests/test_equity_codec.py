@@ -0,0 +1,32 @@
+from __future__ import annotations
+
+from datetime import date
+
+import pytest
+
+from backend.app.services.equity_codec import ColumnarOptions, EquityData, decode_series, encode_columnar
+
+SERIES = [
+    EquityData("600001", "甲", [date(2024, 1, 2), date(2024, 1, 3), date(2024, 1, 5)], [0.0, 0.0123456789, -0.0456]),
+    EquityData("600002", "乙", [date(2024, 1, 3), date(2024, 1, 4)], [0.01, 0.98765432]),
+]
+
+
+@pytest.mark.parametrize(
+    "options",
+    [ColumnarOptions(), ColumnarOptions(precision=4), ColumnarOptions(delta=True), ColumnarOptions(precision=3, delta=True)],
+)
+def test_decode_inverts_encode_within_the_quantization_error(options):
+    payload = encode_columnar(SERIES, options)
+    axis = [date.fromisoformat(day) for day in payload["dates"]]
+    tolerance = 0.5 / payload["scale"] if payload["scale"] else 0.0
+
+    for item, column in zip(SERIES, payload["series"]):
+        decoded = decode_series(column, payload["encoding"], payload["scale"])
+        by_day = dict(zip(item.dates, item.rets))
+        assert len(decoded) == len(axis)
+        for day, value in zip(axis, decoded):
+            if day not in by_day:
+                assert value is None
+            else:
+                assert value == pytest.approx(by_day[day], abs=tolerance + 1e-12)
@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+import itertools
+import math
+from datetime import date
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from backend.app.schemas.backtest import ExitRules
+from backend.app.services import exit_grid
+from backend.app.services.backtest_engine import (
+    ANNUAL_TRADING_DAYS,
+    _aggregate_summary,
+    _calculate_for_stock,
+    _to_quote_view,
+)
+from backend.benchmarks.synthetic import generate_quotes
+
+RECOMMEND_DATE = date(2024, 1, 5)
+WINDOW_END = date(2024, 9, 30)
+STOP_LOSS = [None, 0.03, 0.08]
+TAKE_PROFIT = [None, 0.05, 0.2]
+MAX_HOLD_DAYS = [None, 5, 60]
+TRAILING_STOP = [None, 0.06]
+
+
+@pytest.mark.parametrize("chunk_cells", [exit_grid.GRID_CHUNK_CELLS, 5_000])
+def test_grid_matches_per_combination_loop(monkeypatch, chunk_cells):
+    monkeypatch.setattr(exit_grid, "GRID_CHUNK_CELLS", chunk_cells)
+    series = [
+        (code, [_to_quote_view(q) for q in generate_quotes(code, date(2024, 1, 2), WINDOW_END)])
+        for code in ("600001", "600002", "000003", "300004", "688005")
+    ]
+    combos = list(itertools.product(STOP_LOSS, TAKE_PROFIT, MAX_HOLD_DAYS, TRAILING_STOP))
+    params = np.array([[math.inf if value is None else value for value in combo] for combo in combos], dtype=float)
+
+    grid = exit_grid.evaluate_exit_grid(exit_grid.build_price_matrix(series, RECOMMEND_DATE), *params.T)
+
+    for idx, (stop_loss, take_profit, max_hold_days, trailing_stop) in enumerate(combos):
+        rules = ExitRules(
+            stop_loss=stop_loss, take_profit=take_profit, max_hold_days=max_hold_days, trailing_stop=trailing_stop
+        )
+        items = [
+            _calculate_for_stock(SimpleNamespace(code=code, name=code), quotes, RECOMMEND_DATE, WINDOW_END, rules)
+            for code, quotes in series
+        ]
+        summary = _aggregate_summary(items)
+        assert grid.win_rate[idx] == pytest.approx(summary.win_rate, abs=1e-9)
+        assert grid.ret[idx] == pytest.approx(summary.ret, abs=1e-9)
+        assert grid.ann[idx] == pytest.approx(summary.ann, abs=1e-9)
+        assert grid.sharpe[idx] == pytest.approx(summary.sharpe, abs=1e-9)
+        assert grid.mdd[idx] == pytest.approx(summary.mdd, abs=1e-9)
+
+
+def test_short_hold_cut_off_only_applies_with_exit_rules():
+    code = "600001"
+    quotes = [_to_quote_view(q) for q in generate_quotes(code, date(2024, 1, 2), date(2024, 1, 20))]
+    stock = SimpleNamespace(code=code, name=code)
+    plain = _calculate_for_stock(stock, quotes, RECOMMEND_DATE, date(2024, 1, 20))
+    ruled = _calculate_for_stock(stock, quotes, RECOMMEND_DATE, date(2024, 1, 20), ExitRules())
+    assert plain.trading_days < 30
+    assert plain.ann == pytest.approx((1 + plain.ret) ** (ANNUAL_TRADING_DAYS / plain.trading_days) - 1)
+    assert ruled.ann == ruled.ret
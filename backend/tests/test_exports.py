@@ -0,0 +1,35 @@
+from __future__ import annotations
+
+import csv
+import io
+
+import httpx
+import pytest
+
+from backend.app.main import create_app
+
+ROUTES = ["/api/export/backtest-items", "/api/export/quotes"]
+
+
+@pytest.mark.parametrize("path", ROUTES)
+async def test_export_routes_reject_missing_or_wrong_tokens(database, settings, monkeypatch, path):
+    transport = httpx.ASGITransport(app=create_app())
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        # Without a configured token the routes stay closed, whatever the caller sends.
+        assert (await client.get(path, headers={"x-zlm-profile": ""})).status_code == 403
+        monkeypatch.setattr(settings, "profile_token", "s3cret")
+        assert (await client.get(path)).status_code == 403
+        assert (await client.get(path, headers={"x-zlm-profile": "s3cre"})).status_code == 403
+        assert (await client.get(path, headers={"x-zlm-profile": "s3cret"})).status_code == 200
+
+
+async def test_quote_export_streams_csv_with_the_token(universe, settings, monkeypatch):
+    monkeypatch.setattr(settings, "profile_token", "s3cret")
+    transport = httpx.ASGITransport(app=create_app())
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.get(
+            "/api/export/quotes", params={"codes": universe[0].code}, headers={"x-zlm-profile": "s3cret"}
+        )
+    rows = list(csv.reader(io.StringIO(response.text)))
+    assert response.headers["content-disposition"] == 'attachment; filename="quotes_daily.csv"'
+    assert len(rows) > 1 and {row[0] for row in rows[1:]} == {universe[0].code}
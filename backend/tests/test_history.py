@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+from datetime import date, datetime, timedelta
+
+import httpx
+
+from backend.app.core.deps import SessionMaker
+from backend.app.db.models import Backtest
+from backend.app.main import create_app
+from backend.app.services.history_service import list_backtests
+
+SUMMARY = {"win_rate": 0.5, "ret": 0.0, "ann": 0.0, "bench_ret": 0.0, "bench_ann": 0.0, "excess": 0.0}
+
+
+async def test_keyset_pages_cover_history_once_in_order(database):
+    base = datetime(2024, 5, 1, 9)
+    backtests = [
+        # Groups of three share a created_at, so pages must break ties on bt_id.
+        Backtest(
+            bt_id=f"bt-{idx:03d}",
+            user_id="u1" if idx % 4 else "u2",
+            start=date(2024, 1, 2),
+            end=date(2024, 3, 1),
+            benchmark="HS300",
+            summary_json=SUMMARY,
+            created_at=base + timedelta(minutes=idx // 3),
+        )
+        for idx in range(40)
+    ]
+    async with SessionMaker() as session:
+        session.add_all(backtests)
+        await session.commit()
+
+    seen, cursor = [], None
+    async with SessionMaker() as session:
+        while True:
+            page = await list_backtests(session, "u1", limit=7, cursor=cursor)
+            assert len(page.items) <= 7
+            seen.extend(item.bt_id for item in page.items)
+            cursor = page.next_cursor
+            if cursor is None:
+                break
+
+    expected = sorted(
+        (bt for bt in backtests if bt.user_id == "u1"), key=lambda bt: (bt.created_at, bt.bt_id), reverse=True
+    )
+    assert seen == [bt.bt_id for bt in expected]
+
+
+async def test_listing_requires_the_admin_token(database, settings, monkeypatch):
+    transport = httpx.ASGITransport(app=create_app())
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        assert (await client.get("/api/backtests", params={"user_id": "u1"})).status_code == 403
+        monkeypatch.setattr(settings, "profile_token", "s3cret")
+        denied = await client.get("/api/backtests", params={"user_id": "u1"}, headers={"x-zlm-profile": "guess"})
+        assert denied.status_code == 403
+        allowed = await client.get("/api/backtests", params={"user_id": "u1"}, headers={"x-zlm-profile": "s3cret"})
+        assert allowed.status_code == 200 and allowed.json()["items"] == []
@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+import pandas as pd
+from sqlalchemy import select
+
+from backend.app.core.deps import SessionMaker
+from backend.app.db.models import Stock
+from backend.app.services import akshare_client
+from backend.app.services.ingestor import DELISTED_TAG, sync_stock_master
+
+
+def _listing(monkeypatch, rows) -> None:
+    frame = pd.DataFrame(rows, columns=["code", "name"])
+    monkeypatch.setattr(akshare_client.ak, "stock_info_a_code_name", lambda: frame)
+
+
+async def _stocks() -> dict:
+    async with SessionMaker() as session:
+        rows = await session.execute(select(Stock.code, Stock.name, Stock.exchange, Stock.status_tags))
+        return {row.code: row for row in rows}
+
+
+async def test_sync_writes_only_changed_rows_and_tags_status(database, monkeypatch):
+    _listing(monkeypatch, [("600001", "甲股份"), ("1", "*ST 乙"), ("300003", "ST丙"), ("688004", "丁退")])
+    first = await sync_stock_master()
+    assert {change.kind for change in first} == {"insert"}
+    stocks = await _stocks()
+    assert stocks["000001"].exchange == "SZSE"
+    assert stocks["000001"].status_tags == ["*ST"]
+    assert stocks["300003"].status_tags == ["ST"]
+    assert stocks["688004"].status_tags == ["DELISTING"]
+    assert stocks["600001"].status_tags == []
+
+    # Same list again: nothing is written.
+    assert await sync_stock_master() == []
+
+    _listing(monkeypatch, [("600001", "甲科技"), ("000001", "乙"), ("300003", "ST丙"), ("600005", "戊")])
+    changes = {change.code: change for change in await sync_stock_master()}
+    assert {code: change.kind for code, change in changes.items()} == {
+        "600001": "rename",
+        "000001": "rename",
+        "600005": "insert",
+        "688004": "delist",
+    }
+    assert changes["600001"].previous_name == "甲股份"
+    stocks = await _stocks()
+    assert stocks["000001"].status_tags == []
+    assert stocks["688004"].status_tags == ["DELISTING", DELISTED_TAG]
+    assert stocks["688004"].name == "丁退"
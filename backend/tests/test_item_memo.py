@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+import asyncio
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import select
+
+from backend.app.core.deps import SessionMaker
+from backend.app.db.models import ItemMemo
+from backend.app.schemas.backtest import BacktestRequest
+from backend.app.services import backtest_engine
+from backend.app.services.item_memo import item_memo
+
+
+async def _run(payload: BacktestRequest):
+    async with SessionMaker() as session:
+        response = await backtest_engine.run_backtest(session, payload)
+    await asyncio.gather(*item_memo._writes)
+    return response
+
+
+async def test_memo_hits_skip_recompute_until_calc_version_changes(universe, settings, monkeypatch):
+    monkeypatch.setattr(settings, "quote_cache_enabled", False)
+    computed = []
+    compute = backtest_engine._compute_outcome
+
+    def counting(stock, *args):
+        computed.append(stock.code)
+        return compute(stock, *args)
+
+    monkeypatch.setattr(backtest_engine, "_compute_outcome", counting)
+    payload = BacktestRequest(
+        stocks=[stock.code for stock in universe[:3]], recommend_date=date(2024, 1, 5), end_date=date(2024, 4, 30)
+    )
+
+    first = await _run(payload)
+    assert len(computed) == 3
+    # Served from the LRU, then from the table once the LRU is gone.
+    assert [item.ret for item in (await _run(payload)).items] == [item.ret for item in first.items]
+    item_memo.clear()
+    assert [item.ret for item in (await _run(payload)).items] == [item.ret for item in first.items]
+    assert len(computed) == 3
+
+    monkeypatch.setattr(backtest_engine, "MEMO_CALC_VERSION", backtest_engine.MEMO_CALC_VERSION + 1)
+    await _run(payload)
+    assert len(computed) == 6
+
+
+async def test_every_row_expires_and_purge_removes_expired(universe, settings, monkeypatch):
+    monkeypatch.setattr(settings, "quote_cache_enabled", False)
+    closed = BacktestRequest(stocks=[universe[0].code], recommend_date=date(2024, 1, 5), end_date=date(2024, 4, 30))
+    await _run(closed)
+    async with SessionMaker() as session:
+        session.add(ItemMemo(key="legacy", code=universe[1].code, payload={}, created_at=datetime(2020, 1, 1)))
+        await session.commit()
+        rows = (await session.execute(select(ItemMemo))).scalars().all()
+    assert all(row.expires_at is not None for row in rows if row.key != "legacy")
+
+    assert await item_memo.purge() == 1
+    assert await item_memo.purge(datetime.utcnow() + timedelta(seconds=settings.item_memo_row_ttl_s + 60)) == 1
+    async with SessionMaker() as session:
+        assert (await session.execute(select(ItemMemo))).scalars().all() == []
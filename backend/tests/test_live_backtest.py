@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+from datetime import date
+
+import pytest
+
+from backend.app.core.deps import SessionMaker
+from backend.app.schemas.backtest import BacktestRequest
+from backend.app.services.backtest_engine import get_backtest_response, run_backtest
+from backend.app.services.live_backtest import advance_live_backtests
+
+from .conftest import append_quotes
+
+METRICS = ("ret", "excess", "ann", "sharpe", "mdd", "calmar", "score")
+
+
+async def test_advance_matches_full_recompute(universe, settings, monkeypatch):
+    # Both runs must read the appended bars straight from the database.
+    monkeypatch.setattr(settings, "item_memo_enabled", False)
+    monkeypatch.setattr(settings, "quote_cache_enabled", False)
+    codes = [stock.code for stock in universe[:3]]
+    payload = BacktestRequest(stocks=codes, recommend_date=date(2024, 3, 1))
+
+    async with SessionMaker() as session:
+        live = await run_backtest(session, payload)
+    assert live.live
+    assert {item.sell_date for item in live.items} == {date(2024, 6, 3)}
+
+    assert await append_quotes(codes, date(2024, 6, 4), date(2024, 9, 30)) > 0
+    assert await advance_live_backtests(date(2024, 9, 30)) == 1
+
+    async with SessionMaker() as session:
+        advanced = await get_backtest_response(session, live.bt_id)
+        fresh = await run_backtest(session, payload)
+
+    assert [item.code for item in advanced.items] == [item.code for item in fresh.items]
+    for got, want in zip(advanced.items, fresh.items):
+        assert got.sell_date == want.sell_date == date(2024, 9, 30)
+        assert got.sell_price == want.sell_price
+        assert got.grade == want.grade
+        for name in METRICS:
+            assert getattr(got, name) == pytest.approx(getattr(want, name), rel=1e-9, abs=1e-12), name
+    for name, value in fresh.summary.model_dump().items():
+        assert getattr(advanced.summary, name) == pytest.approx(value, rel=1e-9, abs=1e-12), name
+
+    # Nothing new to append: a second pass changes nothing.
+    assert await advance_live_backtests(date(2024, 9, 30)) == 0
@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+from sqlalchemy import delete, select
+
+from backend.app.core.deps import SessionMaker
+from backend.app.db.models import QuoteDaily
+from backend.app.schemas.backtest import BacktestRequest, ExitRules
+from backend.app.services.backtest_engine import run_backtest
+from backend.app.services.market_index import MAX_FILL_BARS, build_market_index, percentile
+
+
+@pytest.fixture
+async def index_file(workdir):
+    path = workdir / "market_index.npz"
+    yield path
+    # Later tests must not rank against this universe.
+    path.unlink(missing_ok=True)
+
+
+async def _trading_days(code: str) -> list:
+    async with SessionMaker() as session:
+        rows = await session.execute(select(QuoteDaily.date).where(QuoteDaily.code == code).order_by(QuoteDaily.date))
+    return [row[0] for row in rows]
+
+
+async def test_closes_are_carried_over_short_gaps_only(universe, index_file):
+    suspended, delisted = universe[0].code, universe[1].code
+    days = await _trading_days(suspended)
+    gap = days[100 : 100 + MAX_FILL_BARS]
+    delisted_after = days[200]
+    async with SessionMaker() as session:
+        await session.execute(delete(QuoteDaily).where(QuoteDaily.code == suspended, QuoteDaily.date.in_(gap)))
+        await session.execute(delete(QuoteDaily).where(QuoteDaily.code == delisted, QuoteDaily.date > delisted_after))
+        await session.commit()
+
+    index = await build_market_index(str(index_file))
+
+    rows = {day: pos for pos, day in enumerate(date.fromordinal(int(value)) for value in index.dates)}
+    suspended_col = list(index.codes).index(suspended)
+    delisted_col = list(index.codes).index(delisted)
+    before_gap = index.closes[rows[days[99]], suspended_col]
+    assert all(index.closes[rows[day], suspended_col] == before_gap for day in gap)
+    assert np.isfinite(index.closes[rows[days[200 + MAX_FILL_BARS]], delisted_col])
+    assert np.isnan(index.closes[rows[days[201 + MAX_FILL_BARS]], delisted_col])
+    # Codes without any bars never enter the index.
+    assert universe[-1].code not in set(index.codes)
+
+
+async def test_items_are_ranked_over_their_own_holding_period(universe, index_file):
+    index = await build_market_index(str(index_file))
+    payload = BacktestRequest(
+        stocks=[stock.code for stock in universe[:5]],
+        recommend_date=date(2024, 1, 5),
+        end_date=date(2024, 5, 31),
+        exit_rules=ExitRules(max_hold_days=10),
+    )
+    async with SessionMaker() as session:
+        response = await run_backtest(session, payload)
+
+    for item in response.items:
+        assert item.sell_date < payload.end_date
+        section = index.returns_between(item.buy_date - timedelta(days=1), item.sell_date)
+        assert item.market_pct == pytest.approx(percentile(section, item.ret))
+    basket = index.returns_between(
+        min(item.buy_date for item in response.items) - timedelta(days=1),
+        max(item.sell_date for item in response.items),
+    )
+    assert response.summary.market_ret == pytest.approx(float(basket.mean()))
+    assert response.summary.bench_ret == 0.0
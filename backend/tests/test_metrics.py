@@ -0,0 +1,23 @@
+from __future__ import annotations
+
+import httpx
+
+from backend.app.main import create_app
+
+
+async def test_backtest_reports_stage_timings_and_metrics(universe, settings, monkeypatch):
+    monkeypatch.setattr(settings, "metrics_enabled", True)
+    monkeypatch.setattr(settings, "server_timing_enabled", True)
+    transport = httpx.ASGITransport(app=create_app())
+    payload = {"stocks": [stock.code for stock in universe[:2]], "recommend_date": "2024-01-05", "end_date": "2024-03-01"}
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.post("/api/backtest", json=payload)
+        metrics = (await client.get("/metrics")).text
+
+    assert response.status_code == 200
+    timing = response.headers["server-timing"]
+    assert "load_quotes;dur=" in timing and "compute;dur=" in timing
+    assert 'db;desc="' in timing and "total;dur=" in timing
+    assert "# TYPE zlm_http_request_duration_seconds histogram" in metrics
+    assert 'zlm_stage_duration_seconds_count{stage="compute"}' in metrics
+    assert "zlm_db_queries_total" in metrics
@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import asyncio
+import time
+
+from backend.app.core.profiling import PROFILE_HEADER, PROFILE_ID_HEADER, ProfilingMiddleware, to_thread
+
+
+def _spin(seconds: float) -> None:
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+def _thread_work() -> None:
+    _spin(0.1)
+
+
+async def _profiled_loop_work() -> None:
+    for _ in range(20):
+        _spin(0.01)
+        await asyncio.sleep(0)
+
+
+async def _other_loop_work() -> None:
+    for _ in range(40):
+        _spin(0.01)
+        await asyncio.sleep(0)
+
+
+async def _app(scope, receive, send) -> None:
+    if scope["path"].endswith("/profiled"):
+        await to_thread(_thread_work)
+        await _profiled_loop_work()
+    else:
+        await _other_loop_work()
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+
+def _scope(path: str, headers) -> dict:
+    return {"type": "http", "method": "GET", "path": path, "headers": headers, "query_string": b""}
+
+
+async def test_profile_keeps_only_the_request_task_and_its_threads(workdir):
+    middleware = ProfilingMiddleware(
+        _app, token="s3cret", prefixes=["/api/backtest"], profile_dir=str(workdir / "profiles"), interval_ms=1
+    )
+    started = []
+
+    async def send(message) -> None:
+        if message["type"] == "http.response.start":
+            started.extend(value for name, value in message["headers"] if name == PROFILE_ID_HEADER.lower().encode())
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def quiet_send(message) -> None:
+        return None
+
+    await asyncio.gather(
+        middleware(_scope("/api/backtest/profiled", [(PROFILE_HEADER.encode(), b"s3cret")]), receive, send),
+        middleware(_scope("/api/backtest/other", []), receive, quiet_send),
+    )
+
+    folded = (workdir / "profiles" / f"{started[0].decode()}.folded").read_text(encoding="utf-8")
+    assert "_thread_work" in folded
+    assert "_profiled_loop_work" in folded
+    assert "_other_loop_work" not in folded
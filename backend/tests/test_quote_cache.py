@@ -0,0 +1,43 @@
+from __future__ import annotations
+
+from backend.app.services.quote_cache import QuoteSeriesCache
+
+
+def _hit(cache: QuoteSeriesCache, code: str, times: int) -> None:
+    for _ in range(times):
+        cache.get(code)
+
+
+def test_one_off_codes_cannot_push_out_hot_ones():
+    cache = QuoteSeriesCache(max_bytes=300, expected_entries=4096)
+    for code in ("hot-a", "hot-b", "hot-c"):
+        _hit(cache, code, 5)
+        assert cache.put(code, code, 100)
+    assert cache.bytes == 300
+
+    cache.get("once")
+    assert not cache.would_admit("once")
+    assert not cache.put("once", "once", 100)
+    assert cache.get("hot-a") == "hot-a" and cache.bytes == 300
+
+    # Once requested more often than the LRU victim, a code is admitted in its place.
+    _hit(cache, "rising", 8)
+    assert cache.would_admit("rising")
+    assert cache.put("rising", "rising", 100)
+    assert cache.get("hot-b") is None
+    assert len(cache) == 3 and cache.bytes == 300
+
+
+def test_byte_budget_evicts_as_many_entries_as_needed():
+    cache = QuoteSeriesCache(max_bytes=300, expected_entries=4096)
+    for code in ("a", "b", "c"):
+        cache.put(code, code, 100)
+    assert not cache.put("huge", "huge", 301)
+
+    _hit(cache, "wide", 3)
+    assert cache.put("wide", "wide", 250)
+    assert cache.bytes == 250 and len(cache) == 1
+
+    cache.put("wide", "wide", 120)
+    cache.invalidate(["wide"])
+    assert cache.bytes == 0 and len(cache) == 0
@@ -0,0 +1,35 @@
+from __future__ import annotations
+
+from datetime import date
+
+from backend.app.core.deps import SessionMaker
+from backend.app.services import backtest_engine, shared_quotes
+from backend.app.services.shared_quotes import SharedQuoteStore
+
+
+async def test_workers_read_quotes_from_the_published_segment(universe, settings, workdir, monkeypatch):
+    directory = workdir / "shm"
+    directory.mkdir(exist_ok=True)
+    await shared_quotes._rebuild_if_stale(directory)
+    store = SharedQuoteStore(str(directory), poll_s=0)
+    monkeypatch.setattr(backtest_engine, "shared_quotes", store)
+    monkeypatch.setattr(settings, "shared_quotes_enabled", True)
+    monkeypatch.setattr(settings, "quote_cache_enabled", False)
+    code, start, end = universe[0].code, date(2024, 1, 5), date(2024, 3, 1)
+
+    async with SessionMaker() as session:
+        stored = await backtest_engine._query_quotes(session, code, start, end)
+        shared = await backtest_engine._load_quotes(session, code, start, end)
+    assert store.covers(code).version == 1
+    assert [(q.date, q.close, q.volume) for q in shared] == [(q.date, q.close, q.volume) for q in stored]
+    # Codes without bars are not in the segment and still fall through to the database.
+    assert store.covers(universe[-1].code).window(universe[-1].code, start, end) is None
+
+    # A code refreshed in this process bypasses the segment until the next version is attached.
+    store.invalidate([code])
+    assert store.covers(code) is None
+    monkeypatch.setattr(shared_quotes, "_sources", lambda: {"quotes_marker": "rebuilt"})
+    await shared_quotes._rebuild_if_stale(directory)
+    assert store.segment().version == 2
+    assert store.covers(code) is store.segment()
+    assert sorted(path.name for path in directory.glob("quotes-*.bin")) == ["quotes-2.bin"]
@@ -0,0 +1,32 @@
+from __future__ import annotations
+
+import asyncio
+from datetime import date
+
+from backend.app.core.deps import SessionMaker
+from backend.app.schemas.backtest import BacktestRequest
+from backend.app.services.backtest_engine import backtest_flight, run_backtest
+
+
+async def _run(payload: BacktestRequest):
+    async with SessionMaker() as session:
+        return await run_backtest(session, payload)
+
+
+async def test_identical_backtests_share_one_execution(universe):
+    codes = [stock.code for stock in universe[:3]]
+    same = BacktestRequest(stocks=codes, recommend_date=date(2024, 1, 5), end_date=date(2024, 3, 1))
+    other = BacktestRequest(stocks=codes, recommend_date=date(2024, 1, 5), end_date=date(2024, 4, 1))
+    before = backtest_flight.stats()
+
+    first, second, third = await asyncio.gather(_run(same), _run(same), _run(other))
+
+    after = backtest_flight.stats()
+    assert after["executions"] - before["executions"] == 2
+    assert after["coalesced"] - before["coalesced"] == 1
+    assert after["inflight"] == 0
+    assert first.bt_id == second.bt_id != third.bt_id
+
+    # Once the flight has landed, the next identical request runs again.
+    await _run(same)
+    assert backtest_flight.stats()["executions"] - after["executions"] == 1
@@ -0,0 +1,42 @@
+from __future__ import annotations
+
+from datetime import date
+
+import pytest
+
+from backend.app.core.deps import SessionMaker
+from backend.app.schemas.backtest import BacktestRequest
+from backend.app.services import ths_client
+from backend.app.services.backtest_engine import get_backtest_response, open_backtest_stream
+
+
+@pytest.fixture(autouse=True)
+def ths_offline(monkeypatch):
+    # Codes without stored bars fall through to THS; answer "no data" without touching the network.
+    monkeypatch.setattr(ths_client.TongHuaShunClient, "_fetch_year_data", lambda self, code, year: None)
+
+
+async def test_stream_emits_each_item_then_the_stored_summary(universe):
+    # The sixth stock has no bars and is skipped rather than failing the stream.
+    codes = [stock.code for stock in universe[:6]]
+    payload = BacktestRequest(stocks=codes, recommend_date=date(2024, 1, 5), end_date=date(2024, 3, 1))
+    async with SessionMaker() as session:
+        events = [event async for event in await open_backtest_stream(session, payload)]
+
+    *items, summary = events
+    assert [event["type"] for event in items] == ["item"] * 5
+    assert {event["item"]["code"] for event in items} == set(codes[:5])
+    assert all(event["equity"]["points"] for event in items)
+    assert summary["type"] == "summary"
+
+    async with SessionMaker() as session:
+        stored = await get_backtest_response(session, summary["bt_id"])
+    assert [item.code for item in stored.items] == codes[:5]
+    assert summary["summary"]["ret"] == pytest.approx(stored.summary.ret)
+
+
+async def test_stream_reports_missing_data_as_an_error_event(universe):
+    payload = BacktestRequest(stocks=[universe[-1].code], recommend_date=date(2024, 1, 5), end_date=date(2024, 3, 1))
+    async with SessionMaker() as session:
+        events = [event async for event in await open_backtest_stream(session, payload)]
+    assert events == [{"type": "error", "detail": "所选股票区间缺少行情数据"}]
@@ -0,0 +1,24 @@
+from __future__ import annotations
+
+from backend.app.services.warm_state import SNAPSHOT_RANKINGS, WarmStateStore, write_warm_state
+
+
+async def test_snapshot_rankings_expire_but_stocks_do_not(universe, workdir):
+    path = await write_warm_state(str(workdir / "warm-test.bin"))
+    store = WarmStateStore(str(path), max_age_s=3600, rank_ttl_s=300, poll_s=60)
+    assert await store.load()
+
+    key = SNAPSHOT_RANKINGS[0]
+    assert store.ranking(*key) is not None
+    assert store.ranking(key[0], key[1] + 1, key[2], key[3]) is None
+    assert store.stock(universe[0].code).name == universe[0].name
+
+    # Past the ranking TTL, callers fall back to computing rankings; the stock master is still served.
+    store.state.created_at -= 301
+    assert store.ranking(*key) is None
+    assert store.stock(universe[0].code) is not None
+
+    # A snapshot older than max_age_s is not loaded at all.
+    stale = WarmStateStore(str(path), max_age_s=0, rank_ttl_s=300, poll_s=60)
+    assert not await stale.load()
+    assert stale.ranking(*key) is None and stale.stock(universe[0].code) is None